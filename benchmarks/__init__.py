@@ -0,0 +1 @@
+# Benchmarks for the prayer scheduler. Run the modules with `python -m benchmarks.<name>`.
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# ---------------------------------------------------------------------------
+# bench_bitmap.py – per-user first_fit loop vs the vectorized bitmap engine
+# ---------------------------------------------------------------------------
+"""
+Finds slots and allocates a day's prayer blocks for growing numbers of
+users with `--events` meetings each, once with the per-user Python loops
+(first_fit and allocator.allocate) and with BusyBitmap, and reports the
+time per run and the speedup. The bitmap is timed end to end, rasterizing
+the meetings on every run, and on a bitmap built beforehand, as a service
+keeping one bitmap per day and marking blocks in it would use it:
+
+    python -m benchmarks.bench_bitmap --users 100 1000 --events 20
+"""
+from __future__ import annotations
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+from zoneinfo import ZoneInfo
+
+from src.__version__ import __version__
+from src.calendar_api.allocator import BlockRequest, allocate
+from src.calendar_api.bitmap import BusyBitmap
+from src.calendar_api.snapshot import first_fit
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+DEFAULT_USERS = [10, 100, 1000]
+PRAYERS = [DAY + timedelta(hours=h, minutes=m) for h, m in ((3, 50), (13, 20), (17, 35), (21, 10), (22, 40))]
+BLOCK_MINUTES = 15
+
+
+def _calendars(users: int, events: int, seed: int = 0) -> List[List[tuple]]:
+    rng = random.Random(seed)
+    calendars = []
+    for _ in range(users):
+        starts = sorted(DAY + timedelta(minutes=rng.randrange(6 * 60, 20 * 60, 5)) for _ in range(events))
+        calendars.append([(start, start + timedelta(minutes=rng.choice((15, 30, 45, 60)))) for start in starts])
+    return calendars
+
+
+def _timed(run: Callable[[], Any], repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    return (time.perf_counter() - started) / repeats
+
+
+def bench_users(users: int, events: int, repeats: int) -> List[Dict[str, Any]]:
+    calendars = _calendars(users, events)
+    requests = [BlockRequest("Prayer", start, timedelta(minutes=BLOCK_MINUTES)) for start in PRAYERS]
+    prepared = BusyBitmap.from_intervals(DAY, calendars)
+    prepared.free_runs()
+    paths = {
+        "find slot": (
+            lambda: [first_fit(busy, PRAYERS[1], BLOCK_MINUTES) for busy in calendars],
+            lambda: BusyBitmap.from_intervals(DAY, calendars).first_free(PRAYERS[1], BLOCK_MINUTES),
+            lambda: prepared.first_free(PRAYERS[1], BLOCK_MINUTES),
+        ),
+        "allocate day": (
+            lambda: [allocate(busy, requests) for busy in calendars],
+            lambda: BusyBitmap.from_intervals(DAY, calendars).allocate(PRAYERS, BLOCK_MINUTES),
+            lambda: BusyBitmap(DAY, prepared.busy.copy()).allocate(PRAYERS, BLOCK_MINUTES),
+        ),
+    }
+    results = []
+    for path, (loop, bitmap, prepared_bitmap) in paths.items():
+        loop_s, bitmap_s, prepared_s = _timed(loop, repeats), _timed(bitmap, repeats), _timed(prepared_bitmap, repeats)
+        results.append({"users": users, "events_per_user": events, "path": path, "loop_ms": loop_s * 1000,
+                        "bitmap_ms": bitmap_s * 1000, "prepared_bitmap_ms": prepared_s * 1000,
+                        "speedup": loop_s / bitmap_s, "prepared_speedup": loop_s / prepared_s})
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser("Slot finding for many users: Python loop vs bitmap engine")
+    ap.add_argument("--users", type=int, nargs="+", default=DEFAULT_USERS)
+    ap.add_argument("--events", type=int, default=20, help="Meetings per user and day.")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--output", default="bench_bitmap.json")
+    args = ap.parse_args(argv)
+
+    results = []
+    for users in args.users:
+        for result in bench_users(users, args.events, args.repeats):
+            results.append(result)
+            print(f"{users:>6} users  {result['path']:<13} loop {result['loop_ms']:9.2f} ms  "
+                  f"bitmap {result['bitmap_ms']:8.2f} ms  x{result['speedup']:.2f}  "
+                  f"prepared {result['prepared_bitmap_ms']:8.2f} ms  x{result['prepared_speedup']:.2f}")
+
+    report = {
+        "benchmark": "bitmap",
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# ---------------------------------------------------------------------------
+# bench_calendar_api.py – calendar path throughput against a local fake API
+# ---------------------------------------------------------------------------
+"""
+Measures GoogleCalendarService end to end, HTTP and JSON included, against
+FakeCalendarServer on localhost for days with a growing number of events
+(10 to 10k by default). Per size it records the throughput of:
+
+- find_first_available_slot outside a refresh (paged events.list),
+- find_first_available_slot inside a refresh (mirror with sync deltas),
+- find_first_available_slot with the freebusy slot source,
+- add_event one at a time (slot search and events.insert per block),
+- add_events inside a refresh (the blocks are inserted in one batch),
+
+with HTTP requests and bytes per operation. `--latency-ms` delays every HTTP
+request and `--quota-error-rate` answers that share of calls with rate
+limit errors, which the service retries:
+
+    python -m benchmarks.bench_calendar_api --sizes 10 1000 --latency-ms 20 --output bench_calendar_api.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+from zoneinfo import ZoneInfo
+
+from benchmarks.fake_calendar import FakeCalendarServer, LocalCalendarService
+from src.__version__ import __version__
+from src.calendar_api.allocator import BlockRequest
+from src.calendar_api.rate_limit import RateLimiter
+from src.config.security import LOG
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+DEFAULT_SIZES = [10, 100, 1000, 10_000]
+
+
+def _bench_limiter() -> RateLimiter:
+    # Client-side quotas are not what is measured, retries of injected quota errors are kept short.
+    return RateLimiter(rate=1e9, burst=1e9, user_rate=1e9, user_burst=1e9, max_attempts=10,
+                       base_delay=timedelta(milliseconds=10), max_delay=timedelta(milliseconds=200))
+
+
+def _measure(server: FakeCalendarServer, operations: int, run: Callable[[], None]) -> Dict[str, float]:
+    requests_before, bytes_before = server.stats["http_requests"], server.stats["bytes_sent"]
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    return {
+        "ops_per_s": operations / elapsed if elapsed else float("inf"),
+        "latency_ms": elapsed / operations * 1000,
+        "http_requests_per_op": (server.stats["http_requests"] - requests_before) / operations,
+        "kib_per_op": (server.stats["bytes_sent"] - bytes_before) / operations / 1024,
+    }
+
+
+def bench_size(count: int, repeats: int, latency: float, quota_error_rate: float) -> List[Dict[str, Any]]:
+    results = []
+
+    def record(path: str, measured: Dict[str, float]):
+        results.append({"events_per_day": count, "path": path, **measured})
+
+    with FakeCalendarServer(latency=latency, quota_error_rate=quota_error_rate) as server:
+        server.populate(DAY, count)
+        starts = [DAY + timedelta(hours=6, minutes=37 * i) for i in range(repeats)]
+
+        service = LocalCalendarService(server, limiter=_bench_limiter())
+        record("find slot", _measure(server, repeats, lambda: [
+            service.find_first_available_slot(start, 10) for start in starts]))
+
+        def find_in_refresh():
+            for start in starts:
+                service.begin_refresh()
+                service.find_first_available_slot(start, 10)
+                service.end_refresh()
+        find_in_refresh()  # The first refresh fully syncs the mirror; the measured ones fetch deltas.
+        record("find slot (refresh)", _measure(server, repeats, find_in_refresh))
+
+        freebusy = LocalCalendarService(server, slot_source="freebusy", limiter=_bench_limiter())
+        record("find slot (freebusy)", _measure(server, repeats, lambda: [
+            freebusy.find_first_available_slot(start, 10) for start in starts]))
+
+        record("add_event", _measure(server, repeats, lambda: [
+            service.add_event(start, f"Bench {i}", 10) for i, start in enumerate(starts)]))
+
+        def add_batched():
+            service.begin_refresh()
+            service.add_events([BlockRequest(f"Batched {i}", start, timedelta(minutes=10)) for i, start in enumerate(starts)])
+            service.end_refresh()
+        record("add_events (batch)", _measure(server, repeats, add_batched))
+        results[-1]["quota_errors"] = server.stats["quota_errors"]
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser("Calendar path benchmark against a local fake Calendar API")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of events per day.")
+    ap.add_argument("--repeats", type=int, default=20, help="Operations per path and size.")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Delay the fake server adds to every HTTP request.")
+    ap.add_argument("--quota-error-rate", type=float, default=0.0, help="Share of calls answered with a rate limit error.")
+    ap.add_argument("--output", default="bench_calendar_api.json")
+    args = ap.parse_args(argv)
+
+    LOG.setLevel(logging.ERROR)
+    results = []
+    for size in args.sizes:
+        for result in bench_size(size, args.repeats, args.latency_ms / 1000, args.quota_error_rate):
+            results.append(result)
+            print(f"{size:>6} events/day  {result['path']:<21} {result['ops_per_s']:8.1f} ops/s  "
+                  f"{result['latency_ms']:8.2f} ms/op  {result['http_requests_per_op']:5.2f} req/op  "
+                  f"{result['kib_per_op']:9.1f} KiB/op")
+
+    report = {
+        "benchmark": "calendar_api",
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "latency_ms": args.latency_ms,
+        "quota_error_rate": args.quota_error_rate,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
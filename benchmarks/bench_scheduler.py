@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# ---------------------------------------------------------------------------
+# bench_scheduler.py – scalability benchmark for PrayerScheduler
+# ---------------------------------------------------------------------------
+"""
+Drives PrayerScheduler with a stubbed prayer times function and calendar for
+growing numbers of prayer schedules and records, per size:
+
+- refresh latency (cold, and warm, which also removes the previous jobs),
+- add_job / remove_job throughput of the underlying job store,
+- the cost of publish_next_prayer_info,
+- tracemalloc peak and process RSS.
+
+Results are written as JSON so they can be compared between releases:
+
+    python -m benchmarks.bench_scheduler --output bench_scheduler-1.0.30.json
+    python -m benchmarks.bench_scheduler --compare bench_scheduler-1.0.30.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from src.__version__ import __version__
+from src.actions_executor import ActionExecutor
+from src.calendar_api.base import CalendarService
+from src.config.security import TZ, LOG
+from src.scheduler import PrayerScheduler
+from src.shared.event_bus import EventBus
+
+DEFAULT_SIZES = [1, 100, 10_000, 100_000]
+# Metrics where a larger value is worse, with the relative change reported as a regression.
+REGRESSION_METRICS = ["refresh_cold_s", "refresh_warm_s", "next_prayer_info_s", "tracemalloc_peak_kib"]
+
+
+class _StubCalendar(CalendarService):
+    """Accepts every busy block without doing any I/O."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def setup_credentials(self):
+        pass
+
+    def get_events(self, start_time, end_time):
+        return []
+
+    def create_event(self, summary, start_time, end_time, description):
+        self.calls += 1
+        return {}
+
+    def delete_event(self, event_id):
+        self.calls += 1
+
+    def find_first_available_slot(self, start_time, duration_minutes):
+        return start_time
+
+    def add_event(self, start_time, summary, duration_minutes):
+        self.calls += 1
+        return True
+
+    def add_events(self, requests):
+        self.calls += len(requests)
+        return [True] * len(requests)
+
+
+def _stub_times(count: int, start: datetime):
+    """A prayer times function returning `count` distinct prayers, one per minute from `start`."""
+    times = {f"P{i}": start + timedelta(minutes=i) for i in range(count)}
+
+    def prayer_times(city, country, method=None, school=None):
+        return times
+    return prayer_times
+
+
+def _rss_kib() -> float:
+    """Current resident set size, falling back to the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform == "darwin" else float(peak)
+
+
+def bench_size(count: int) -> Dict[str, Any]:
+    now = datetime.now(TZ)
+    event_bus = EventBus()
+    calendar = _StubCalendar()
+    scheduler = PrayerScheduler(
+        audio_path="",
+        calendar_service=calendar,
+        prayer_times_func=_stub_times(count, now + timedelta(hours=1)),
+        action_executor=ActionExecutor(event_bus, dry_run=True),
+        event_bus=event_bus,
+        install_id="benchmark",
+    )
+    engine = scheduler.scheduler
+    # Paused, so jobs land in the job store like in the running app but never fire.
+    engine.start(paused=True)
+    result: Dict[str, Any] = {"prayers": count}
+    try:
+        tracemalloc.start()
+        rss_before = _rss_kib()
+
+        started = time.perf_counter()
+        scheduler.refresh(city="Bench", country="Bench")
+        result["refresh_cold_s"] = time.perf_counter() - started
+        result["jobs"] = len(engine.get_jobs())
+
+        started = time.perf_counter()
+        scheduler.refresh(city="Bench", country="Bench")
+        result["refresh_warm_s"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        scheduler.publish_next_prayer_info()
+        result["next_prayer_info_s"] = time.perf_counter() - started
+
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["tracemalloc_peak_kib"] = peak / 1024
+        result["rss_delta_kib"] = _rss_kib() - rss_before
+
+        engine.remove_all_jobs()
+        run_date = now + timedelta(days=1)
+        started = time.perf_counter()
+        jobs = [engine.add_job(print, "date", run_date=run_date + timedelta(seconds=i)) for i in range(count)]
+        elapsed = time.perf_counter() - started
+        result["add_jobs_per_s"] = count / elapsed if elapsed else None
+
+        started = time.perf_counter()
+        for job in jobs:
+            job.remove()
+        elapsed = time.perf_counter() - started
+        result["remove_jobs_per_s"] = count / elapsed if elapsed else None
+        result["calendar_calls"] = calendar.calls
+    finally:
+        scheduler.refresh_actor.stop()
+        engine.shutdown(wait=False)
+    return result
+
+
+def compare(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]], tolerance: float) -> List[str]:
+    """Returns a line per metric that got worse than the baseline by more than `tolerance`."""
+    by_size = {entry["prayers"]: entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        old = by_size.get(entry["prayers"])
+        if not old:
+            continue
+        for metric in REGRESSION_METRICS:
+            if old.get(metric) and entry.get(metric) is not None:
+                change = entry[metric] / old[metric] - 1
+                if change > tolerance:
+                    regressions.append(f"{entry['prayers']:>7} prayers: {metric} {old[metric]:.4g} -> {entry[metric]:.4g} (+{change:.0%})")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser("Scheduler scalability benchmark")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of prayer schedules to benchmark.")
+    ap.add_argument("--output", default="bench_scheduler.json", help="Where to write the JSON results.")
+    ap.add_argument("--compare", help="A previous results file to compare against.")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Relative slowdown reported as a regression.")
+    args = ap.parse_args(argv)
+
+    # Per-job logging would dominate the measurements.
+    LOG.setLevel(logging.WARNING)
+    logging.getLogger("apscheduler").setLevel(logging.WARNING)
+
+    results = []
+    for size in args.sizes:
+        result = bench_size(size)
+        results.append(result)
+        print(f"{size:>7} prayers: refresh {result['refresh_cold_s'] * 1000:9.1f} ms cold, "
+              f"{result['refresh_warm_s'] * 1000:9.1f} ms warm, "
+              f"next-prayer {result['next_prayer_info_s'] * 1000:8.2f} ms, "
+              f"add {result['add_jobs_per_s'] or 0:9.0f}/s, remove {result['remove_jobs_per_s'] or 0:9.0f}/s, "
+              f"peak {result['tracemalloc_peak_kib']:9.0f} KiB")
+
+    report = {
+        "benchmark": "scheduler",
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": datetime.now(TZ).isoformat(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions against {baseline.get('version', args.compare)}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# ---------------------------------------------------------------------------
+# bench_slot_finding.py – events.list vs freebusy.query slot finding
+# ---------------------------------------------------------------------------
+"""
+Compares the two slot sources of GoogleCalendarService on a day with a
+growing number of realistic events (descriptions, attendees, conference
+data), without network access: requests go through the real Calendar API
+client into an in-process fake that answers like the Calendar API.
+
+Per slot source and event count it records the bytes received, the number
+of round trips, the client-side time (request building, JSON parsing and
+slot search), and a modelled latency that adds `--rtt-ms` per round trip
+and the transfer time at `--bandwidth-kbps`.
+
+    python -m benchmarks.bench_slot_finding --output bench_slot_finding.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+from urllib.parse import parse_qs, urlparse
+from zoneinfo import ZoneInfo
+
+import httplib2
+from googleapiclient.discovery import build
+
+from benchmarks.fake_calendar import apply_fields, matches_private, sample_event
+from src.__version__ import __version__
+from src.calendar_api.google_calendar import GoogleCalendarService
+from src.calendar_api.mirror import EventMirror
+from src.calendar_api.rate_limit import RateLimiter
+from src.config.security import LOG
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+DEFAULT_SIZES = [5, 50, 500]
+
+
+class FakeCalendarHttp:
+    """An httplib2.Http stand-in that answers events.list and freebusy.query from a fixed set of events."""
+
+    def __init__(self, events: List[Dict[str, Any]]):
+        self.events = events
+        self.requests = 0
+        self.bytes_received = 0
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        url = urlparse(uri)
+        query = parse_qs(url.query)
+        if url.path.lower().endswith("/freebusy"):
+            busy = [{"start": e["start"]["dateTime"], "end": e["end"]["dateTime"]} for e in self.events]
+            payload = {"kind": "calendar#freeBusy", "timeMin": DAY.isoformat(), "timeMax": (DAY + timedelta(days=1)).isoformat(),
+                       "calendars": {"primary": {"busy": busy}}}
+        elif "syncToken" in query:
+            payload = {"kind": "calendar#events", "items": [], "nextSyncToken": "sync-2"}
+        else:
+            # The freebusy path lists only the app's own blocks; the server filters them by tag.
+            items = [e for e in self.events if matches_private(e, query.get("privateExtendedProperty", []))]
+            payload = {"kind": "calendar#events", "summary": "primary", "updated": "2025-07-01T08:00:00.000Z",
+                       "timeZone": "UTC", "accessRole": "owner", "items": items, "nextSyncToken": "sync-1"}
+        if "fields" in query:
+            payload = apply_fields(payload, query["fields"][0])
+        content = json.dumps(payload).encode("utf-8")
+        self.requests += 1
+        self.bytes_received += len(content)
+        return httplib2.Response({"status": "200", "content-type": "application/json"}), content
+
+
+class _BenchCalendarService(GoogleCalendarService):
+    def __init__(self, http: FakeCalendarHttp, slot_source: str):
+        self._http = http
+        # Quotas are not what is measured here.
+        super().__init__(creds=None, slot_source=slot_source, limiter=RateLimiter(rate=1e9, burst=1e9, user_rate=1e9, user_burst=1e9))
+
+    @property
+    def service(self):
+        return self._client
+
+    def setup_credentials(self) -> None:
+        # The benchmark runs on one thread, so one client is enough.
+        self._client = build("calendar", "v3", http=self._http, static_discovery=True)
+        self.mirror = EventMirror(lambda: self.service, calendar_id=self.calendar_id, api_calls=self.api_calls,
+                                  limiter=self.limiter, user=self.user)
+
+
+def _run(service: GoogleCalendarService, http: FakeCalendarHttp, repeats: int, prepare=None) -> Dict[str, float]:
+    requests_before, bytes_before = http.requests, http.bytes_received
+    started = time.perf_counter()
+    for _ in range(repeats):
+        if prepare:
+            prepare()
+        service.begin_refresh()
+        service.find_first_available_slot(DAY + timedelta(hours=9), 10)
+        service.end_refresh()
+    return {
+        "client_s": (time.perf_counter() - started) / repeats,
+        "round_trips": (http.requests - requests_before) / repeats,
+        "bytes": (http.bytes_received - bytes_before) / repeats,
+    }
+
+
+def bench_size(count: int, repeats: int, rtt: float, bandwidth: float) -> List[Dict[str, Any]]:
+    events = [sample_event(i, DAY + timedelta(minutes=i * 1440 // max(count, 1))) for i in range(count)]
+    results = []
+
+    def record(path: str, measured: Dict[str, float]):
+        measured["modelled_latency_s"] = measured["client_s"] + measured["round_trips"] * rtt + measured["bytes"] / bandwidth
+        results.append({"events": count, "path": path, **measured})
+
+    http = FakeCalendarHttp(events)
+    service = _BenchCalendarService(http, "events")
+    # A cold mirror lists every event in full, like get_events did on every call.
+    record("events (full list)", _run(service, http, repeats, prepare=lambda: setattr(service.mirror, "sync_token", None)))
+    record("events (sync delta)", _run(service, http, repeats))
+
+    http = FakeCalendarHttp(events)
+    record("freebusy", _run(_BenchCalendarService(http, "freebusy"), http, repeats))
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser("Slot finding benchmark: events.list vs freebusy.query")
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of events on the day.")
+    ap.add_argument("--repeats", type=int, default=20)
+    ap.add_argument("--rtt-ms", type=float, default=80.0, help="Modelled round trip time.")
+    ap.add_argument("--bandwidth-kbps", type=float, default=2000.0, help="Modelled download bandwidth in kilobytes per second.")
+    ap.add_argument("--output", default="bench_slot_finding.json")
+    args = ap.parse_args(argv)
+
+    LOG.setLevel(logging.WARNING)
+    results = []
+    for size in args.sizes:
+        for result in bench_size(size, args.repeats, args.rtt_ms / 1000, args.bandwidth_kbps * 1024):
+            results.append(result)
+            print(f"{size:>5} events  {result['path']:<20} {result['round_trips']:.0f} round trip(s) "
+                  f"{result['bytes'] / 1024:9.1f} KiB  client {result['client_s'] * 1000:7.2f} ms  "
+                  f"modelled {result['modelled_latency_s'] * 1000:8.1f} ms")
+
+    report = {
+        "benchmark": "slot_finding",
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rtt_ms": args.rtt_ms,
+        "bandwidth_kbps": args.bandwidth_kbps,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
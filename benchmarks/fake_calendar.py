@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# ---------------------------------------------------------------------------
+# fake_calendar.py – local HTTP stand-in for the Google Calendar v3 API
+# ---------------------------------------------------------------------------
+"""
+Serves the part of the Calendar v3 API the app uses over real HTTP on
+localhost, so benchmarks measure request building, transport and JSON
+serialization like against Google:
+
+- events.list with timeMin/timeMax, orderBy, paging, privateExtendedProperty
+  filters, syncToken deltas and `fields` partial responses,
+- events.insert, events.get and events.delete,
+- freebusy.query,
+- batch requests (multipart/mixed) of the above.
+
+Latency per HTTP request, a share of requests answered with quota errors
+and the number of events per day are configurable:
+
+    with FakeCalendarServer(latency=0.05, quota_error_rate=0.01) as server:
+        server.populate(DAY, events_per_day=1000)
+        service = server.build_service()
+
+LocalCalendarService is a GoogleCalendarService talking to such a server.
+"""
+from __future__ import annotations
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+from zoneinfo import ZoneInfo
+
+import httplib2
+from googleapiclient.discovery import build_from_document
+
+from src.auth.service_factory import discovery_document
+from src.calendar_api.google_calendar import GoogleCalendarService
+from src.calendar_api.mirror import EventMirror
+from src.calendar_api.rate_limit import RateLimiter
+from src.calendar_api.snapshot import parse_event_times, parse_rfc3339
+
+UTC = ZoneInfo("UTC")
+MAX_PAGE_SIZE = 2500
+
+_EVENTS = re.compile(r"^/calendar/v3/calendars/([^/]+)/events$")
+_EVENT = re.compile(r"^/calendar/v3/calendars/([^/]+)/events/([^/]+)$")
+_FREEBUSY = "/calendar/v3/freeBusy"
+_BATCH = "/batch/calendar/v3"
+
+Reply = Tuple[int, Dict[str, str], Optional[Dict[str, Any]]]
+
+
+def sample_event(i: int, start: datetime, minutes: int = 25) -> Dict[str, Any]:
+    """A realistic meeting with a description, attendees and conference data."""
+    return {
+        "kind": "calendar#event",
+        "etag": f'"{3400000000000000 + i}"',
+        "id": f"event{i:06d}",
+        "status": "confirmed",
+        "htmlLink": f"https://www.google.com/calendar/event?eid=event{i:06d}",
+        "created": "2025-07-01T08:00:00.000Z",
+        "updated": "2025-07-01T08:00:00.000Z",
+        "summary": f"Meeting {i}",
+        "description": "Agenda:\n" + "\n".join(f"{n}. Discuss item {n} of the quarterly planning" for n in range(1, 9)),
+        "location": "Building 4, Room 201",
+        "creator": {"email": "organizer@example.com"},
+        "organizer": {"email": "organizer@example.com"},
+        "start": {"dateTime": start.isoformat(), "timeZone": "UTC"},
+        "end": {"dateTime": (start + timedelta(minutes=minutes)).isoformat(), "timeZone": "UTC"},
+        "iCalUID": f"event{i:06d}@google.com",
+        "sequence": 0,
+        "attendees": [{"email": f"person{n}@example.com", "responseStatus": "accepted"} for n in range(6)],
+        "conferenceData": {"entryPoints": [{"entryPointType": "video", "uri": f"https://meet.google.com/abc-{i:04d}"}]},
+        "reminders": {"useDefault": True},
+        "eventType": "default",
+    }
+
+
+def apply_fields(payload: Dict[str, Any], fields: str) -> Dict[str, Any]:
+    """Applies a partial response mask of the form 'a,b,items(x,y)' like the server does."""
+    top, _, item_fields = fields.partition("items(")
+    keys = {key for key in top.split(",") if key}
+    projected = {key: value for key, value in payload.items() if key in keys}
+    if item_fields:
+        wanted = item_fields.rstrip(")").split(",")
+        projected["items"] = [{key: e[key] for key in wanted if key in e} for e in payload.get("items", [])]
+    return projected
+
+
+def matches_private(event: Dict[str, Any], wanted: List[str]) -> bool:
+    """Whether the event has every `privateExtendedProperty` "key=value" in `wanted`, like the server's filter."""
+    private = (event.get("extendedProperties") or {}).get("private") or {}
+    return all(private.get(key) == value for key, _, value in (item.partition("=") for item in wanted))
+
+
+def _error(status: int, reason: str, message: str) -> Reply:
+    return status, {}, {"error": {"code": status, "message": message, "errors": [{"reason": reason, "message": message}]}}
+
+
+class FakeCalendar:
+    """One calendar's events, with a change log that backs sync tokens."""
+
+    def __init__(self):
+        self.events: Dict[str, Dict[str, Any]] = {}
+        self._changed: Dict[str, int] = {}  # event id -> sequence number of its last change
+        self._sequence = 0
+
+    def put(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        self._sequence += 1
+        self.events[event["id"]] = event
+        self._changed[event["id"]] = self._sequence
+        return event
+
+    def sync_token(self) -> str:
+        return f"sync-{self._sequence}"
+
+    def changed_since(self, token: str) -> Optional[List[Dict[str, Any]]]:
+        """The events changed after a sync token, or None if the token is not one of ours."""
+        match = re.fullmatch(r"sync-(\d+)", token)
+        if match is None or int(match.group(1)) > self._sequence:
+            return None
+        since = int(match.group(1))
+        return [self.events[event_id] for event_id, sequence in self._changed.items() if sequence > since]
+
+    def timed(self, time_min: Optional[datetime], time_max: Optional[datetime]) -> List[Dict[str, Any]]:
+        """The confirmed events overlapping the window, ordered by start."""
+        found = []
+        for event in self.events.values():
+            times = parse_event_times(event) if event.get("status") != "cancelled" else None
+            if times and (time_min is None or times[1] > time_min) and (time_max is None or times[0] < time_max):
+                found.append((times[0], event))
+        found.sort(key=lambda item: item[0])
+        return [event for _, event in found]
+
+
+class FakeCalendarServer:
+    """
+    A threaded HTTP server on localhost answering like the Calendar v3 API.
+
+    `latency` seconds are slept before answering each HTTP request (a batch
+    counts once). `quota_error_rate` is the share of calls, batch items
+    included, answered with a rate limit error: alternately 403
+    rateLimitExceeded and 429 with a `Retry-After` of `retry_after` seconds.
+    `stats` counts requests by API method, plus bytes sent and quota errors.
+    """
+
+    def __init__(self, latency: float = 0.0, quota_error_rate: float = 0.0, retry_after: int = 0, seed: int = 0):
+        self.latency = latency
+        self.quota_error_rate = quota_error_rate
+        self.retry_after = retry_after
+        self.calendars: Dict[str, FakeCalendar] = {}
+        self.stats: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "FakeCalendarServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    @property
+    def root_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> None:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Without it small responses on a kept-alive connection wait for delayed ACKs.
+            disable_nagle_algorithm = True
+
+            def _serve(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status, headers, content = server.handle_http(self.command, self.path, self.headers.get("Content-Type", ""), body)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_DELETE = _serve
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-calendar", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = self._thread = None
+
+    def build_service(self):
+        """A Calendar API client whose requests, batches included, go to this server."""
+        document = copy.deepcopy(discovery_document("calendar", "v3"))
+        document["rootUrl"] = self.root_url
+        document.pop("mtlsRootUrl", None)
+        return build_from_document(document, http=httplib2.Http())
+
+    def calendar(self, calendar_id: str = "primary") -> FakeCalendar:
+        with self._lock:
+            return self.calendars.setdefault(calendar_id, FakeCalendar())
+
+    def populate(self, day: datetime, events_per_day: int, days: int = 1, calendar_id: str = "primary") -> None:
+        """Adds `events_per_day` meetings spread evenly over each of `days` days from `day`."""
+        calendar = self.calendar(calendar_id)
+        with self._lock:
+            for d in range(days):
+                for i in range(events_per_day):
+                    n = d * events_per_day + i
+                    calendar.put(sample_event(n, day + timedelta(days=d, minutes=i * 1440 // max(events_per_day, 1))))
+
+    # -- HTTP --------------------------------------------------------------
+
+    def handle_http(self, method: str, target: str, content_type: str, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        if self.latency:
+            time.sleep(self.latency)
+        url = urlparse(target)
+        if method == "POST" and url.path == _BATCH:
+            status, headers, content = self._batch(content_type, body)
+        else:
+            status, headers, payload = self.handle(method, url.path, parse_qs(url.query), body)
+            content = json.dumps(payload).encode("utf-8") if payload is not None else b""
+            if payload is not None:
+                headers = {"Content-Type": "application/json; charset=UTF-8", **headers}
+        with self._lock:
+            self.stats["http_requests"] += 1
+            self.stats["bytes_sent"] += len(content)
+        return status, headers, content
+
+    def _batch(self, content_type: str, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        message = BytesParser().parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body)
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            request_line, _, rest = part.get_payload().partition("\n")
+            method, target, _ = request_line.strip().split(" ", 2)
+            inner_body = re.split(r"\r?\n\r?\n", rest, maxsplit=1)[1] if re.search(r"\r?\n\r?\n", rest) else ""
+            url = urlparse(target)
+            status, headers, payload = self.handle(method, url.path, parse_qs(url.query), inner_body.encode("utf-8"))
+            content = json.dumps(payload) if payload is not None else ""
+            header_lines = "".join(f"{key}: {value}\r\n" for key, value in headers.items())
+            # Long Content-IDs arrive folded over several lines.
+            content_id = re.sub(r"\r?\n", "", part["Content-ID"]).strip("<>")
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}\r\nContent-Type: application/json; charset=UTF-8\r\n"
+                f"{header_lines}\r\n{content}\r\n"
+            )
+        with self._lock:
+            self.stats["batch"] += 1
+        content = ("".join(parts) + f"--{boundary}--\r\n").encode("utf-8")
+        return 200, {"Content-Type": f"multipart/mixed; boundary={boundary}"}, content
+
+    # -- API methods -------------------------------------------------------
+
+    def handle(self, method: str, path: str, query: Dict[str, List[str]], body: bytes) -> Reply:
+        """Answers one API call, sent on its own or as part of a batch."""
+        name = self._method_name(method, path)
+        with self._lock:
+            self.stats[name] += 1
+            if self.quota_error_rate and self._random.random() < self.quota_error_rate:
+                self.stats["quota_errors"] += 1
+                if self.stats["quota_errors"] % 2:
+                    return _error(403, "rateLimitExceeded", "Rate Limit Exceeded")
+                status, _, payload = _error(429, "rateLimitExceeded", "Too Many Requests")
+                return status, {"Retry-After": str(self.retry_after)}, payload
+        if name == "events.list":
+            return self._list(unquote(_EVENTS.match(path).group(1)), query)
+        if name == "events.insert":
+            return self._insert(unquote(_EVENTS.match(path).group(1)), json.loads(body or b"{}"))
+        if name in ("events.get", "events.delete"):
+            calendar_id, event_id = (unquote(group) for group in _EVENT.match(path).groups())
+            return self._get(calendar_id, event_id) if name == "events.get" else self._delete(calendar_id, event_id)
+        if name == "freebusy.query":
+            return self._freebusy(json.loads(body or b"{}"))
+        return _error(404, "notFound", f"No such API method: {method} {path}")
+
+    @staticmethod
+    def _method_name(method: str, path: str) -> str:
+        if _EVENTS.match(path):
+            return {"GET": "events.list", "POST": "events.insert"}.get(method, "unknown")
+        if _EVENT.match(path):
+            return {"GET": "events.get", "DELETE": "events.delete"}.get(method, "unknown")
+        if path == _FREEBUSY and method == "POST":
+            return "freebusy.query"
+        return "unknown"
+
+    def _list(self, calendar_id: str, query: Dict[str, List[str]]) -> Reply:
+        calendar = self.calendar(calendar_id)
+        with self._lock:
+            if "syncToken" in query:
+                items = calendar.changed_since(query["syncToken"][0])
+                if items is None:
+                    return _error(410, "fullSyncRequired", "Sync token is no longer valid, a full sync is required.")
+            else:
+                time_min = parse_rfc3339(query["timeMin"][0]) if "timeMin" in query else None
+                time_max = parse_rfc3339(query["timeMax"][0]) if "timeMax" in query else None
+                items = calendar.timed(time_min, time_max)
+                wanted = query.get("privateExtendedProperty", [])
+                items = [e for e in items if matches_private(e, wanted)]
+            sync_token = calendar.sync_token()
+        page_size = min(int(query.get("maxResults", ["250"])[0]), MAX_PAGE_SIZE)
+        offset = int(query.get("pageToken", ["0"])[0])
+        payload = {"kind": "calendar#events", "summary": calendar_id, "timeZone": "UTC", "accessRole": "owner",
+                   "items": items[offset:offset + page_size]}
+        if offset + page_size < len(items):
+            payload["nextPageToken"] = str(offset + page_size)
+        else:
+            payload["nextSyncToken"] = sync_token
+        if "fields" in query:
+            payload = apply_fields(payload, query["fields"][0])
+        return 200, {}, payload
+
+    def _insert(self, calendar_id: str, body: Dict[str, Any]) -> Reply:
+        if parse_event_times(body) is None and "date" not in body.get("start", {}):
+            return _error(400, "required", "Missing start or end time.")
+        event = dict(body, kind="calendar#event", id=body.get("id") or uuid.uuid4().hex, status="confirmed",
+                     etag=f'"{uuid.uuid4().int % 10 ** 16}"', updated=datetime.now(UTC).isoformat())
+        calendar = self.calendar(calendar_id)
+        with self._lock:
+            if event["id"] in calendar.events:
+                return _error(409, "duplicate", "The requested identifier already exists.")
+            calendar.put(event)
+        return 200, {}, event
+
+    def _get(self, calendar_id: str, event_id: str) -> Reply:
+        event = self.calendar(calendar_id).events.get(event_id)
+        if event is None:
+            return _error(404, "notFound", "Not Found")
+        return 200, {}, event
+
+    def _delete(self, calendar_id: str, event_id: str) -> Reply:
+        calendar = self.calendar(calendar_id)
+        with self._lock:
+            event = calendar.events.get(event_id)
+            if event is None:
+                return _error(404, "notFound", "Not Found")
+            if event.get("status") == "cancelled":
+                return _error(410, "deleted", "Resource has been deleted")
+            calendar.put({"id": event_id, "status": "cancelled"})
+        return 204, {}, None
+
+    def _freebusy(self, body: Dict[str, Any]) -> Reply:
+        time_min, time_max = parse_rfc3339(body["timeMin"]), parse_rfc3339(body["timeMax"])
+        calendars = {}
+        for item in body.get("items", []):
+            calendar_id = item["id"]
+            if calendar_id not in self.calendars:
+                calendars[calendar_id] = {"errors": [{"domain": "global", "reason": "notFound"}], "busy": []}
+                continue
+            with self._lock:
+                events = self.calendars[calendar_id].timed(time_min, time_max)
+            merged: List[List[datetime]] = []
+            for start, end in sorted(parse_event_times(event) for event in events):
+                start, end = max(start, time_min), min(end, time_max)
+                if merged and start <= merged[-1][1]:
+                    merged[-1][1] = max(merged[-1][1], end)
+                else:
+                    merged.append([start, end])
+            calendars[calendar_id] = {"busy": [{"start": s.isoformat(), "end": e.isoformat()} for s, e in merged]}
+        return 200, {}, {"kind": "calendar#freeBusy", "timeMin": body["timeMin"], "timeMax": body["timeMax"], "calendars": calendars}
+
+
+class LocalCalendarService(GoogleCalendarService):
+    """A GoogleCalendarService whose client sends its requests to a FakeCalendarServer."""
+
+    def __init__(self, server: FakeCalendarServer, slot_source: str = "events", limiter: Optional[RateLimiter] = None):
+        self._server = server
+        self._clients = threading.local()
+        super().__init__(creds=None, slot_source=slot_source, limiter=limiter)
+
+    @property
+    def service(self):
+        # One client per thread, like get_service.
+        client = getattr(self._clients, "client", None)
+        if client is None:
+            client = self._clients.client = self._server.build_service()
+        return client
+
+    def setup_credentials(self) -> None:
+        self.mirror = EventMirror(lambda: self.service, calendar_id=self.calendar_id, api_calls=self.api_calls,
+                                  limiter=self.limiter, user=self.user)
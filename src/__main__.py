@@ -5,11 +5,15 @@
 
 from __future__ import annotations
 import sys
-from src.config.security import get_asset_path, load_config, LOG, parse_args
+from datetime import timedelta
+from src.config.security import get_asset_path, load_config, LOG, parse_args, ICS_CALENDAR_PATH, CALENDAR_QUEUE_PATH, CALENDAR_PLANS_PATH
 from src.scheduler import PrayerScheduler
 from src.prayer_times import today_times
-from src.auth.google_auth import get_google_credentials
+from src.auth.google_auth import credential_manager
 from src.calendar_api.google_calendar import GoogleCalendarService
+from src.calendar_api.ics_calendar import IcsCalendarService
+from src.calendar_api.plan_store import PlanStore
+from src.calendar_api.write_behind import CalendarWriteBehind, WriteQueue
 from src.shared.event_bus import EventBus
 from src.services.config_service import ConfigService
 
@@ -84,12 +88,44 @@ def main(argv: list[str] | None = None) -> int:
     if args.country:
         config.country = args.country
     
+    # Handle --simulate-days before any real service is set up
+    if args.simulate_days:
+        from src.simulation import run_simulation
+        report = run_simulation(
+            days=args.simulate_days,
+            city=config.city or "Simulated City",
+            country=config.country or "Simulated Country",
+            method=config.method,
+            school=config.school
+        )
+        print(report.summary())
+        return 0
+
     # Initialize services
     calendar_service = None
-    if config.google_calendar_id:
-        creds = get_google_credentials()
+    if config.calendar_backend == "ics":
+        calendar_service = IcsCalendarService(config.ics_path or ICS_CALENDAR_PATH)
+    elif config.google_calendar_id:
+        # Only the stored token is read here: startup never waits on the network or a sign-in.
+        # Expired credentials refresh in the background, or on the first calendar call.
+        credentials = credential_manager()
+        creds = credentials.cached()
         if creds:
-            calendar_service = GoogleCalendarService(creds)
+            credentials.start()
+            calendar_service = GoogleCalendarService(creds, slot_source=config.calendar_slot_source,
+                                                     calendar_id=config.google_calendar_id,
+                                                     busy_calendar_ids=config.busy_calendar_ids)
+        else:
+            LOG.warning("Not signed in to Google. Sign in from the settings to sync the calendar.")
+
+    # Calendar writes go through a durable queue, so refreshes never wait on the calendar,
+    # and a plan that was already written is not written again
+    calendar_writer = None
+    plan_store = None
+    if calendar_service and not args.dry_run:
+        plan_store = PlanStore(CALENDAR_PLANS_PATH)
+        calendar_writer = CalendarWriteBehind(calendar_service, WriteQueue(CALENDAR_QUEUE_PATH), plans=plan_store)
+        calendar_writer.start()
 
     # Determine action executor
     from src.actions_executor import ActionExecutor
@@ -101,7 +137,10 @@ def main(argv: list[str] | None = None) -> int:
         calendar_service=calendar_service,
         prayer_times_func=today_times,
         action_executor=action_executor,
-        event_bus=event_bus
+        event_bus=event_bus,
+        prearm_lead=timedelta(seconds=config.prearm_seconds),
+        calendar_writer=calendar_writer,
+        plan_store=plan_store
     )
 
     # Handle --dry-run directly
@@ -122,9 +161,9 @@ def main(argv: list[str] | None = None) -> int:
     # For all other cases, we launch the tray icon setup.
     from src import tray_icon
     
-    # Initial refresh
+    # Initial refresh, run in the background so the tray appears right away
     if config.city and config.country:
-        scheduler.refresh(
+        scheduler.request_refresh(
             city=config.city,
             country=config.country,
             method=config.method,
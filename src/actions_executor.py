@@ -1,7 +1,8 @@
 from __future__ import annotations
 from src.config.security import LOG
 from src.shared.event_bus import EventBus
-from src.domain.notification_messages import AudioPlaybackRequestedEvent, FocusModeRequestedEvent
+from src.domain.notification_messages import AudioPlaybackRequestedEvent, FocusModeRequestedEvent, PrearmRequestedEvent
+from concurrent.futures import Future
 import threading
 
 class ActionExecutor:
@@ -14,14 +15,36 @@ class ActionExecutor:
         self._dry_run = dry_run
         self._dry_run_event: threading.Event | None = None
 
-    def play_audio(self, audio_path: str):
+    @property
+    def dry_run(self) -> bool:
+        """Whether actions are only logged instead of requested."""
+        return self._dry_run
+
+    def play_audio(self, audio_path: str) -> Future:
+        """
+        Requests playback of an audio file without waiting for it.
+        The returned future resolves when the playback has finished.
+        """
+        finished: Future = Future()
         if self._dry_run:
             LOG.info(f"ActionExecutor (dry_run): Would play audio from {audio_path}")
             if self._dry_run_event:
                 self._dry_run_event.set()
+            finished.set_result(None)
         else:
             LOG.info(f"ActionExecutor: Requesting audio playback for {audio_path}")
-            self._event_bus.publish(AudioPlaybackRequestedEvent(audio_path=audio_path))
+            self._event_bus.publish(AudioPlaybackRequestedEvent(
+                audio_path=audio_path,
+                on_finished=lambda: finished.done() or finished.set_result(None)
+            ))
+        return finished
+
+    def prearm(self, audio_paths: list[str]):
+        if self._dry_run:
+            LOG.info(f"ActionExecutor (dry_run): Would pre-arm playback of {audio_paths} and the focus window.")
+        else:
+            LOG.info("ActionExecutor: Requesting pre-arm of audio and focus window.")
+            self._event_bus.publish(PrearmRequestedEvent(audio_paths=list(audio_paths)))
 
     def trigger_focus_mode(self):
         if self._dry_run:
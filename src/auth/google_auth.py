@@ -1,12 +1,17 @@
 import os
 import json
 import sys
+import tempfile
+import threading
+from datetime import timedelta, timezone
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from appdirs import user_data_dir
 from src.config.security import LOG
+from src.auth.service_factory import TTLCache, clear_services, get_service
+from src.shared.backoff import exponential_backoff
+from src.shared.clock import SystemClock
 
 
 
@@ -22,75 +27,269 @@ APP_AUTHOR = "Omar"
 # Path for user-specific, writable config files
 USER_CONFIG_DIR = user_data_dir(APP_NAME, APP_AUTHOR)
 TOKEN_FILE = os.path.join(USER_CONFIG_DIR, 'token.json')
+
+# User info and the calendar list rarely change; caching them briefly keeps
+# reopening the settings window from calling the API every time.
+ACCOUNT_CACHE_TTL = 300
+_user_info_cache = TTLCache(ACCOUNT_CACHE_TTL)
+_calendar_list_cache = TTLCache(ACCOUNT_CACHE_TTL)
 # CREDENTIALS_FILE is now accessed via importlib.resources
 
-def get_google_credentials(reauthenticate=False):
-    creds = None
-    # Ensure the user config directory exists.
-    os.makedirs(USER_CONFIG_DIR, exist_ok=True)
+# Credentials are refreshed this long before they expire.
+REFRESH_MARGIN = timedelta(minutes=5)
+# Retries of a failed background refresh back off from REFRESH_RETRY_BASE up to REFRESH_RETRY_CAP.
+REFRESH_RETRY_BASE = timedelta(seconds=30)
+REFRESH_RETRY_CAP = timedelta(minutes=15)
 
-    if reauthenticate and os.path.exists(TOKEN_FILE):
-        os.remove(TOKEN_FILE)
-        LOG.info("Existing token deleted. Re-authenticating...")
 
-    if os.path.exists(TOKEN_FILE):
-        with open(TOKEN_FILE, 'r') as token:
-            creds = Credentials.from_authorized_user_info(json.load(token), SCOPES)
+def _client_config_path():
+    """The OAuth client configuration of the installed, bundled or development app, or None."""
+    # Define system-wide config path for installed applications
+    SYSTEM_CONFIG_PATH = os.path.join('/usr', 'share', APP_NAME.lower(), 'config', 'security', 'google_client_config.json')
 
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            # Check if the credentials file exists in the user's config directory or the project root.
-            try:
-                config_path = None
-                # Define system-wide config path for installed applications
-                SYSTEM_CONFIG_PATH = os.path.join('/usr', 'share', APP_NAME.lower(), 'config', 'security', 'google_client_config.json')
-
-                if os.path.exists(SYSTEM_CONFIG_PATH):
-                    config_path = SYSTEM_CONFIG_PATH
-                # 2. Check PyInstaller temporary extraction path (for bundled applications)
-                elif getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-                    pyinstaller_path = os.path.join(sys._MEIPASS, 'config', 'security', 'google_client_config.json')
-                    if os.path.exists(pyinstaller_path):
-                        config_path = pyinstaller_path
-                # 3. Fallback to relative path (for local development)
-                else:
-                    dev_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'security', 'google_client_config.json')
-                    if os.path.exists(dev_path):
-                        config_path = dev_path
+    if os.path.exists(SYSTEM_CONFIG_PATH):
+        return SYSTEM_CONFIG_PATH
+    # 2. Check PyInstaller temporary extraction path (for bundled applications)
+    elif getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+        pyinstaller_path = os.path.join(sys._MEIPASS, 'config', 'security', 'google_client_config.json')
+        if os.path.exists(pyinstaller_path):
+            return pyinstaller_path
+    # 3. Fallback to relative path (for local development)
+    else:
+        dev_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'security', 'google_client_config.json')
+        if os.path.exists(dev_path):
+            return dev_path
+    return None
+
+
+def _run_auth_flow():
+    """Signs in through the browser. Raises CredentialsNotFoundError if that is not possible."""
+    try:
+        config_path = _client_config_path()
+        if config_path: # Only proceed if a config_path was found
+            flow = InstalledAppFlow.from_client_secrets_file(config_path, SCOPES)
+            return flow.run_local_server(port=0)
+        raise FileNotFoundError("Google API client configuration file not found.")
+    except FileNotFoundError:
+        message = (
+            "Google API credentials file not found within the application bundle.\n\n"
+            "Please ensure the application is correctly packaged or that 'src/config/security/google_client_config.json' exists in development mode."
+        )
+        raise CredentialsNotFoundError(message)
+    except Exception as e:
+        raise CredentialsNotFoundError(f"Failed to obtain new credentials: {e}") from e
+
+
+def write_token(creds, token_file=TOKEN_FILE):
+    """Writes the token file atomically, readable only by the user, so a crash never leaves half a token."""
+    directory = os.path.dirname(os.path.abspath(token_file))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.token-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as token:
+            token.write(creds.to_json())
+        os.replace(tmp_path, token_file)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class CredentialManager:
+    """
+    Holds the process's Google credentials. The token file is read once and
+    the credentials are kept in memory; every caller gets the same object,
+    so a refresh reaches all API clients built with it. Once started, a
+    background thread refreshes them REFRESH_MARGIN before they expire and
+    writes the token file atomically, retrying failed refreshes with backoff.
+
+    `cached` never touches the network or opens a browser, so it is safe on
+    the startup path; only `get` signs in or refreshes synchronously.
+    """
+
+    def __init__(self, token_file=TOKEN_FILE, refresh_margin=REFRESH_MARGIN, clock=None):
+        self.token_file = token_file
+        self.refresh_margin = refresh_margin
+        self.clock = clock or SystemClock(timezone.utc)
+        self._creds = None
+        self._loaded = False
+        self._failures = 0
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def cached(self):
+        """The credentials from memory, or from the token file on first use. None if there is no token."""
+        with self._lock:
+            if not self._loaded:
+                self._loaded = True
+                if os.path.exists(self.token_file):
+                    try:
+                        with open(self.token_file, 'r') as token:
+                            self._creds = Credentials.from_authorized_user_info(json.load(token), SCOPES)
+                    except (OSError, ValueError) as e:
+                        LOG.warning(f"Ignoring unreadable Google token {self.token_file}: {e}")
+            return self._creds
+
+    def get(self, reauthenticate=False):
+        """
+        Valid credentials, refreshed or signed in for right now if needed.
+        With `reauthenticate`, the stored token is dropped and the user signs in again.
+        """
+        with self._lock:
+            if reauthenticate:
+                if os.path.exists(self.token_file):
+                    os.remove(self.token_file)
+                    LOG.info("Existing token deleted. Re-authenticating...")
+                clear_account_cache()
+                self._creds, self._loaded = None, True
+
+            creds = self.cached()
+            if creds and creds.valid:
+                return creds
+            sign_in = not (creds and creds.expired and creds.refresh_token)
+        if not sign_in:
+            return self._refresh(creds)
+        # The browser flow can take minutes; cached() must not wait for it meanwhile.
+        creds = _run_auth_flow()
 
-                if config_path: # Only proceed if a config_path was found
-                    flow = InstalledAppFlow.from_client_secrets_file(config_path, SCOPES)
-                    creds = flow.run_local_server(port=0)
-                else:
-                    raise FileNotFoundError("Google API client configuration file not found.")
-
-            except FileNotFoundError:
-                message = (
-                    "Google API credentials file not found within the application bundle.\n\n"
-                    "Please ensure the application is correctly packaged or that 'src/config/security/google_client_config.json' exists in development mode."
-                )
-                raise CredentialsNotFoundError(message)
-            except Exception as e:
-                raise CredentialsNotFoundError(f"Failed to obtain new credentials: {e}") from e
-        
         # If after all attempts, creds is still None or invalid, raise an error
         if not creds or not creds.valid:
             raise CredentialsNotFoundError("Could not obtain valid Google API credentials.")
+        with self._lock:
+            self._store(creds)
+        return creds
 
-        # Save the new token
-        with open(TOKEN_FILE, 'w') as token:
-            token.write(creds.to_json())
-            
+    def refresh(self):
+        """Refreshes the credentials now and writes the new token."""
+        creds = self.cached()
+        if not creds or not creds.refresh_token:
+            raise CredentialsNotFoundError("No Google credentials to refresh.")
+        self._refresh(creds, force=True)
+
+    def _refresh(self, creds, force=False):
+        """
+        Refreshes `creds` over the network without holding the manager lock,
+        so cached() and the refresh schedule never wait on Google, and stores
+        them under the lock. Refreshes are serialized; unless `force`d, one
+        that another thread already did is not repeated.
+        """
+        with self._refresh_lock:
+            if not force and creds.valid:
+                return creds
+            # google-auth only sets the new token once the response is in.
+            creds.refresh(Request())
+            if not creds.valid:
+                raise CredentialsNotFoundError("Could not obtain valid Google API credentials.")
+            with self._lock:
+                if self._creds is creds:
+                    self._store(creds)
+                else:
+                    # Signed in again meanwhile; those credentials are newer.
+                    LOG.info("Google credentials were replaced during a refresh. Keeping the new ones.")
+        return creds
+
+    def _store(self, creds):
+        self._creds, self._loaded, self._failures = creds, True, 0
+        try:
+            write_token(creds, self.token_file)
+        except OSError as e:
+            # The credentials still work from memory; the next refresh writes them again.
+            LOG.error(f"Could not write Google token {self.token_file}: {e}")
+        self._wake.set()
+
+    def seconds_until_refresh(self):
+        """Seconds until the credentials are due for a refresh, or None if there is nothing to refresh."""
+        with self._lock:
+            creds = self.cached()
+            if not creds or not creds.refresh_token:
+                return None
+            if creds.expiry is None:
+                return 0.0 if not creds.valid else None
+            # google-auth keeps expiry as a naive UTC datetime.
+            due = creds.expiry.replace(tzinfo=timezone.utc) - self.refresh_margin
+            return max(0.0, (due - self.clock.now()).total_seconds())
+
+    def refresh_if_due(self):
+        """Refreshes the credentials if they are due. Returns the seconds until the next check, or None."""
+        wait = self.seconds_until_refresh()
+        if wait is None or wait > 0:
+            return wait
+        try:
+            self.refresh()
+        except Exception as e:
+            delay = exponential_backoff(self._failures, REFRESH_RETRY_BASE, REFRESH_RETRY_CAP)
+            self._failures += 1
+            LOG.warning(f"Refreshing Google credentials failed ({e}). Retrying in {delay.total_seconds():.0f}s.")
+            return delay.total_seconds()
+        LOG.info("Refreshed Google credentials ahead of expiry.")
+        return self.seconds_until_refresh()
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="google-credentials", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            wait = self.refresh_if_due()
+            # Without credentials there is nothing to do until get() stores some.
+            self._wake.wait(wait)
+            self._wake.clear()
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def credential_manager():
+    """The CredentialManager of this process."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = CredentialManager()
+        return _manager
+
+
+def get_google_credentials(reauthenticate=False):
+    """Valid Google credentials from the process's CredentialManager, signing in if needed."""
+    manager = credential_manager()
+    creds = manager.get(reauthenticate=reauthenticate)
+    manager.start()
     return creds
 
 
+def clear_account_cache():
+    """Forgets the cached user info, calendar list and API clients."""
+    _user_info_cache.clear()
+    _calendar_list_cache.clear()
+    clear_services()
+
+
+def _account_key(creds):
+    # A refreshed or reloaded Credentials object still belongs to the same account.
+    return getattr(creds, 'refresh_token', None) or id(creds)
+
+
 def get_user_info(creds):
     """Fetches user info using the provided credentials."""
+    key = _account_key(creds)
+    user_info = _user_info_cache.get(key)
+    if user_info is not None:
+        return user_info
     try:
-        service = build('oauth2', 'v2', credentials=creds)
+        service = get_service('oauth2', 'v2', creds)
         user_info = service.userinfo().get().execute()
+        _user_info_cache.put(key, user_info)
         return user_info
     except Exception as e:
         LOG.error(f"An error occurred: {e}")
@@ -98,10 +297,16 @@ def get_user_info(creds):
 
 def get_calendar_list(creds):
     """Fetches the user's calendar list."""
+    key = _account_key(creds)
+    calendars = _calendar_list_cache.get(key)
+    if calendars is not None:
+        return calendars
     try:
-        service = build('calendar', 'v3', credentials=creds)
+        service = get_service('calendar', 'v3', creds)
         calendar_list = service.calendarList().list().execute()
-        return calendar_list.get('items', [])
+        calendars = calendar_list.get('items', [])
+        _calendar_list_cache.put(key, calendars)
+        return calendars
     except Exception as e:
         LOG.error(f"An error occurred while fetching calendar list: {e}")
         return []
@@ -0,0 +1,98 @@
+# ------------------------------------------------------------------------
+# service_factory.py – Google API clients built once from bundled discovery documents
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+# Parsed discovery documents shared by every thread; building a client from
+# an already parsed document does not modify it.
+_documents: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_documents_lock = threading.Lock()
+# httplib2, which the clients send their requests through, is not thread
+# safe, so every thread gets its own clients.
+_local = threading.local()
+# Bumped by clear_services; a thread's clients of an older generation are dropped on its next call.
+_generation = 0
+
+
+def discovery_document(api: str, version: str) -> Dict[str, Any]:
+    """The discovery document bundled with googleapiclient for `api`/`version`, loaded and parsed once per process."""
+    key = (api, version)
+    with _documents_lock:
+        document = _documents.get(key)
+        if document is None:
+            raw = get_static_doc(api, version)
+            if raw is None:
+                raise ValueError(f"No bundled discovery document for {api} {version}")
+            document = _documents[key] = json.loads(raw)
+        return document
+
+
+def get_service(api: str, version: str, credentials=None):
+    """
+    Returns this thread's client for `api`/`version` authorised with
+    `credentials`, building it on first use. The client is reused for as long
+    as the same credentials object is passed, so repeated calls do neither
+    network nor parsing work.
+    """
+    clients = getattr(_local, "clients", None)
+    if clients is None or _local.generation != _generation:
+        clients = _local.clients = {}
+        _local.generation = _generation
+    key = (api, version, id(credentials))
+    cached = clients.get(key)
+    # The credentials are kept with the client so their id cannot be reused by another object.
+    if cached is not None and cached[0] is credentials:
+        return cached[1]
+    service = build_from_document(discovery_document(api, version), credentials=credentials)
+    clients[key] = (credentials, service)
+    return service
+
+
+def clear_services() -> None:
+    """
+    Drops the clients of every thread, e.g. after the user re-authenticated.
+    Each thread builds new ones on its next get_service call.
+    """
+    global _generation
+    with _documents_lock:
+        _generation += 1
+
+
+def clear_thread_services() -> None:
+    """Drops only the calling thread's clients, e.g. when a pool thread moves on to another account."""
+    _local.clients = {}
+
+
+class TTLCache:
+    """A small thread-safe cache whose entries expire `ttl` seconds after they were stored."""
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._clock() >= entry[0]:
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,72 @@
+# ------------------------------------------------------------------------
+# allocator.py – places all busy blocks of a horizon in one sweep
+# ------------------------------------------------------------------------
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, List, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class BlockRequest:
+    """A busy block to place at `start` or as soon after it as the calendar allows."""
+    summary: str
+    start: datetime
+    duration: timedelta
+
+
+@dataclass(frozen=True)
+class Allocation:
+    request: BlockRequest
+    start: datetime
+
+    @property
+    def end(self) -> datetime:
+        return self.start + self.request.duration
+
+
+def merge_intervals(intervals: Iterable[Tuple[datetime, datetime]]) -> List[Tuple[datetime, datetime]]:
+    """Sorts intervals and coalesces the overlapping or touching ones."""
+    merged: List[Tuple[datetime, datetime]] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def allocate(busy: Iterable[Tuple[datetime, datetime]], requests: Sequence[BlockRequest]) -> List[Allocation]:
+    """
+    Assigns every request the earliest slot at or after its start that
+    overlaps neither a busy interval nor a block allocated before it.
+
+    Requests are placed in the order of their start, so blocks keep that
+    order and never collide with each other. One sweep over the merged busy
+    intervals serves all requests, O((n + m) log(n + m)) for n intervals and
+    m requests, for any horizon from one day to many.
+
+    Returns the allocations in the order of `requests`.
+    """
+    merged = merge_intervals(busy)
+    order = sorted(range(len(requests)), key=lambda i: requests[i].start)
+    allocations: List[Allocation] = [None] * len(requests)  # type: ignore[list-item]
+    i = 0
+    previous_end = None
+    for index in order:
+        request = requests[index]
+        slot = request.start if previous_end is None else max(request.start, previous_end)
+        while i < len(merged):
+            busy_start, busy_end = merged[i]
+            if busy_end <= slot:
+                i += 1
+            elif busy_start < slot + request.duration:
+                # Overlaps this interval: try right after it.
+                slot = busy_end
+                i += 1
+            else:
+                break
+        allocations[index] = Allocation(request, slot)
+        previous_end = slot + request.duration
+    return allocations
@@ -0,0 +1,127 @@
+# ------------------------------------------------------------------------
+# async_service.py – asyncio counterpart of CalendarService
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, TypeVar
+
+from .base import CalendarService
+
+T = TypeVar("T")
+
+# Calendar calls that may be in flight at once when no limit is given.
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncCalendarService(ABC):
+    """
+    Abstract base class for calendar services used from asyncio code.
+    Mirrors CalendarService with coroutines, so awaiting a call does not
+    tie up the event loop while the calendar answers.
+    """
+
+    @abstractmethod
+    async def get_events(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        """
+        Get all events between two datetimes.
+        """
+
+    @abstractmethod
+    async def create_event(self, summary: str, start_time: datetime, end_time: datetime, description: str) -> Dict[str, Any]:
+        """
+        Create a new event.
+        """
+
+    @abstractmethod
+    async def delete_event(self, event_id: str) -> None:
+        """
+        Delete an event by its ID.
+        """
+
+    @abstractmethod
+    async def find_first_available_slot(self, start_time: datetime, duration_minutes: int) -> datetime:
+        """
+        Find the first available slot for an event.
+        """
+
+    @abstractmethod
+    async def add_event(self, start_time: datetime, summary: str, duration_minutes: int) -> bool:
+        """
+        Adds a busy block at the first available slot at or after start_time.
+        Returns False if it was not added, e.g. because it already exists.
+        """
+
+
+class ThreadedCalendarService(AsyncCalendarService):
+    """
+    Runs an existing CalendarService in a thread pool so it can be awaited.
+
+    Backends that keep per-instance state without locking it (e.g. the
+    Google service's HTTP client and event mirror) are called one at a time,
+    which still lets the calls of many backends overlap. Backends that set
+    `thread_safe` run their calls concurrently as well.
+    """
+
+    def __init__(self, service: CalendarService, executor: Optional[ThreadPoolExecutor] = None, max_workers: int = DEFAULT_CONCURRENCY):
+        self.service = service
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="calendar")
+        self._lock = None if service.thread_safe else threading.Lock()
+
+    def _call(self, method: Callable[..., T], *args) -> T:
+        if self._lock is None:
+            return method(*args)
+        with self._lock:
+            return method(*args)
+
+    async def _run(self, method: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, method, *args)
+
+    async def get_events(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        return await self._run(self.service.get_events, start_time, end_time)
+
+    async def create_event(self, summary: str, start_time: datetime, end_time: datetime, description: str) -> Dict[str, Any]:
+        return await self._run(self.service.create_event, summary, start_time, end_time, description)
+
+    async def delete_event(self, event_id: str) -> None:
+        await self._run(self.service.delete_event, event_id)
+
+    async def find_first_available_slot(self, start_time: datetime, duration_minutes: int) -> datetime:
+        return await self._run(self.service.find_first_available_slot, start_time, duration_minutes)
+
+    async def add_event(self, start_time: datetime, summary: str, duration_minutes: int) -> bool:
+        return await self._run(self.service.add_event, start_time, summary, duration_minutes)
+
+    async def call(self, function: Callable[..., T], *args) -> T:
+        """
+        Runs `function(service, *args)` in the pool, one call like the others,
+        for work that makes several calls to the service in a row.
+        """
+        return await self._run(function, self.service, *args)
+
+    def close(self) -> None:
+        """Shuts down the thread pool if this adapter created it."""
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+
+
+async def gather_bounded(awaitables: Iterable[Awaitable[T]], limit: int = DEFAULT_CONCURRENCY,
+                         return_exceptions: bool = False) -> List[T]:
+    """
+    Like asyncio.gather, but with at most `limit` of the coroutines running at
+    once, so fanning out over many prayers or users cannot flood a calendar
+    with requests. Results are returned in the order of `awaitables`.
+    """
+    if limit < 1:
+        raise ValueError(f"limit must be at least 1, got {limit}")
+    semaphore = asyncio.Semaphore(limit)
+
+    async def bounded(awaitable: Awaitable[T]) -> T:
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(bounded(awaitable) for awaitable in awaitables), return_exceptions=return_exceptions)
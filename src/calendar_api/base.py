@@ -1,12 +1,29 @@
 from abc import ABC, abstractmethod
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Sequence
+
+from .allocator import BlockRequest
+
+# Where slot finding reads busy times from: the listed events of the
+# calendar, or the bare busy intervals of a free/busy query.
+SLOT_SOURCES = ("events", "freebusy")
 
 class CalendarService(ABC):
     """
     Abstract base class for calendar services.
     """
 
+    slot_source: str = "events"
+    # Whether the methods may be called from several threads at once.
+    thread_safe: bool = False
+    # Event bodies whose write failed at the last end_refresh, for services that defer writes to it.
+    last_failed_writes: Sequence[Dict[str, Any]] = ()
+
+    @property
+    def calendar_key(self) -> str:
+        """Identifies the calendar busy blocks are written to, e.g. to remember what was written to it."""
+        return type(self).__name__
+
     @abstractmethod
     def get_events(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
         """
@@ -35,9 +52,49 @@ class CalendarService(ABC):
         """
         pass
 
+    @abstractmethod
+    def add_event(self, start_time: datetime, summary: str, duration_minutes: int) -> bool:
+        """
+        Adds a busy block at the first available slot at or after start_time.
+        Returns False if it was not added, e.g. because it already exists.
+        """
+        pass
+
+    def add_events(self, requests: Sequence[BlockRequest]) -> List[bool]:
+        """
+        Adds several busy blocks, returning add_event's result for each
+        request. Services may override this to place them all at once.
+        """
+        return [
+            self.add_event(request.start, request.summary, request.duration.total_seconds() / 60)
+            for request in requests
+        ]
+
+    def reconcile(self, requests: Sequence[BlockRequest], start_time: datetime, end_time: datetime) -> int:
+        """
+        Deletes the busy blocks this app created between the two datetimes
+        that the planned `requests` supersede (see tags.superseded_blocks).
+        Returns how many were deleted.
+        """
+        return 0
+
     @abstractmethod
     def setup_credentials(self) -> None:
         """
         Setup credentials for the service.
         """
         pass
+
+    # Optional hooks: a no-op for services that keep nothing per refresh.
+    def begin_refresh(self) -> None:  # noqa: B027
+        """
+        Marks the start of a schedule refresh. Services may cache what they
+        read from the calendar until `end_refresh` is called.
+        """
+        pass
+
+    def end_refresh(self) -> None:  # noqa: B027
+        """
+        Marks the end of a schedule refresh and drops anything cached for it.
+        """
+        pass
@@ -0,0 +1,185 @@
+# ------------------------------------------------------------------------
+# batch.py – writes many calendar changes in one batch HTTP round trip
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from googleapiclient.errors import HttpError
+
+from src.config.security import LOG
+from src.shared.backoff import exponential_backoff
+from .rate_limit import RateLimiter, is_retriable
+
+# Google accepts at most 50 calls per calendar batch request.
+MAX_BATCH_SIZE = 50
+
+
+@dataclass
+class BatchOperation:
+    key: str
+    kind: str  # "insert", "update" or "delete"
+    event_id: Optional[str] = None
+    body: Optional[Dict[str, Any]] = None
+
+
+@dataclass
+class BatchResult:
+    operation: BatchOperation
+    response: Optional[Dict[str, Any]] = None
+    error: Optional[Exception] = None
+    attempts: int = 0
+
+    @property
+    def key(self) -> str:
+        return self.operation.key
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def new_event_id() -> str:
+    """
+    A client-chosen event id (lower-case hex is valid base32hex, as Google
+    requires). An insert that carries one can be sent again safely: if an
+    earlier attempt was applied, Google answers 409 instead of creating a
+    second event.
+    """
+    return uuid.uuid4().hex
+
+
+def _already_gone(operation: BatchOperation, error: Exception) -> bool:
+    return operation.kind == "delete" and isinstance(error, HttpError) and error.status_code in {404, 410}
+
+
+def _already_created(result: "BatchResult", error: Exception) -> bool:
+    # Only a retry can collide with the id chosen for the insert: the response to an earlier attempt was lost.
+    return (result.operation.kind == "insert" and result.attempts > 1
+            and isinstance(error, HttpError) and error.status_code == 409)
+
+
+class CalendarBatch:
+    """
+    Collects event inserts, updates and deletes and sends them with
+    `new_batch_http_request`, up to MAX_BATCH_SIZE per round trip.
+
+    `execute` returns one BatchResult per queued operation, keyed by the key
+    returned when it was queued. Items that failed with a retriable error
+    are sent again, in a new batch, with exponential backoff; the others
+    keep their error in the result. Inserts get a client-chosen event id
+    first, so re-sending one whose response was lost cannot duplicate it.
+
+    With a `limiter`, every item takes a token of `user`'s quota before its
+    chunk is sent, and retries also honour the `Retry-After` of the errors.
+
+    `client` returns the API client to send with. It is called for every
+    round trip, so a batch sent from another thread uses that thread's.
+    """
+
+    def __init__(self, client: Callable[[], Any], calendar_id: str = 'primary', max_attempts: int = 3,
+                 base_delay: timedelta = timedelta(seconds=1), max_delay: timedelta = timedelta(seconds=30),
+                 api_calls: Optional[Counter] = None, sleep: Callable[[float], None] = time.sleep,
+                 limiter: Optional[RateLimiter] = None, user: str = "default"):
+        self.client = client
+        self.limiter = limiter
+        self.user = user
+        self.calendar_id = calendar_id
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.api_calls = api_calls if api_calls is not None else Counter()
+        self._sleep = sleep
+        self._operations: List[BatchOperation] = []
+
+    def __len__(self) -> int:
+        return len(self._operations)
+
+    def insert(self, body: Dict[str, Any], key: Optional[str] = None) -> str:
+        if 'id' not in body:
+            body = dict(body, id=new_event_id())
+        return self._queue(BatchOperation(key or uuid.uuid4().hex, "insert", body=body))
+
+    def update(self, event_id: str, body: Dict[str, Any], key: Optional[str] = None) -> str:
+        return self._queue(BatchOperation(key or uuid.uuid4().hex, "update", event_id=event_id, body=body))
+
+    def delete(self, event_id: str, key: Optional[str] = None) -> str:
+        return self._queue(BatchOperation(key or uuid.uuid4().hex, "delete", event_id=event_id))
+
+    def _queue(self, operation: BatchOperation) -> str:
+        if any(queued.key == operation.key for queued in self._operations):
+            raise ValueError(f"Batch operation key '{operation.key}' is already queued.")
+        self._operations.append(operation)
+        return operation.key
+
+    def _request(self, client, operation: BatchOperation):
+        events = client.events()
+        if operation.kind == "insert":
+            return events.insert(calendarId=self.calendar_id, body=operation.body)
+        if operation.kind == "update":
+            return events.update(calendarId=self.calendar_id, eventId=operation.event_id, body=operation.body)
+        return events.delete(calendarId=self.calendar_id, eventId=operation.event_id)
+
+    def execute(self) -> Dict[str, BatchResult]:
+        """Sends every queued operation and empties the batch."""
+        operations, self._operations = self._operations, []
+        results = {op.key: BatchResult(op) for op in operations}
+        pending = operations
+
+        for attempt in range(self.max_attempts):
+            if not pending:
+                break
+            if attempt:
+                if self.limiter is not None:
+                    delay = timedelta(seconds=max(self.limiter.retry_delay(results[op.key].error, attempt - 1) for op in pending))
+                    self.limiter.record_retry(self.user, delay.total_seconds(), len(pending))
+                else:
+                    delay = exponential_backoff(attempt - 1, self.base_delay, self.max_delay)
+                LOG.warning(f"Retrying {len(pending)} failed calendar batch item(s) in {delay.total_seconds():.1f}s (attempt {attempt + 1}/{self.max_attempts}).")
+                self._sleep(delay.total_seconds())
+
+            retry = []
+            for start in range(0, len(pending), MAX_BATCH_SIZE):
+                chunk = pending[start:start + MAX_BATCH_SIZE]
+                self._send(chunk, results)
+                retry.extend(op for op in chunk if results[op.key].error is not None and is_retriable(results[op.key].error))
+            pending = retry
+
+        if pending and self.limiter is not None:
+            self.limiter.record_failure(self.user, len(pending))
+        failed = [result for result in results.values() if not result.ok]
+        if failed:
+            LOG.error(f"{len(failed)} of {len(results)} calendar batch item(s) failed: {failed[0].error}")
+        return results
+
+    def _send(self, chunk: List[BatchOperation], results: Dict[str, BatchResult]) -> None:
+        def on_response(request_id, response, exception):
+            result = results[request_id]
+            if exception is not None and _already_gone(result.operation, exception):
+                exception = None
+            elif exception is not None and _already_created(result, exception):
+                response, exception = result.operation.body, None
+            result.response, result.error = response, exception
+
+        if self.limiter is not None:
+            self.limiter.acquire(self.user, len(chunk))
+        client = self.client()
+        batch = client.new_batch_http_request(callback=on_response)
+        for op in chunk:
+            results[op.key].attempts += 1
+            results[op.key].error = RuntimeError("No response for this item in the batch reply.")
+            self.api_calls[f"events.{op.kind}"] += 1
+            batch.add(self._request(client, op), request_id=op.key)
+
+        self.api_calls["batch"] += 1
+        try:
+            batch.execute()
+        except Exception as e:
+            # The round trip itself failed, none of the items got a response.
+            LOG.warning(f"Calendar batch request failed: {e}")
+            for op in chunk:
+                results[op.key].response, results[op.key].error = None, e
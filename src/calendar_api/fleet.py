@@ -0,0 +1,185 @@
+# ------------------------------------------------------------------------
+# fleet.py – syncs the busy blocks of many users' calendars side by side
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from src.config.security import LOG, TZ
+from src.auth.service_factory import clear_thread_services
+from src.shared.clock import Clock, SystemClock
+
+from .allocator import BlockRequest
+from .async_service import DEFAULT_CONCURRENCY, ThreadedCalendarService, gather_bounded
+from .base import CalendarService
+from .google_calendar import GoogleCalendarService
+from .plan_store import PlanStore, plan_date
+from .rate_limit import PROJECT_BURST, PROJECT_RATE, USER_BURST, USER_RATE, RateLimiter
+from .sync import planned_writes, write_blocks
+
+
+@dataclass(frozen=True)
+class FleetUser:
+    """One account of the fleet. `user` names it in logs, stats and quotas."""
+    user: str
+    creds: Any
+    calendar_id: str = 'primary'
+    busy_calendar_ids: Tuple[str, ...] = ()
+
+
+@dataclass
+class UserSyncStats:
+    """How one user's sync went. `skipped` means the plan was already written."""
+    user: str
+    ok: bool = False
+    skipped: bool = False
+    blocks: int = 0
+    duration_s: float = 0.0
+    api_calls: int = 0
+    throttle_wait_s: float = 0.0
+    retries: int = 0
+    error: Optional[str] = None
+
+
+@dataclass
+class FleetReport:
+    stats: List[UserSyncStats]
+    elapsed_s: float
+
+    @property
+    def failed(self) -> List[UserSyncStats]:
+        return [stats for stats in self.stats if not stats.ok]
+
+    @property
+    def slowest(self) -> Optional[UserSyncStats]:
+        return max(self.stats, key=lambda stats: stats.duration_s, default=None)
+
+
+def fair_limiter(workers: int) -> RateLimiter:
+    """
+    A limiter whose per-user quota is at most an equal share of the project
+    quota among `workers` users syncing at once, so no user's calls can
+    crowd out the others'.
+    """
+    return RateLimiter(user_rate=min(USER_RATE, PROJECT_RATE / workers),
+                       user_burst=max(1.0, min(USER_BURST, PROJECT_BURST / workers)))
+
+
+class FleetSync:
+    """
+    Runs the daily busy block sync for many accounts through a pool of
+    `workers` threads, so the total time grows with the number of users
+    divided by the pool size rather than with the number of users. The
+    users are fanned out with gather_bounded, and each user's calendar work
+    runs in the pool through a ThreadedCalendarService.
+
+    Every user gets their own calendar service, and with it their own HTTP
+    client and event mirror. All services share one limiter, which keeps the
+    project quota and gives every user their own quota bucket. A user whose
+    sync fails is recorded and the others carry on; a slow one only holds
+    its own worker, and `run` stops waiting for it after `timeout`.
+
+    `plan_for` returns a user's planned blocks for the day, like the
+    scheduler's plan: blocks already begun are kept in the plan but not added.
+    """
+
+    def __init__(self, users: Sequence[FleetUser], plan_for: Callable[[FleetUser], Sequence[BlockRequest]],
+                 workers: int = DEFAULT_CONCURRENCY, limiter: Optional[RateLimiter] = None,
+                 plan_store: Optional[PlanStore] = None,
+                 service_factory: Optional[Callable[[FleetUser, RateLimiter], CalendarService]] = None,
+                 clock: Optional[Clock] = None):
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        self.users = list(users)
+        self.plan_for = plan_for
+        self.workers = workers
+        self.limiter = limiter or fair_limiter(workers)
+        self.plan_store = plan_store
+        self.service_factory = service_factory or _google_service
+        self.clock = clock or SystemClock(TZ)
+
+    async def sync_user(self, user: FleetUser, executor: ThreadPoolExecutor) -> UserSyncStats:
+        """Syncs one user's calendar with their plan in `executor`. Never raises: failures are recorded in the stats."""
+        stats = UserSyncStats(user.user)
+        metrics_before = Counter(self.limiter.user_metrics.get(user.user, {}))
+        started = time.perf_counter()
+        service = None
+        try:
+            service = await asyncio.get_running_loop().run_in_executor(executor, self.service_factory, user, self.limiter)
+            await ThreadedCalendarService(service, executor).call(self._write_plan, user, stats)
+        except Exception as e:
+            stats.error = str(e) or type(e).__name__
+            LOG.error(f"Calendar sync for {user.user} failed: {e}")
+        stats.duration_s = time.perf_counter() - started
+        api_calls = getattr(service, 'api_calls', None)
+        stats.api_calls = sum(api_calls.values()) if isinstance(api_calls, Counter) else 0
+        metrics = self.limiter.user_metrics.get(user.user, Counter()) - metrics_before
+        stats.throttle_wait_s = metrics.get("throttle_wait_s", 0.0)
+        stats.retries = int(metrics.get("retried", 0))
+        return stats
+
+    def _write_plan(self, service: CalendarService, user: FleetUser, stats: UserSyncStats) -> None:
+        """Brings one user's calendar in line with their plan, on a pool thread."""
+        try:
+            planned = sorted(self.plan_for(user), key=lambda request: request.start)
+            now = self.clock.now()
+            requests = [request for request in planned if request.start >= now]
+            writes = planned_writes(service, planned, requests, self.plan_store)
+            if not writes.needed:
+                stats.ok = stats.skipped = True
+                return
+            stats.ok = write_blocks(service, writes.requests, writes.cleanup)
+            stats.blocks = len(writes.requests) - len(service.last_failed_writes)
+            if stats.ok and writes.diff is not None:
+                self.plan_store.save(service.calendar_key, plan_date(planned), planned)
+            elif not stats.ok:
+                stats.error = "calendar writes failed"
+        finally:
+            if self.service_factory is _google_service:
+                # Clients are cached per thread; a pool thread serves many users over time.
+                clear_thread_services()
+
+    def run(self, timeout: Optional[float] = None) -> FleetReport:
+        """
+        Syncs all users and returns their stats in the order of `users`.
+        Users not done after `timeout` seconds are reported as failed and
+        left to finish in the background.
+        """
+        started = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="fleet-sync")
+        try:
+            results = asyncio.run(self._sync_all(executor, timeout))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        stats = [result or UserSyncStats(user.user, duration_s=time.perf_counter() - started,
+                                         error=f"not done after {timeout:.0f}s")
+                 for user, result in zip(self.users, results)]
+        report = FleetReport(stats, time.perf_counter() - started)
+        LOG.info(f"Synced {len(stats) - len(report.failed)}/{len(stats)} calendar(s) with {self.workers} worker(s) "
+                 f"in {report.elapsed_s:.1f}s; {len(report.failed)} failed.")
+        for failed in report.failed:
+            LOG.warning(f"Calendar sync for {failed.user} did not complete: {failed.error}")
+        return report
+
+    async def _sync_all(self, executor: ThreadPoolExecutor, timeout: Optional[float]) -> List[Optional[UserSyncStats]]:
+        results: List[Optional[UserSyncStats]] = [None] * len(self.users)
+
+        async def sync(index: int, user: FleetUser) -> None:
+            results[index] = await self.sync_user(user, executor)
+
+        try:
+            await asyncio.wait_for(gather_bounded([sync(i, user) for i, user in enumerate(self.users)], limit=self.workers),
+                                   timeout)
+        except asyncio.TimeoutError:
+            pass
+        return results
+
+
+def _google_service(user: FleetUser, limiter: RateLimiter) -> CalendarService:
+    return GoogleCalendarService(user.creds, calendar_id=user.calendar_id, busy_calendar_ids=user.busy_calendar_ids,
+                                 limiter=limiter, quota_user=user.user)
@@ -0,0 +1,47 @@
+# ------------------------------------------------------------------------
+# freebusy.py – busy intervals from the Calendar freebusy.query API
+# ------------------------------------------------------------------------
+from __future__ import annotations
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from src.config.security import LOG
+from .rate_limit import RateLimiter, execute
+from .snapshot import parse_rfc3339
+
+UTC = ZoneInfo("UTC")
+
+
+def query_busy_intervals(service, calendar_ids: Sequence[str], time_min: datetime, time_max: datetime,
+                         api_calls: Optional[Counter] = None, limiter: Optional[RateLimiter] = None,
+                         user: str = "default") -> List[Tuple[datetime, datetime]]:
+    """
+    Returns the busy intervals of all `calendar_ids` between `time_min` and
+    `time_max` as UTC (start, end) pairs ordered by start, from a single
+    freebusy.query. Unlike events.list the response carries only the times,
+    not summaries, descriptions or attendees.
+
+    A calendar the query reports errors for (e.g. not shared with the user)
+    is logged and left out.
+    """
+    if api_calls is not None:
+        api_calls["freebusy.query"] += 1
+    response = execute(service.freebusy().query(body={
+        'timeMin': time_min.isoformat(),
+        'timeMax': time_max.isoformat(),
+        'items': [{'id': calendar_id} for calendar_id in calendar_ids],
+    }), limiter, user)
+
+    intervals = []
+    for calendar_id, calendar in response.get('calendars', {}).items():
+        for error in calendar.get('errors', []):
+            LOG.warning(f"Free/busy query failed for calendar {calendar_id}: {error.get('reason')}")
+        for busy in calendar.get('busy', []):
+            try:
+                intervals.append((parse_rfc3339(busy['start']).astimezone(UTC), parse_rfc3339(busy['end']).astimezone(UTC)))
+            except (KeyError, ValueError) as e:
+                LOG.error(f"Skipping malformed busy interval {busy}: {e}")
+    intervals.sort()
+    return intervals
@@ -1,42 +1,241 @@
+import hashlib
+import heapq
+from collections import Counter
+from dataclasses import replace
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
 from zoneinfo import ZoneInfo
 
-from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
 from src.config.security import LOG
+from src.auth.service_factory import get_service
+
+from .allocator import BlockRequest, allocate
+from .base import CalendarService, SLOT_SOURCES
+from .batch import CalendarBatch, new_event_id
+from .freebusy import query_busy_intervals
+from .mirror import EventMirror
+from .rate_limit import RateLimiter, shared_limiter
+from .snapshot import EVENT_FIELDS, DaySnapshot, busy_times, first_fit
+from .tags import is_block_for, prayer_date_of, schedule_hash, stamp, superseded_blocks, tag_filter
 
-from .base import CalendarService
+def _as_utc(start_time: datetime) -> datetime:
+    """Treats naive datetimes as UTC and converts aware ones to UTC."""
+    utc_zone = ZoneInfo("UTC")
+    if start_time.tzinfo is None:
+        return start_time.replace(tzinfo=utc_zone)
+    return start_time.astimezone(utc_zone)
 
 class GoogleCalendarService(CalendarService):
     """
     Google Calendar implementation of the CalendarService.
+
+    With slot_source="freebusy", slots are found from a freebusy.query
+    instead of the event mirror, and only the summaries and times of the
+    app's own blocks of the day are listed for the duplicate check. That
+    costs 2 round trips per day searched, where the mirror needs one delta
+    sync per refresh: freebusy receives fewer bytes than a full list of a
+    busy day, but is slower where round trips dominate.
+
+    Busy blocks are written to `calendar_id`. Slot finding also avoids the
+    busy times of `busy_calendar_ids`, e.g. a separate work calendar, which
+    are fetched for all of them in one freebusy.query per day.
+
+    Every call goes through `limiter`, by default the one shared by all
+    services of the process, which keeps the project and per-user quotas and
+    retries rate-limited calls. The quota user is `quota_user`, by default
+    the target calendar; services of different accounts, which may all
+    write to 'primary', need their own.
     """
 
-    def __init__(self, creds):
+    def __init__(self, creds, slot_source: str = "events", calendar_id: Optional[str] = None,
+                 busy_calendar_ids: Sequence[str] = (), limiter: Optional[RateLimiter] = None,
+                 quota_user: Optional[str] = None):
+        if slot_source not in SLOT_SOURCES:
+            raise ValueError(f"Unknown slot source '{slot_source}', expected one of {SLOT_SOURCES}.")
         self.creds = creds
-        self.service = None
+        self.slot_source = slot_source
+        self.calendar_id = calendar_id or 'primary'
+        self.busy_calendar_ids = [cid for cid in dict.fromkeys(busy_calendar_ids) if cid != self.calendar_id]
+        self.limiter = limiter or shared_limiter()
+        self.user = quota_user or self.calendar_id
+        # API requests made by this service, by method, e.g. {"events.list": 3}.
+        self.api_calls: Counter = Counter()
+        self.last_refresh_api_calls: Counter = Counter()
+        self._calls_at_refresh_start: Counter = Counter()
+        # Day snapshots of the refresh in progress, keyed by the UTC start of the day. None outside a refresh.
+        self._snapshots: Optional[Dict[datetime, DaySnapshot]] = None
+        # Busy blocks queued during the refresh in progress, written in one batch by end_refresh.
+        self._pending_writes: Optional[CalendarBatch] = None
+        self._mirror_synced = False
+        self.mirror: Optional[EventMirror] = None
         self.setup_credentials()
 
+    @property
+    def service(self):
+        """
+        The calling thread's Calendar API client. The service is built on one
+        thread and used from others, e.g. the write-behind worker, and
+        httplib2 clients must not be shared between threads.
+        """
+        return get_service("calendar", "v3", self.creds)
+
     def setup_credentials(self) -> None:
         try:
-            self.service = build("calendar", "v3", credentials=self.creds)
+            # Builds this thread's client now, so unusable credentials are reported at startup.
+            get_service("calendar", "v3", self.creds)
+            self.mirror = EventMirror(lambda: self.service, calendar_id=self.calendar_id, api_calls=self.api_calls,
+                                      limiter=self.limiter, user=self.user)
         except Exception as error:
             LOG.error(f"An error occurred: {error}")
 
-    def get_events(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
-        LOG.debug(f"get_events: Fetching events from {start_time.isoformat()} to {end_time.isoformat()}")
-        events_result = self.service.events().list(
-            calendarId='primary',
+    @property
+    def calendar_key(self) -> str:
+        # 'primary' is a different calendar for every account; a new sign-in brings a new refresh token.
+        token = getattr(self.creds, 'refresh_token', None)
+        account = hashlib.sha256((token if isinstance(token, str) else '').encode('utf-8')).hexdigest()[:12]
+        return f"google:{account}:{self.calendar_id}"
+
+    def batch(self) -> CalendarBatch:
+        """Returns an empty batch of writes to this calendar, counted in api_calls."""
+        return CalendarBatch(lambda: self.service, calendar_id=self.calendar_id, api_calls=self.api_calls,
+                             limiter=self.limiter, user=self.user)
+
+    def begin_refresh(self) -> None:
+        self._snapshots = {}
+        self._pending_writes = self.batch()
+        self._mirror_synced = False
+        self._calls_at_refresh_start = self.api_calls.copy()
+
+    def end_refresh(self) -> None:
+        self._snapshots = None
+        pending, self._pending_writes = self._pending_writes, None
+        self.last_failed_writes = []
+        if pending:
+            for result in pending.execute().values():
+                body = result.operation.body
+                when = datetime.fromisoformat(body['start']['dateTime']).strftime('%H:%M')
+                if result.ok:
+                    self.mirror.upsert(result.response)
+                    LOG.info(f"📅 Added busy block: {body['summary']} at {when}")
+                else:
+                    self.last_failed_writes.append(body)
+                    LOG.error(f"Failed to add busy block {body['summary']} at {when}: {result.error}")
+        self.last_refresh_api_calls = self.api_calls - self._calls_at_refresh_start
+        LOG.info(f"Calendar refresh made {sum(self.last_refresh_api_calls.values())} API call(s): {dict(self.last_refresh_api_calls)}")
+
+    def _day_snapshot(self, start_time: datetime) -> DaySnapshot:
+        """
+        Returns the events of the UTC day containing `start_time`, read from
+        the mirror. The mirror is synced once per refresh, or on every call
+        outside a refresh, and the snapshot is shared for the whole refresh.
+        With the free/busy slot source the day's busy intervals and summaries
+        are queried instead. The busy times of the other calendars are added
+        in both cases.
+        """
+        day_start = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
+        day_end = day_start + timedelta(days=1)
+        if self._snapshots is not None and day_start in self._snapshots:
+            return self._snapshots[day_start]
+        if self.slot_source == "freebusy":
+            busy = self._busy_intervals(day_start, day_end, include_own=True)
+            snapshot = DaySnapshot(day_start, self.find_own_events(day_start, day_end), busy=busy)
+        else:
+            if self._snapshots is None or not self._mirror_synced or not self.mirror.covers(day_start, day_end):
+                self.mirror.sync(day_start)
+                self._mirror_synced = self._snapshots is not None
+            busy = self._busy_intervals(day_start, day_end, include_own=False)
+            snapshot = DaySnapshot(day_start, self.mirror.events_between(day_start, day_end), busy=busy)
+        if self._snapshots is not None:
+            self._snapshots[day_start] = snapshot
+        return snapshot
+
+    def _busy_intervals(self, start_time: datetime, end_time: datetime, include_own: bool) -> List[Tuple[datetime, datetime]]:
+        """
+        Busy intervals of the other calendars, and of the target calendar if
+        `include_own`, from a single freebusy.query. Empty without a query
+        when there is nothing to ask for.
+        """
+        calendar_ids = ([self.calendar_id] if include_own else []) + self.busy_calendar_ids
+        if not calendar_ids:
+            return []
+        return query_busy_intervals(self.service, calendar_ids, start_time, end_time, api_calls=self.api_calls,
+                                    limiter=self.limiter, user=self.user)
+
+    def iter_events(self, start_time: datetime, end_time: datetime, fields: str = EVENT_FIELDS,
+                    page_size: int = 250, **filters) -> Iterator[Dict[str, Any]]:
+        """
+        Yields the events between two datetimes ordered by start, with only
+        the given event fields. Pages are fetched as the caller consumes
+        them, so a caller that stops early never requests the rest.
+        Extra `filters` are passed to events.list as they are.
+        """
+        params = dict(
+            filters,
+            calendarId=self.calendar_id,
             timeMin=start_time.isoformat(),
             timeMax=end_time.isoformat(),
             singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-        LOG.debug(f"get_events: Received events_result: {events_result}")
-        return events_result.get('items', [])
+            orderBy='startTime',
+            maxResults=page_size,
+            fields=f"nextPageToken,items({fields})",
+        )
+        while True:
+            self.api_calls["events.list"] += 1
+            events_result = self.limiter.execute(self.service.events().list(**params), self.user)
+            items = events_result.get('items', [])
+            LOG.debug(f"iter_events: Received a page of {len(items)} event(s) from {start_time.isoformat()} to {end_time.isoformat()}")
+            yield from items
+            if not events_result.get('nextPageToken'):
+                return
+            params['pageToken'] = events_result['nextPageToken']
 
-    def create_event(self, summary: str, start_time: datetime, end_time: datetime, description: str) -> Dict[str, Any]:
-        event = {
+    def get_events(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        return list(self.iter_events(start_time, end_time))
+
+    def find_own_events(self, start_time: datetime, end_time: datetime, prayer: Optional[str] = None,
+                        prayer_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Lists only the busy blocks this app created, optionally for one prayer
+        or date, with an exact `privateExtendedProperty` query.
+        """
+        return list(self.iter_events(start_time, end_time, privateExtendedProperty=tag_filter(prayer=prayer, prayerDate=prayer_date)))
+
+    def delete_own_events(self, start_time: datetime, end_time: datetime, prayer: Optional[str] = None,
+                          prayer_date: Optional[str] = None) -> int:
+        """Deletes the busy blocks this app created in the window, in one batch. Returns how many were deleted."""
+        deleted = self._delete_in_batch(self.find_own_events(start_time, end_time, prayer=prayer, prayer_date=prayer_date))
+        LOG.info(f"Deleted {deleted} busy block(s) created by the app.")
+        return deleted
+
+    def reconcile(self, requests: Sequence[BlockRequest], start_time: datetime, end_time: datetime) -> int:
+        """
+        Lists the app's blocks in the window with one filtered query and
+        deletes the ones `requests` supersede in one batch.
+        """
+        stale = superseded_blocks(self.find_own_events(_as_utc(start_time), _as_utc(end_time)), requests)
+        deleted = self._delete_in_batch(stale)
+        if stale:
+            LOG.info(f"Reconciled calendar: deleted {deleted} of {len(stale)} superseded busy block(s).")
+        return deleted
+
+    def _delete_in_batch(self, events: Sequence[Dict[str, Any]]) -> int:
+        if not events:
+            return 0
+        batch = self.batch()
+        for event in events:
+            batch.delete(event['id'], key=event['id'])
+        deleted = [key for key, result in batch.execute().items() if result.ok]
+        for event_id in deleted:
+            self.mirror.remove(event_id)
+            for snapshot in (self._snapshots or {}).values():
+                snapshot.remove(event_id)
+        return len(deleted)
+
+    @staticmethod
+    def _event_body(summary: str, start_time: datetime, end_time: datetime, description: str) -> Dict[str, Any]:
+        return {
             'summary': summary,
             'description': description,
             'start': {
@@ -47,128 +246,119 @@ class GoogleCalendarService(CalendarService):
             },
             'visibility': 'private',
         }
-        created_event = self.service.events().insert(calendarId='primary', body=event).execute()
+
+    def _insert(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        # With an id of our own, the limiter's retries cannot create the event twice.
+        body = body if 'id' in body else dict(body, id=new_event_id())
+        self.api_calls["events.insert"] += 1
+        try:
+            created_event = self.limiter.execute(self.service.events().insert(calendarId=self.calendar_id, body=body), self.user)
+        except HttpError as e:
+            if e.status_code != 409:
+                raise
+            # A retry after a lost response: the first attempt created the event.
+            self.api_calls["events.get"] += 1
+            created_event = self.limiter.execute(self.service.events().get(calendarId=self.calendar_id, eventId=body['id']), self.user)
+        self.mirror.upsert(created_event)
         return created_event
 
+    def create_event(self, summary: str, start_time: datetime, end_time: datetime, description: str) -> Dict[str, Any]:
+        return self._insert(self._event_body(summary, start_time, end_time, description))
+
     def delete_event(self, event_id: str) -> None:
-        self.service.events().delete(calendarId='primary', eventId=event_id).execute()
+        self.api_calls["events.delete"] += 1
+        self.limiter.execute(self.service.events().delete(calendarId=self.calendar_id, eventId=event_id), self.user)
+        self.mirror.remove(event_id)
+        for snapshot in (self._snapshots or {}).values():
+            snapshot.remove(event_id)
 
     def find_first_available_slot(self, start_time: datetime, duration_minutes: int) -> datetime:
-        utc_zone = ZoneInfo("UTC")
-        
-        # Ensure start_time is UTC-aware
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=utc_zone)
-        else:
-            start_time = start_time.astimezone(utc_zone)
-
-        day_start = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
-        day_end = day_start + timedelta(days=1)
-        
-        LOG.debug(f"DEBUG (find_first_available_slot): Initial start_time (UTC): {start_time}")
-        LOG.debug(f"DEBUG (find_first_available_slot): day_start (UTC): {day_start}, day_end (UTC): {day_end}")
-
-        events = sorted(self.get_events(day_start, day_end), key=lambda x: (
-            datetime.fromisoformat(x['start']['dateTime']).astimezone(utc_zone) if 'dateTime' in x['start']
-            else datetime.fromisoformat(x['start']['date']).replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=utc_zone)
-        ))
-        LOG.debug(f"DEBUG (find_first_available_slot): Fetched events: {events}")
-
-        current_slot_start = start_time
-
-        for event in events:
-            LOG.debug(f"DEBUG (find_first_available_slot): Current slot start at iteration beginning: {current_slot_start}")
-            event_start_data = event.get('start')
-            event_end_data = event.get('end')
-
-            event_start_str = None
-            if event_start_data and 'dateTime' in event_start_data:
-                event_start_str = event_start_data['dateTime']
-            elif event_start_data and 'date' in event_start_data:
-                event_start_str = event_start_data['date']
-
-            event_end_str = None
-            if event_end_data and 'dateTime' in event_end_data:
-                event_end_str = event_end_data['dateTime']
-            elif event_end_data and 'date' in event_end_data:
-                event_end_str = event_end_data['date']
-
-            LOG.debug(f"DEBUG (find_first_available_slot): Processing event: start_str={event_start_str}, end_str={event_end_str}")
-
-            if not event_start_str or not event_end_str:
-                LOG.debug(f"Skipping event due to missing or empty start/end time data: start={event_start_data}, end={event_end_data}")
-                continue
-
-            if not isinstance(event_start_str, str) or not isinstance(event_end_str, str):
-                LOG.error(f"Skipping event due to non-string start/end time: start={event_start_str} (type: {type(event_start_str)}), end={event_end_str} (type: {type(event_end_str)})")
-                continue
-
-            try:
-                is_all_day_event = 'date' in event_start_data and 'dateTime' not in event_start_data
-
-                if is_all_day_event:
-                    LOG.debug(f"DEBUG (find_first_available_slot): Skipping all-day event: {event.get('summary')}")
-                    continue # Skip all-day events for slot finding
-
-                event_start = datetime.fromisoformat(event_start_str).astimezone(utc_zone)
-                event_end = datetime.fromisoformat(event_end_str).astimezone(utc_zone)
-                LOG.debug(f"DEBUG (find_first_available_slot): Parsed event: start={event_start}, end={event_end}")
-
-            except ValueError as ve:
-                LOG.error(f"Failed to parse event time string '{event_start_str}' or '{event_end_str}': {ve}")
-                continue
+        start_time = _as_utc(start_time)
+        if self._snapshots is None and self.slot_source == "events":
+            # Outside a refresh, stream the events from start_time on and stop at the first fit.
+            day_end = start_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+            busy = busy_times(self.iter_events(start_time, day_end))
+            if self.busy_calendar_ids:
+                busy = heapq.merge(busy, self._busy_intervals(start_time, day_end, include_own=False))
+            return first_fit(busy, start_time, duration_minutes)
+        slot = self._day_snapshot(start_time).first_available_slot(start_time, duration_minutes)
+        LOG.debug(f"find_first_available_slot: First slot at or after {start_time} is {slot}")
+        return slot
 
-            # If the current potential slot ends before the event starts, we found a slot
-            if current_slot_start + timedelta(minutes=duration_minutes) <= event_start:
-                LOG.debug(f"DEBUG (find_first_available_slot): Found slot before event. Returning {current_slot_start}")
-                return current_slot_start
-
-            # If there's an overlap, move the current_slot_start past the end of the current event
-            if current_slot_start < event_end:
-                LOG.debug(f"DEBUG (find_first_available_slot): Overlap detected. Moving current_slot_start from {current_slot_start} to {event_end}")
-                current_slot_start = event_end
-
-        # If no more events, the current_slot_start is available
-        LOG.debug(f"DEBUG (find_first_available_slot): No more events. Returning final current_slot_start: {current_slot_start.astimezone(utc_zone)}")
-        return current_slot_start.astimezone(utc_zone)
-    
     def add_event(self, start_time: datetime, summary: str, duration_minutes: int) -> bool:
         """
-        Creates a busy calendar event.
+        Creates a busy calendar event. During a refresh the event is only
+        queued, and all queued events are written in one batch by end_refresh.
         """
-        utc_zone = ZoneInfo("UTC")
-        if start_time.tzinfo is None:
-            start_time = start_time.replace(tzinfo=utc_zone)
-        else:
-            start_time = start_time.astimezone(utc_zone)
+        start_time = _as_utc(start_time)
+        prayer_date = prayer_date_of(start_time)
 
-        # Find the first available slot for the event
-        actual_start_time = self.find_first_available_slot(start_time, duration_minutes)
+        # Slot finding and the duplicate check share one listing of the day
+        snapshot = self._day_snapshot(start_time)
+        actual_start_time = snapshot.first_available_slot(start_time, duration_minutes)
         actual_slot_end = actual_start_time + timedelta(minutes=duration_minutes)
 
         try:
-            # First, check if an event with the same summary already exists for that day
-            day_start = start_time.replace(hour=0, minute=0, second=0, microsecond=0)
-            day_end = day_start + timedelta(days=1)
-            events = self.get_events(day_start, day_end)
-            for event in events:
-                event_start_datetime_str = event.get('start', {}).get('dateTime')
-                if event_start_datetime_str:
-                    try:
-                        event_start_datetime = datetime.fromisoformat(event_start_datetime_str).astimezone(utc_zone)
-                        if event.get('summary', '').lower() == summary.lower() and \
-                           event_start_datetime.day == actual_start_time.day:
-                            LOG.info(f"Event '{summary}' at {actual_start_time.strftime('%H:%M')} already exists in Calendar for today. Skipping re-adding it.")
-                            return False
-                    except ValueError:
-                        LOG.warning(f"Could not parse event start time: {event_start_datetime_str}")
-                        continue
-
-            self.create_event(summary, actual_start_time, actual_slot_end, "Scheduled by Prayer App")
+            # First, check if this prayer's block already exists for that day
+            if any(is_block_for(event, summary, prayer_date) for event in snapshot.events()):
+                LOG.info(f"Event '{summary}' at {actual_start_time.strftime('%H:%M')} already exists in Calendar for today. Skipping re-adding it.")
+                return False
+
+            body = stamp(self._event_body(summary, actual_start_time, actual_slot_end, "Scheduled by Prayer App"),
+                         summary, prayer_date, schedule_hash(summary, start_time, timedelta(minutes=duration_minutes)))
+            if self._pending_writes is not None:
+                self._pending_writes.insert(body)
+                snapshot.add(body)
+                LOG.debug(f"Queued busy block: {summary} at {actual_start_time.strftime('%H:%M')}-{actual_slot_end.strftime('%H:%M')}")
+                return True
+
+            created_event = self._insert(body)
+            # Later prayers of this refresh must see the new block without listing the day again
+            snapshot.add(created_event)
             LOG.info(f"📅 Added busy block: {summary} at {actual_start_time.strftime('%H:%M')}-{actual_slot_end.strftime('%H:%M')}")
             return True
         except Exception as e:
             LOG.error(f"Failed to add busy block: {e}")
             return False
-    
-    
+
+    def add_events(self, requests: Sequence[BlockRequest]) -> List[bool]:
+        """
+        Places all busy blocks in one sweep over the busy times of the days
+        they fall on, so the blocks never collide with each other or with
+        existing events. Blocks whose summary already exists on their day are
+        skipped. The blocks are written in one batch, at end_refresh during a
+        refresh or right away otherwise.
+        """
+        if self._snapshots is None:
+            self.begin_refresh()
+            try:
+                return self.add_events(requests)
+            finally:
+                self.end_refresh()
+
+        results = [False] * len(requests)
+        snapshots: Dict[datetime, DaySnapshot] = {}
+        seen = set()
+        to_place = []
+        for index, request in enumerate(requests):
+            request = replace(request, start=_as_utc(request.start))
+            prayer_date = prayer_date_of(request.start)
+            snapshot = self._day_snapshot(request.start)
+            snapshots[snapshot.day_start] = snapshot
+            key = (request.summary.lower(), prayer_date)
+            if key in seen or any(is_block_for(event, request.summary, prayer_date) for event in snapshot.events()):
+                LOG.info(f"Event '{request.summary}' at {request.start.strftime('%H:%M')} already exists in Calendar for today. Skipping re-adding it.")
+                continue
+            seen.add(key)
+            to_place.append((index, request, snapshot, prayer_date))
+
+        busy = [interval for snapshot in snapshots.values() for interval in snapshot.busy_intervals()]
+        allocations = allocate(busy, [request for _, request, _, _ in to_place])
+        for (index, request, snapshot, prayer_date), allocation in zip(to_place, allocations):
+            body = stamp(self._event_body(request.summary, allocation.start, allocation.end, "Scheduled by Prayer App"),
+                         request.summary, prayer_date, schedule_hash(request.summary, request.start, request.duration))
+            self._pending_writes.insert(body)
+            snapshot.add(body)
+            results[index] = True
+            LOG.debug(f"Queued busy block: {request.summary} at {allocation.start.strftime('%H:%M')}-{allocation.end.strftime('%H:%M')}")
+        return results
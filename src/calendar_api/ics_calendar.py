@@ -0,0 +1,348 @@
+# ------------------------------------------------------------------------
+# ics_calendar.py – busy blocks kept in a local iCalendar (.ics) file
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import os
+import tempfile
+import threading
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo
+
+from src.config.security import LOG, TZ
+from src.shared.clock import Clock, SystemClock
+
+from .allocator import BlockRequest
+from .base import CalendarService
+from .snapshot import busy_times, first_fit, parse_event_times
+from .tags import APP_ID, app_tag, is_block_for, prayer_date_of, schedule_hash, stamp, superseded_blocks
+
+UTC = ZoneInfo("UTC")
+
+PRODID = "-//Prayer Player//Busy Blocks//EN"
+CALENDAR_NAME = "Prayer Times"
+# Blocks that ended longer ago than this are dropped from the file.
+RETENTION = timedelta(days=30)
+
+# The private tag properties of an event and the iCalendar properties they are stored in.
+_TAG_PROPERTIES = {
+    'prayer': 'X-PRAYER-PLAYER-PRAYER',
+    'prayerDate': 'X-PRAYER-PLAYER-DATE',
+    'scheduleHash': 'X-PRAYER-PLAYER-HASH',
+}
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value.astimezone(UTC) if value.tzinfo else value.replace(tzinfo=UTC)
+
+
+def block_uid(prayer: str, prayer_date: date) -> str:
+    """The UID of a prayer's block on a date; the same block keeps it across every rewrite and update."""
+    return f"{prayer_date.isoformat()}-{prayer.lower()}@{APP_ID}"
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def _unescape(text: str) -> str:
+    out, chars = [], iter(text)
+    for char in chars:
+        if char == '\\':
+            char = next(chars, '')
+            out.append('\n' if char in 'nN' else char)
+        else:
+            out.append(char)
+    return ''.join(out)
+
+
+def _fold(line: str) -> str:
+    """Splits a content line into lines of at most 75 octets, as RFC 5545 requires."""
+    encoded = line.encode('utf-8')
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Never split a multi-byte character.
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _format_time(value: datetime) -> str:
+    return value.astimezone(UTC).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _parse_time(value: str) -> datetime:
+    """Parses a DATE-TIME value in UTC ('...Z') or floating time, which is taken as local time."""
+    if value.endswith('Z'):
+        return datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(tzinfo=UTC)
+    return datetime.strptime(value, '%Y%m%dT%H%M%S').replace(tzinfo=TZ)
+
+
+def serialize_event(event: Dict[str, Any], stamped_at: datetime) -> str:
+    """Renders an event in the Calendar API's shape as a folded VEVENT block."""
+    start, end = parse_event_times(event)
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:{event['id']}",
+        f"DTSTAMP:{_format_time(stamped_at)}",
+        f"DTSTART:{_format_time(start)}",
+        f"DTEND:{_format_time(end)}",
+        f"SUMMARY:{_escape(event.get('summary', ''))}",
+    ]
+    if event.get('description'):
+        lines.append(f"DESCRIPTION:{_escape(event['description'])}")
+    lines.append('CLASS:PRIVATE' if event.get('visibility') == 'private' else 'CLASS:PUBLIC')
+    lines.append('TRANSP:OPAQUE')
+    tag = app_tag(event) or {}
+    for key, name in _TAG_PROPERTIES.items():
+        if tag.get(key):
+            lines.append(f"{name}:{_escape(tag[key])}")
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def _unfold(text: str) -> Iterator[str]:
+    line = None
+    for raw in text.splitlines():
+        if raw[:1] in (' ', '\t') and line is not None:
+            line += raw[1:]
+            continue
+        if line is not None:
+            yield line
+        line = raw
+    if line is not None:
+        yield line
+
+
+def parse_calendar(text: str) -> List[Tuple[Dict[str, Any], str]]:
+    """
+    Returns each timed VEVENT of an iCalendar file as an event in the
+    Calendar API's shape together with its VEVENT text, so events that are
+    not changed are written back as they were read.
+    """
+    events = []
+    properties: Optional[Dict[str, str]] = None
+    block: List[str] = []
+    for line in _unfold(text):
+        if line == 'BEGIN:VEVENT':
+            properties, block = {}, []
+        if properties is None:
+            continue
+        block.append(line)
+        if line == 'END:VEVENT':
+            event = _event_from_properties(properties)
+            if event is not None:
+                events.append((event, ''.join(_fold(item) for item in block)))
+            properties = None
+            continue
+        name, _, value = line.partition(':')
+        properties.setdefault(name.split(';')[0].upper(), value)
+    return events
+
+
+def _event_from_properties(properties: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    try:
+        start, end = _parse_time(properties['DTSTART']), _parse_time(properties['DTEND'])
+    except (KeyError, ValueError) as e:
+        LOG.warning(f"Skipping VEVENT {properties.get('UID')} without usable times: {e}")
+        return None
+    event = {
+        'id': properties.get('UID') or f"{uuid.uuid4().hex}@{APP_ID}",
+        'status': 'confirmed',
+        'summary': _unescape(properties.get('SUMMARY', '')),
+        'description': _unescape(properties.get('DESCRIPTION', '')),
+        'visibility': 'private' if properties.get('CLASS') == 'PRIVATE' else 'default',
+        'start': {'dateTime': start.isoformat()},
+        'end': {'dateTime': end.isoformat()},
+    }
+    tag = {key: _unescape(properties[name]) for key, name in _TAG_PROPERTIES.items() if name in properties}
+    if tag:
+        event['extendedProperties'] = {'private': {'app': APP_ID, **tag}}
+    return event
+
+
+class IcsCalendarService(CalendarService):
+    """
+    CalendarService that keeps the busy blocks in a local .ics file, for
+    machines without a Google account. Calendar clients such as Thunderbird
+    or Outlook can subscribe to the file.
+
+    Every event is serialized once and kept as text; a change re-renders
+    only the events it touches. The file is replaced atomically, so a
+    subscriber never reads a half-written file, and during a refresh all
+    changes are written together by end_refresh. The file holds only this
+    app's blocks, so they are the only busy times slot finding sees.
+    """
+
+    thread_safe = True
+
+    def __init__(self, path: str, clock: Optional[Clock] = None, retention: timedelta = RETENTION):
+        self.path = path
+        self.clock = clock or SystemClock(UTC)
+        self.retention = retention
+        self._events: Dict[str, Dict[str, Any]] = {}
+        # The VEVENT text of every event, in file order.
+        self._blocks: Dict[str, str] = {}
+        self._lock = threading.RLock()
+        self._in_refresh = False
+        self._dirty = False
+        # Number of times the file was written.
+        self.writes = 0
+        self.setup_credentials()
+
+    def setup_credentials(self) -> None:
+        # Nothing to authenticate; load what an earlier run wrote.
+        with self._lock:
+            self._events.clear()
+            self._blocks.clear()
+            if not os.path.exists(self.path):
+                return
+            try:
+                with open(self.path, 'r', encoding='utf-8', newline='') as f:
+                    text = f.read()
+            except OSError as e:
+                LOG.error(f"Could not read calendar file {self.path}: {e}")
+                return
+            for event, block in parse_calendar(text):
+                self._events[event['id']] = event
+                self._blocks[event['id']] = block
+            LOG.info(f"Loaded {len(self._events)} event(s) from {self.path}")
+
+    @property
+    def calendar_key(self) -> str:
+        return f"ics:{os.path.abspath(self.path)}"
+
+    def begin_refresh(self) -> None:
+        with self._lock:
+            self._in_refresh = True
+
+    def end_refresh(self) -> None:
+        with self._lock:
+            self._in_refresh = False
+            self._prune()
+            if self._dirty:
+                self._write()
+
+    def _prune(self) -> None:
+        cutoff = self.clock.now() - self.retention
+        for event_id in [event_id for event_id, event in self._events.items() if parse_event_times(event)[1] < cutoff]:
+            self._discard(event_id)
+
+    def _store(self, event: Dict[str, Any]) -> None:
+        self._events[event['id']] = event
+        self._blocks[event['id']] = serialize_event(event, self.clock.now())
+        self._changed()
+
+    def _discard(self, event_id: str) -> None:
+        self._events.pop(event_id, None)
+        self._blocks.pop(event_id, None)
+        self._changed()
+
+    def _changed(self) -> None:
+        self._dirty = True
+        if not self._in_refresh:
+            self._write()
+
+    def _write(self) -> None:
+        """Writes the file from the serialized events and swaps it in with an atomic rename."""
+        header = ''.join(_fold(line) for line in (
+            'BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', f'X-WR-CALNAME:{CALENDAR_NAME}'))
+        content = header + ''.join(self._blocks.values()) + _fold('END:VCALENDAR')
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.prayer-', suffix='.ics.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            LOG.error(f"Could not write calendar file {self.path}: {e}")
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            return
+        self._dirty = False
+        self.writes += 1
+
+    def get_events(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        with self._lock:
+            timed = [(parse_event_times(event), event) for event in self._events.values()]
+        return [event for (start, end), event in sorted(timed, key=lambda item: item[0])
+                if start < end_time and end > start_time]
+
+    def create_event(self, summary: str, start_time: datetime, end_time: datetime, description: str) -> Dict[str, Any]:
+        event = {
+            'id': f"{uuid.uuid4().hex}@{APP_ID}",
+            'status': 'confirmed',
+            'summary': summary,
+            'description': description,
+            'start': {'dateTime': start_time.isoformat()},
+            'end': {'dateTime': end_time.isoformat()},
+            'visibility': 'private',
+        }
+        with self._lock:
+            self._store(event)
+        return event
+
+    def delete_event(self, event_id: str) -> None:
+        with self._lock:
+            if event_id in self._events:
+                self._discard(event_id)
+
+    def reconcile(self, requests: Sequence[BlockRequest], start_time: datetime, end_time: datetime) -> int:
+        with self._lock:
+            stale = superseded_blocks(self.get_events(start_time, end_time), requests)
+            for event in stale:
+                self._discard(event['id'])
+        if stale:
+            LOG.info(f"Reconciled calendar file: deleted {len(stale)} superseded busy block(s).")
+        return len(stale)
+
+    def find_first_available_slot(self, start_time: datetime, duration_minutes: int, exclude: Optional[str] = None) -> datetime:
+        start_time = _as_utc(start_time)
+        day_end = start_time.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        events = [event for event in self.get_events(start_time, day_end) if event['id'] != exclude]
+        return first_fit(busy_times(events), start_time, duration_minutes)
+
+    def add_event(self, start_time: datetime, summary: str, duration_minutes: int) -> bool:
+        """
+        Writes a prayer's busy block under its stable UID. A block scheduled
+        the same way is left alone; one whose prayer time or duration changed
+        is moved, keeping its UID so subscribers update rather than duplicate it.
+        """
+        start_time = _as_utc(start_time)
+        prayer_date = prayer_date_of(start_time)
+        duration = timedelta(minutes=duration_minutes)
+        digest = schedule_hash(summary, start_time, duration)
+        uid = block_uid(summary, prayer_date)
+        with self._lock:
+            existing = self._events.get(uid)
+            if existing is None:
+                existing = next((event for event in self._events.values() if is_block_for(event, summary, prayer_date)), None)
+            if existing is not None and (app_tag(existing) or {}).get('scheduleHash') == digest:
+                LOG.info(f"Event '{summary}' at {start_time.strftime('%H:%M')} already exists in the calendar file. Skipping re-adding it.")
+                return False
+            if existing is not None and existing['id'] != uid:
+                self._discard(existing['id'])
+
+            slot = self.find_first_available_slot(start_time, duration_minutes, exclude=uid)
+            event = stamp({
+                'id': uid,
+                'status': 'confirmed',
+                'summary': summary,
+                'description': "Scheduled by Prayer App",
+                'start': {'dateTime': slot.isoformat()},
+                'end': {'dateTime': (slot + duration).isoformat()},
+                'visibility': 'private',
+            }, summary, prayer_date, digest)
+            self._store(event)
+        LOG.info(f"📅 {'Moved' if existing is not None else 'Added'} busy block: {summary} at {slot.strftime('%H:%M')}-{(slot + duration).strftime('%H:%M')} in {self.path}")
+        return True
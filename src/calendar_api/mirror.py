@@ -0,0 +1,142 @@
+# ------------------------------------------------------------------------
+# mirror.py – local copy of the calendar kept current with syncToken deltas
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+from src.config.security import LOG
+from .rate_limit import RateLimiter, execute
+from .snapshot import EVENT_FIELDS, parse_event_times
+
+# How far ahead of its start a full sync lists, which bounds the mirror's size
+WINDOW = timedelta(days=7)
+
+
+class EventMirror:
+    """
+    An in-memory mirror of the calendar's events in a window of `WINDOW`
+    from its start.
+
+    The first `sync` lists the window in full and keeps the `nextSyncToken`
+    Google returns; later syncs send that token and only receive what was
+    created, changed or cancelled since. A syncToken request cannot carry
+    timeMax, so deltas for events starting after the window are dropped
+    here. When Google expires the token (410 Gone), or a time outside the
+    window is asked for, the mirror is dropped and listed in full again.
+    Reads never touch the network. `client` returns the API client of the
+    calling thread.
+    """
+
+    def __init__(self, client: Callable[[], Any], calendar_id: str = 'primary', api_calls: Optional[Counter] = None,
+                 limiter: Optional[RateLimiter] = None, user: str = "default"):
+        self.client = client
+        self.limiter = limiter
+        self.user = user
+        self.calendar_id = calendar_id
+        self.api_calls = api_calls if api_calls is not None else Counter()
+        self.sync_token: Optional[str] = None
+        self.window_start: Optional[datetime] = None
+        self.window_end: Optional[datetime] = None
+        self.full_syncs = 0
+        self.delta_syncs = 0
+        self._lock = threading.Lock()
+        # event id -> (UTC start, UTC end, event) of the timed events
+        self._events: Dict[str, Tuple[datetime, datetime, Dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def covers(self, start_time: datetime, end_time: datetime) -> bool:
+        """Whether [start_time, end_time) lies within the mirrored window."""
+        return (self.window_start is not None and self.window_end is not None
+                and self.window_start <= start_time and end_time <= self.window_end)
+
+    def sync(self, window_start: datetime, window_end: Optional[datetime] = None) -> None:
+        """
+        Brings the mirror of the events between `window_start` and
+        `window_end` (a day later by default) up to date: a delta sync if the
+        mirror already covers them, a full sync of a new window otherwise.
+        """
+        window_end = window_end or window_start + timedelta(days=1)
+        with self._lock:
+            if self.sync_token and self.covers(window_start, window_end):
+                try:
+                    self._delta_sync()
+                except HttpError as e:
+                    if e.status_code != 410:
+                        raise
+                    LOG.info("Calendar sync token expired. Doing a full resync.")
+                    self._full_sync(window_start, window_end)
+            else:
+                self._full_sync(window_start, window_end)
+            self._prune(window_start)
+
+    def _list_pages(self, **params) -> Optional[str]:
+        """Applies every page of an events.list query and returns its nextSyncToken."""
+        while True:
+            self.api_calls["events.list"] += 1
+            response = execute(self.client().events().list(
+                calendarId=self.calendar_id, singleEvents=True,
+                fields=f"nextPageToken,nextSyncToken,items({EVENT_FIELDS})", **params
+            ), self.limiter, self.user)
+            for event in response.get('items', []):
+                self._apply(event)
+            if not response.get('nextPageToken'):
+                return response.get('nextSyncToken')
+            params['pageToken'] = response['nextPageToken']
+
+    def _full_sync(self, window_start: datetime, window_end: datetime) -> None:
+        self._events.clear()
+        self.sync_token = None
+        self.window_end = max(window_end, window_start + WINDOW)
+        self.sync_token = self._list_pages(timeMin=window_start.isoformat(), timeMax=self.window_end.isoformat())
+        self.full_syncs += 1
+        LOG.debug(f"Calendar mirror fully synced: {len(self._events)} event(s).")
+
+    def _delta_sync(self) -> None:
+        before = len(self._events)
+        self.sync_token = self._list_pages(syncToken=self.sync_token)
+        self.delta_syncs += 1
+        LOG.debug(f"Calendar mirror delta-synced: {len(self._events) - before:+d} event(s).")
+
+    def _apply(self, event: Dict[str, Any]) -> None:
+        event_id = event.get('id') or uuid.uuid4().hex
+        if event.get('status') == 'cancelled':
+            self._events.pop(event_id, None)
+            return
+        times = parse_event_times(event)
+        if times and self.window_end is not None and times[0] >= self.window_end:
+            # Deltas are not bounded by timeMax; events past the window are not kept.
+            self._events.pop(event_id, None)
+        elif times:
+            self._events[event_id] = (*times, event)
+        else:
+            # An event that became all-day no longer blocks a slot.
+            self._events.pop(event_id, None)
+
+    def _prune(self, window_start: datetime) -> None:
+        # The window only moves forwards; events that ended before it are of no further use.
+        for event_id in [key for key, (_, end, _) in self._events.items() if end <= window_start]:
+            del self._events[event_id]
+        self.window_start = window_start
+
+    def upsert(self, event: Dict[str, Any]) -> None:
+        """Records an event this client wrote, so reads see it before the next sync."""
+        with self._lock:
+            self._apply(event)
+
+    def remove(self, event_id: str) -> None:
+        with self._lock:
+            self._events.pop(event_id, None)
+
+    def events_between(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        """The timed events overlapping [start_time, end_time), ordered by start."""
+        with self._lock:
+            matching = [(start, event) for start, end, event in self._events.values() if start < end_time and end > start_time]
+        return [event for _, event in sorted(matching, key=lambda item: item[0])]
@@ -0,0 +1,135 @@
+# ------------------------------------------------------------------------
+# plan_store.py – remembers the busy block plans already written to calendars
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from src.config.security import LOG
+
+from .allocator import BlockRequest
+from .tags import UTC, prayer_date_of, schedule_hash
+
+# Plans of days further back than this are dropped from the store.
+RETENTION = timedelta(days=7)
+
+# prayer (lower case) -> schedule hash of its block
+BlockPlan = Dict[str, str]
+
+
+def block_plan(requests: Sequence[BlockRequest]) -> BlockPlan:
+    """The plan of a day's blocks, with the same schedule hashes the blocks are tagged with."""
+    return {request.summary.lower(): schedule_hash(request.summary, request.start.astimezone(UTC), request.duration)
+            for request in requests}
+
+
+def plan_hash(plan: BlockPlan) -> str:
+    """A digest of a whole day's plan: equal for equal plans, whatever their order."""
+    key = "|".join(f"{prayer}={digest}" for prayer, digest in sorted(plan.items()))
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+@dataclass
+class PlanDiff:
+    """
+    What a calendar needs for a day's plan, compared with the plan last
+    written to it. `known` is False when nothing was written for the day,
+    so every block has to be checked against the calendar.
+    """
+    creates: List[str] = field(default_factory=list)
+    moves: List[str] = field(default_factory=list)
+    deletes: List[str] = field(default_factory=list)
+    known: bool = True
+
+    @property
+    def empty(self) -> bool:
+        return self.known and not (self.creates or self.moves or self.deletes)
+
+    @property
+    def writes(self) -> List[str]:
+        """Prayers whose block has to be written."""
+        return self.creates + self.moves
+
+
+class PlanStore:
+    """
+    The busy block plan last written successfully to each calendar, per
+    local date, in a small JSON file. A refresh whose plan equals the stored
+    one needs no calendar calls at all; otherwise `diff` says which blocks
+    to create, move or delete.
+    """
+
+    def __init__(self, path: str, retention: timedelta = RETENTION):
+        self.path = path
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._plans: Dict[str, Dict[str, Dict[str, object]]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, object]]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                plans = json.load(f)
+            return plans if isinstance(plans, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            LOG.warning(f"Ignoring unreadable calendar plan store {self.path}: {e}")
+            return {}
+
+    def get(self, calendar_key: str, day: date) -> Optional[BlockPlan]:
+        with self._lock:
+            entry = self._plans.get(calendar_key, {}).get(day.isoformat())
+        return dict(entry['blocks']) if entry else None
+
+    def diff(self, calendar_key: str, day: date, requests: Sequence[BlockRequest]) -> PlanDiff:
+        planned = block_plan(requests)
+        stored = self.get(calendar_key, day)
+        if stored is None:
+            return PlanDiff(creates=list(planned), known=False)
+        if plan_hash(stored) == plan_hash(planned):
+            return PlanDiff()
+        return PlanDiff(
+            creates=[prayer for prayer in planned if prayer not in stored],
+            moves=[prayer for prayer, digest in planned.items() if prayer in stored and stored[prayer] != digest],
+            deletes=[prayer for prayer in stored if prayer not in planned],
+        )
+
+    def save(self, calendar_key: str, day: date, requests: Sequence[BlockRequest]) -> None:
+        """Records `requests` as the plan now written to the calendar for `day`."""
+        plan = block_plan(requests)
+        oldest = (day - self.retention).isoformat()
+        with self._lock:
+            days = self._plans.setdefault(calendar_key, {})
+            days[day.isoformat()] = {'hash': plan_hash(plan), 'blocks': plan}
+            for stale in [key for key in days if key < oldest]:
+                del days[stale]
+            self._write()
+
+    def forget(self, calendar_key: str, day: date) -> None:
+        """Drops a day's plan, so the next refresh checks the calendar again."""
+        with self._lock:
+            if self._plans.get(calendar_key, {}).pop(day.isoformat(), None) is not None:
+                self._write()
+
+    def _write(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.calendar-plans-', suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self._plans, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # Without the store refreshes only lose the shortcut, so this is not fatal.
+            LOG.error(f"Could not write calendar plan store {self.path}: {e}")
+
+
+def plan_date(requests: Sequence[BlockRequest]) -> date:
+    """The local date a day's plan is stored under: that of its first block."""
+    return prayer_date_of(min(request.start for request in requests))
@@ -0,0 +1,183 @@
+# ------------------------------------------------------------------------
+# rate_limit.py – keeps calendar calls under Google's quotas
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+from googleapiclient.errors import HttpError
+
+from src.config.security import LOG
+from src.shared.backoff import exponential_backoff
+
+RETRIABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+# Google's default Calendar API quotas are 10,000 queries per minute per
+# project and 600 per minute per user; the limits stay 10% below them.
+PROJECT_RATE = 10_000 / 60 * 0.9
+PROJECT_BURST = 100
+USER_RATE = 600 / 60 * 0.9
+USER_BURST = 20
+
+
+def is_retriable(error: Exception) -> bool:
+    """Whether a failed call may succeed when sent again: rate limits, server errors and transport failures."""
+    if isinstance(error, HttpError):
+        status = error.status_code
+        if status in RETRIABLE_STATUSES:
+            return True
+        return status == 403 and any(reason in str(error.error_details) or reason in error.content.decode("utf-8", "replace")
+                                     for reason in RATE_LIMIT_REASONS)
+    return isinstance(error, (OSError, TimeoutError))
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """The seconds a `Retry-After` header of the error's response asks to wait, if it has one."""
+    resp = getattr(error, "resp", None)
+    value = resp.get("retry-after") if isinstance(resp, dict) else None
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Allows `rate` tokens per second with bursts of up to `capacity`.
+
+    A caller takes its tokens right away, even if that leaves the bucket in
+    debt, and then waits until the debt would have been refilled. Callers on
+    several threads are thereby served in order and none of them can starve.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Takes `tokens` and returns the seconds to wait before using them."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            return max(0.0, -self._tokens / self.rate)
+
+
+class RateLimiter:
+    """
+    Paces calendar calls with one token bucket for the whole process and one
+    per user, and retries rate-limited or failed calls.
+
+    A retry waits for the longer of the exponential backoff and the
+    response's `Retry-After`. `metrics` counts calls, throttled calls (ones
+    that had to wait for a token), retries and final failures, together with
+    the seconds spent waiting; `user_metrics` has the same per user.
+    """
+
+    def __init__(self, rate: float = PROJECT_RATE, burst: float = PROJECT_BURST,
+                 user_rate: float = USER_RATE, user_burst: float = USER_BURST,
+                 max_attempts: int = 5, base_delay: timedelta = timedelta(seconds=1),
+                 max_delay: timedelta = timedelta(seconds=60),
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.metrics: Counter = Counter()
+        self.user_metrics: Dict[str, Counter] = {}
+        self._clock = clock
+        self._sleep = sleep
+        self._bucket = TokenBucket(rate, burst, clock)
+        self._user_buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _record(self, user: str, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self.metrics[key] += amount
+            self.user_metrics.setdefault(user, Counter())[key] += amount
+
+    def acquire(self, user: str, cost: int = 1) -> float:
+        """Waits until `cost` calls for `user` fit in both quotas. Returns the seconds waited."""
+        with self._lock:
+            bucket = self._user_buckets.get(user)
+            if bucket is None:
+                bucket = self._user_buckets[user] = TokenBucket(self.user_rate, self.user_burst, self._clock)
+        wait = max(self._bucket.reserve(cost), bucket.reserve(cost))
+        self._record(user, "calls", cost)
+        if wait > 0:
+            self._record(user, "throttled", cost)
+            self._record(user, "throttle_wait_s", wait)
+            LOG.debug(f"Throttling {cost} calendar call(s) for {user} by {wait:.2f}s to stay under quota.")
+            self._sleep(wait)
+        return wait
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        """Seconds to wait before retry number `attempt` (0-based) after `error`."""
+        backoff = exponential_backoff(attempt, self.base_delay, self.max_delay).total_seconds()
+        return max(backoff, retry_after(error) or 0.0)
+
+    def record_retry(self, user: str, delay: float, count: int = 1) -> None:
+        self._record(user, "retried", count)
+        self._record(user, "retry_wait_s", delay)
+
+    def record_failure(self, user: str, count: int = 1) -> None:
+        self._record(user, "failed", count)
+
+    def execute(self, request, user: str):
+        """
+        Executes a googleapiclient request within the quotas, retrying
+        retriable errors up to `max_attempts` times. The last error is raised.
+        Server and transport errors may come after the request was applied,
+        so requests that create something must be safe to send twice, e.g.
+        inserts carrying a client-chosen event id (see batch.new_event_id).
+        """
+        for attempt in range(self.max_attempts):
+            self.acquire(user)
+            try:
+                return request.execute()
+            except Exception as e:
+                if not is_retriable(e) or attempt + 1 == self.max_attempts:
+                    if is_retriable(e):
+                        self.record_failure(user)
+                    raise
+                delay = self.retry_delay(e, attempt)
+                self.record_retry(user, delay)
+                LOG.warning(f"Calendar call for {user} failed ({e}). Retrying in {delay:.1f}s (attempt {attempt + 2}/{self.max_attempts}).")
+                self._sleep(delay)
+
+
+def execute(request, limiter: Optional[RateLimiter] = None, user: str = "default"):
+    """Executes a request through `limiter` if one is given, directly otherwise."""
+    if limiter is None:
+        return request.execute()
+    return limiter.execute(request, user)
+
+
+_shared: Optional[RateLimiter] = None
+_shared_lock = threading.Lock()
+
+
+def shared_limiter() -> RateLimiter:
+    """The limiter every calendar service of this process uses unless given its own."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiter()
+        return _shared
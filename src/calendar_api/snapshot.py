@@ -0,0 +1,119 @@
+# ------------------------------------------------------------------------
+# snapshot.py – one parsed calendar listing per day, shared by a refresh
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import bisect
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from src.config.security import LOG
+
+UTC = ZoneInfo("UTC")
+
+# The event fields slot finding and the duplicate check read; calendar reads request only these.
+EVENT_FIELDS = "id,status,summary,visibility,start,end,extendedProperties"
+
+
+def parse_rfc3339(value: str) -> datetime:
+    """Parses a Calendar API timestamp; Python < 3.11 does not accept the 'Z' suffix Google uses for UTC."""
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    return datetime.fromisoformat(value)
+
+
+def parse_event_times(event: Dict[str, Any]) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Returns the UTC start and end of a timed event, or None for all-day
+    events and events whose times are missing or cannot be parsed.
+    """
+    start_data = event.get('start') or {}
+    end_data = event.get('end') or {}
+    start_str = start_data.get('dateTime') or start_data.get('date')
+    end_str = end_data.get('dateTime') or end_data.get('date')
+
+    if not start_str or not end_str:
+        LOG.debug(f"Skipping event due to missing or empty start/end time data: start={start_data}, end={end_data}")
+        return None
+    if not isinstance(start_str, str) or not isinstance(end_str, str):
+        LOG.error(f"Skipping event due to non-string start/end time: start={start_str} (type: {type(start_str)}), end={end_str} (type: {type(end_str)})")
+        return None
+    if 'dateTime' not in start_data:
+        # All-day events don't block a slot.
+        return None
+
+    try:
+        return parse_rfc3339(start_str).astimezone(UTC), parse_rfc3339(end_str).astimezone(UTC)
+    except ValueError as ve:
+        LOG.error(f"Failed to parse event time string '{start_str}' or '{end_str}': {ve}")
+        return None
+
+
+def busy_times(events: Iterable[Dict[str, Any]]) -> Iterator[Tuple[datetime, datetime]]:
+    """Lazily yields the UTC (start, end) of the timed events, in the order given."""
+    for event in events:
+        times = parse_event_times(event)
+        if times:
+            yield times
+
+
+def first_fit(busy: Iterable[Tuple[datetime, datetime]], start_time: datetime, duration_minutes: float) -> datetime:
+    """
+    Returns the earliest start at or after `start_time` where `duration_minutes`
+    fit between the busy intervals, which must be ordered by start.
+    """
+    current_slot_start = start_time
+    duration = timedelta(minutes=duration_minutes)
+    for busy_start, busy_end in busy:
+        # If the current potential slot ends before the interval starts, we found a slot
+        if current_slot_start + duration <= busy_start:
+            return current_slot_start
+        # If there's an overlap, move the current_slot_start past the end of the interval
+        if current_slot_start < busy_end:
+            current_slot_start = busy_end
+    return current_slot_start
+
+
+class DaySnapshot:
+    """
+    The events of one UTC day, listed and parsed once.
+
+    During a refresh, slot finding and the duplicate check for every prayer
+    read from the same snapshot. Events created or deleted in the meantime
+    are applied to it, so it stays in step with the calendar without
+    listing the day again.
+
+    `busy` holds extra intervals that block slots without being events of
+    this calendar, e.g. from a free/busy query.
+    """
+
+    def __init__(self, day_start: datetime, events: List[Dict[str, Any]], busy: Iterable[Tuple[datetime, datetime]] = ()):
+        self.day_start = day_start
+        self.day_end = day_start + timedelta(days=1)
+        # (start, end, event) of the timed events, ordered by start.
+        self._timed: List[Tuple[datetime, datetime, Dict[str, Any]]] = []
+        self._busy = sorted(busy)
+        for event in events:
+            self.add(event)
+
+    def add(self, event: Dict[str, Any]) -> None:
+        times = parse_event_times(event)
+        if times:
+            bisect.insort(self._timed, (*times, event), key=lambda item: item[0])
+
+    def remove(self, event_id: str) -> None:
+        self._timed = [item for item in self._timed if item[2].get('id') != event_id]
+
+    def busy_intervals(self) -> Iterator[Tuple[datetime, datetime]]:
+        events = ((start, end) for start, end, _ in self._timed)
+        return heapq.merge(events, self._busy) if self._busy else events
+
+    def first_available_slot(self, start_time: datetime, duration_minutes: float) -> datetime:
+        """Returns the earliest start at or after `start_time` where `duration_minutes` fit between the busy times."""
+        return first_fit(self.busy_intervals(), start_time, duration_minutes)
+
+    def events(self) -> Iterator[Dict[str, Any]]:
+        """The timed events of the day, ordered by start."""
+        for _, _, event in self._timed:
+            yield event
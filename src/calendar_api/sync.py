@@ -0,0 +1,85 @@
+# ------------------------------------------------------------------------
+# sync.py – brings a calendar in line with a day's plan of busy blocks
+# ------------------------------------------------------------------------
+from __future__ import annotations
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+from src.config.security import LOG, TZ
+
+from .allocator import BlockRequest
+from .base import CalendarService
+from .plan_store import PlanDiff, PlanStore, plan_date
+
+
+def plan_window(planned: Sequence[BlockRequest]) -> Tuple[datetime, datetime]:
+    """The local days the planned blocks fall on, as a (start, end) pair."""
+    first = min(request.start for request in planned).astimezone(TZ)
+    last = max(request.start for request in planned).astimezone(TZ)
+    start = first.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, last.replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+
+
+@dataclass
+class PlannedWrites:
+    """
+    The calendar writes a day's plan needs: the blocks to add, and the plan
+    to reconcile first when superseded blocks may have to go. `diff` is the
+    comparison with the stored plan, None without a plan store.
+    """
+    requests: List[BlockRequest] = field(default_factory=list)
+    cleanup: List[BlockRequest] = field(default_factory=list)
+    diff: Optional[PlanDiff] = None
+
+    @property
+    def needed(self) -> bool:
+        return self.diff is None or not self.diff.empty
+
+
+def planned_writes(service: CalendarService, planned: Sequence[BlockRequest], requests: Sequence[BlockRequest],
+                   plan_store: Optional[PlanStore] = None) -> PlannedWrites:
+    """
+    Works out the writes for the day's `planned` blocks, of which `requests`
+    are still to be added. With a plan store, a plan that was already
+    written needs none, and a changed one only the blocks that were added or
+    moved, cleaning up only if a block was moved or dropped.
+    """
+    requests = list(requests)
+    diff = None
+    if plan_store is not None and planned:
+        diff = plan_store.diff(service.calendar_key, plan_date(planned), planned)
+        if diff.empty:
+            LOG.info("The calendar already has this plan's busy blocks. Skipping calendar writes.")
+            return PlannedWrites(diff=diff)
+        if diff.known:
+            LOG.info(f"Calendar plan changed: {len(diff.creates)} new, {len(diff.moves)} moved, {len(diff.deletes)} dropped block(s).")
+            requests = [request for request in requests if request.summary.lower() in diff.writes]
+    cleanup = list(planned) if diff is None or not diff.known or diff.moves or diff.deletes else []
+    return PlannedWrites(requests, cleanup, diff)
+
+
+def write_blocks(service: CalendarService, requests: Sequence[BlockRequest], cleanup: Sequence[BlockRequest] = ()) -> bool:
+    """
+    Adds the busy blocks in one call, so the calendar service can place them
+    together and share one snapshot. Blocks the `cleanup` plan supersedes
+    are deleted first, so a changed prayer time moves its block instead of
+    leaving the old one behind. Returns whether every write succeeded.
+    """
+    LOG.debug(f"Attempting to add {len(requests)} calendar event(s)")
+    written = True
+    service.begin_refresh()
+    try:
+        if cleanup:
+            try:
+                service.reconcile(cleanup, *plan_window(cleanup))
+            except Exception as e:
+                written = False
+                LOG.error(f"Failed to clean up superseded calendar events: {e}")
+        service.add_events(requests)
+    except Exception as e:
+        written = False
+        LOG.error(f"Failed to add events to calendar: {e}")
+    finally:
+        service.end_refresh()
+    return written and not service.last_failed_writes
@@ -0,0 +1,89 @@
+# ------------------------------------------------------------------------
+# tags.py – private extended properties marking the events this app creates
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import hashlib
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+from src.config.security import TZ
+from .allocator import BlockRequest
+from .snapshot import parse_event_times
+
+APP_ID = "prayer-player"
+UTC = ZoneInfo("UTC")
+
+
+def schedule_hash(prayer: str, requested_start: datetime, duration: timedelta) -> str:
+    """Identifies what a block was scheduled for, so a changed schedule can be told apart from an unchanged one."""
+    key = f"{prayer}|{requested_start.isoformat()}|{int(duration.total_seconds())}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def stamp(body: Dict[str, Any], prayer: str, prayer_date: date, digest: str) -> Dict[str, Any]:
+    """Adds this app's private extended properties to an event body and returns it."""
+    body.setdefault('extendedProperties', {}).setdefault('private', {}).update({
+        'app': APP_ID,
+        'prayer': prayer,
+        'prayerDate': prayer_date.isoformat(),
+        'scheduleHash': digest,
+    })
+    return body
+
+
+def app_tag(event: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """The event's private properties if this app created it, None otherwise."""
+    private = (event.get('extendedProperties') or {}).get('private') or {}
+    return private if private.get('app') == APP_ID else None
+
+
+def tag_filter(**properties: str) -> List[str]:
+    """`privateExtendedProperty` query values matching this app's events with the given properties."""
+    return [f"app={APP_ID}"] + [f"{key}={value}" for key, value in properties.items() if value is not None]
+
+
+def prayer_date_of(start_time: datetime) -> date:
+    """The local calendar date a prayer time belongs to."""
+    return start_time.astimezone(TZ).date()
+
+
+def is_block_for(event: Dict[str, Any], prayer: str, prayer_date: date) -> bool:
+    """
+    Whether the event is this app's busy block for the prayer on that date.
+
+    Blocks created before events were tagged are recognised by their title
+    together with the private visibility the app always set, so a user's own
+    public event titled like a prayer is not taken for one.
+    """
+    tag = app_tag(event)
+    if tag is not None:
+        return tag.get('prayer', '').lower() == prayer.lower() and tag.get('prayerDate') == prayer_date.isoformat()
+    if event.get('visibility') != 'private' or event.get('summary', '').lower() != prayer.lower():
+        return False
+    times = parse_event_times(event)
+    return times is not None and prayer_date_of(times[0]) == prayer_date
+
+
+def superseded_blocks(events: Sequence[Dict[str, Any]], requests: Sequence[BlockRequest]) -> List[Dict[str, Any]]:
+    """
+    The app-created events that the planned `requests` no longer account
+    for: blocks of a prayer and date that is not planned, blocks scheduled
+    differently than planned (their schedule hash differs), and all but the
+    first block of a prayer and date. Untagged events are never included.
+    """
+    planned = {}
+    for request in requests:
+        start = request.start.astimezone(UTC)
+        planned[(request.summary.lower(), prayer_date_of(start).isoformat())] = schedule_hash(request.summary, start, request.duration)
+    kept, stale = set(), []
+    for event in events:
+        tag = app_tag(event)
+        if tag is None:
+            continue
+        key = (tag.get('prayer', '').lower(), tag.get('prayerDate'))
+        if planned.get(key) != tag.get('scheduleHash') or key in kept:
+            stale.append(event)
+        else:
+            kept.add(key)
+    return stale
@@ -0,0 +1,278 @@
+# ------------------------------------------------------------------------
+# write_behind.py – durable queue of calendar writes, drained in the background
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import json
+import os
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from src.config.security import LOG, TZ
+from src.shared.backoff import exponential_backoff
+from src.shared.clock import Clock, SystemClock
+
+from .allocator import BlockRequest
+from .base import CalendarService
+from .plan_store import PlanStore
+from .tags import app_tag, prayer_date_of
+
+# A write that failed this often is dropped.
+MAX_ATTEMPTS = 20
+RETRY_BASE = timedelta(seconds=30)
+RETRY_CAP = timedelta(minutes=30)
+POLL_INTERVAL = timedelta(minutes=5)
+
+
+def add_key(prayer: str, prayer_date: Union[date, str]) -> str:
+    """Queue key of a prayer's block on a date: enqueueing it again replaces the pending write."""
+    return f"add:{prayer_date}:{prayer.lower()}"
+
+
+def delete_key(event_id: str) -> str:
+    return f"delete:{event_id}"
+
+
+def reconcile_key(start_time: datetime) -> str:
+    return f"reconcile:{start_time.isoformat()}"
+
+
+def _block_payload(request: BlockRequest) -> Dict[str, Any]:
+    return {'summary': request.summary, 'start': request.start.isoformat(), 'duration_s': request.duration.total_seconds()}
+
+
+def _block_request(payload: Dict[str, Any]) -> BlockRequest:
+    return BlockRequest(payload['summary'], datetime.fromisoformat(payload['start']), timedelta(seconds=payload['duration_s']))
+
+
+@dataclass
+class QueuedWrite:
+    key: str
+    kind: str  # "add", "delete" or "reconcile"
+    payload: Dict[str, Any]
+    attempts: int = 0
+
+    def block_request(self) -> BlockRequest:
+        return _block_request(self.payload)
+
+
+class WriteQueue:
+    """
+    Pending calendar writes in a small SQLite database, so they survive
+    restarts. Each write has a stable key; enqueueing a key that is already
+    pending replaces it instead of adding a second write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS writes ("
+            " key TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, last_error TEXT)"
+        )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM writes").fetchone()[0]
+
+    def put(self, key: str, kind: str, payload: Dict[str, Any], now: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO writes (key, kind, payload, next_attempt) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET kind = excluded.kind, payload = excluded.payload,"
+                " attempts = 0, next_attempt = excluded.next_attempt, last_error = NULL",
+                (key, kind, json.dumps(payload), now),
+            )
+
+    def due(self, now: float, limit: int = 100) -> List[QueuedWrite]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT key, kind, payload, attempts FROM writes WHERE next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+                (now, limit),
+            ).fetchall()
+        return [QueuedWrite(key, kind, json.loads(payload), attempts) for key, kind, payload, attempts in rows]
+
+    def next_due(self, kind: Optional[str] = None) -> Optional[float]:
+        with self._lock:
+            if kind is None:
+                return self._db.execute("SELECT MIN(next_attempt) FROM writes").fetchone()[0]
+            return self._db.execute("SELECT MIN(next_attempt) FROM writes WHERE kind = ?", (kind,)).fetchone()[0]
+
+    def postpone(self, keys: Sequence[str], until: float) -> None:
+        with self._lock:
+            self._db.executemany("UPDATE writes SET next_attempt = MAX(next_attempt, ?) WHERE key = ?", [(until, key) for key in keys])
+
+    def done(self, write: QueuedWrite) -> None:
+        """Removes a write that was applied, unless it was replaced by a newer one in the meantime."""
+        with self._lock:
+            self._db.execute("DELETE FROM writes WHERE key = ? AND payload = ?", (write.key, json.dumps(write.payload)))
+
+    def retry_later(self, key: str, error: str, next_attempt: float) -> None:
+        with self._lock:
+            self._db.execute("UPDATE writes SET attempts = attempts + 1, next_attempt = ?, last_error = ? WHERE key = ?",
+                             (next_attempt, error, key))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class CalendarWriteBehind:
+    """
+    Takes busy-block creates and deletes off the caller's thread: they are
+    stored in a WriteQueue and a background thread applies them to the
+    calendar service, so a refresh never waits on the calendar.
+
+    Pending adds are written together with one add_events call inside a
+    refresh bracket, after any pending reconcile pass has removed the blocks
+    the new plan supersedes. Writes that fail are retried with exponential backoff
+    until they succeed, their block is over, or MAX_ATTEMPTS is reached, so
+    blocks queued while offline are written once the calendar is reachable.
+    When it gives up on a write, the day's plan is dropped from `plans`, so
+    the next refresh does not take the calendar for up to date.
+    """
+
+    def __init__(self, service: CalendarService, queue: WriteQueue, clock: Optional[Clock] = None,
+                 poll_interval: timedelta = POLL_INTERVAL, plans: Optional[PlanStore] = None):
+        self.service = service
+        self.queue = queue
+        self.plans = plans
+        self.clock = clock or SystemClock(TZ)
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def enqueue_blocks(self, requests: Sequence[BlockRequest]) -> None:
+        now = self.clock.now().timestamp()
+        for request in requests:
+            self.queue.put(add_key(request.summary, prayer_date_of(request.start)), "add", _block_payload(request), now)
+        LOG.debug(f"Queued {len(requests)} busy block(s) for the calendar.")
+        self._wake.set()
+
+    def enqueue_reconcile(self, requests: Sequence[BlockRequest], start_time: datetime, end_time: datetime) -> None:
+        """Queues a CalendarService.reconcile pass for the plan `requests` of the window."""
+        self.queue.put(reconcile_key(start_time), "reconcile", {
+            'start': start_time.isoformat(),
+            'end': end_time.isoformat(),
+            'blocks': [_block_payload(request) for request in requests],
+        }, self.clock.now().timestamp())
+        self._wake.set()
+
+    def enqueue_delete(self, event_id: str) -> None:
+        self.queue.put(delete_key(event_id), "delete", {'event_id': event_id}, self.clock.now().timestamp())
+        self._wake.set()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="calendar-write-behind", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        failures = 0
+        while not self._stopping.is_set():
+            try:
+                self.drain()
+            except Exception as e:
+                # The writes stay due, so retrying right away would spin against the calendar.
+                wait = exponential_backoff(failures, RETRY_BASE, RETRY_CAP).total_seconds()
+                failures += 1
+                LOG.error(f"Calendar write-behind pass failed: {e}. Retrying in {wait:.0f}s.")
+            else:
+                failures = 0
+                next_due = self.queue.next_due()
+                wait = self.poll_interval.total_seconds()
+                if next_due is not None:
+                    wait = max(0.0, min(wait, next_due - self.clock.now().timestamp()))
+            self._wake.wait(wait)
+            self._wake.clear()
+
+    def drain(self) -> int:
+        """Applies every due write once. Returns how many were applied."""
+        now = self.clock.now()
+        due = self.queue.due(now.timestamp())
+        if not due:
+            return 0
+        reconciles = [write for write in due if write.kind == "reconcile"]
+        adds = []
+        for write in due:
+            if write.kind == "add":
+                request = write.block_request()
+                if request.start + request.duration <= now:
+                    LOG.info(f"Dropping queued busy block {request.summary} at {request.start.strftime('%H:%M')}: it is over.")
+                    self.queue.done(write)
+                else:
+                    adds.append((write, request))
+        backing_off = self.queue.next_due(kind="reconcile")
+        if adds and backing_off is not None and backing_off > now.timestamp():
+            # Adding now could keep a block the waiting reconcile pass is to replace.
+            self.queue.postpone([write.key for write, _ in adds], backing_off)
+            adds = []
+        applied = self._apply_adds(adds, reconciles, now) if adds or reconciles else 0
+        for write in (w for w in due if w.kind == "delete"):
+            try:
+                self.service.delete_event(write.payload['event_id'])
+            except Exception as e:
+                if getattr(e, 'status_code', None) in (404, 410):
+                    self.queue.done(write)  # Already gone.
+                else:
+                    self._failed(write, e, now)
+            else:
+                self.queue.done(write)
+                applied += 1
+        return applied
+
+    def _apply_adds(self, adds, reconciles: List[QueuedWrite], now: datetime) -> int:
+        self.service.begin_refresh()
+        try:
+            for write in reconciles:
+                self.service.reconcile([_block_request(block) for block in write.payload['blocks']],
+                                       datetime.fromisoformat(write.payload['start']), datetime.fromisoformat(write.payload['end']))
+            if adds:
+                self.service.add_events([request for _, request in adds])
+        except Exception as e:
+            self.service.end_refresh()
+            for write in reconciles + [write for write, _ in adds]:
+                self._failed(write, e, now)
+            return 0
+        self.service.end_refresh()
+        for write in reconciles:
+            self.queue.done(write)
+
+        failed = {}
+        for body in self.service.last_failed_writes:
+            tag = app_tag(body) or {}
+            failed[add_key(tag.get('prayer', ''), tag.get('prayerDate'))] = body
+        applied = len(reconciles)
+        for write, _ in adds:
+            if write.key in failed:
+                self._failed(write, RuntimeError("the calendar rejected the write"), now)
+            else:
+                self.queue.done(write)
+                applied += 1
+        return applied
+
+    def _failed(self, write: QueuedWrite, error: Exception, now: datetime) -> None:
+        if write.attempts + 1 >= MAX_ATTEMPTS:
+            LOG.error(f"Giving up on calendar write {write.key} after {write.attempts + 1} attempts: {error}")
+            self.queue.done(write)
+            if self.plans is not None and write.kind in ("add", "reconcile"):
+                self.plans.forget(self.service.calendar_key, prayer_date_of(datetime.fromisoformat(write.payload['start'])))
+            return
+        delay = exponential_backoff(write.attempts, RETRY_BASE, RETRY_CAP)
+        LOG.warning(f"Calendar write {write.key} failed ({error}). Retrying in {delay.total_seconds():.0f}s.")
+        self.queue.retry_later(write.key, str(error), (now + delay).timestamp())
@@ -1,6 +1,6 @@
 
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 class Config(BaseModel):
     country: Optional[str] = None
@@ -10,6 +10,13 @@ class Config(BaseModel):
     enabled_prayers: List[str] = Field(default_factory=lambda: ["Fajr", "Dhuhr", "Asr", "Maghrib", "Isha"])
     custom_audio_path: Optional[str] = None
     google_calendar_id: Optional[str] = None
+    # Further calendars whose busy times the prayer blocks avoid.
+    busy_calendar_ids: List[str] = Field(default_factory=list)
     run_mode: str = "background"
     log_level: str = "INFO"
+    prearm_seconds: int = 60
+    # Must match SLOT_SOURCES in src.calendar_api.base.
+    calendar_slot_source: Literal["events", "freebusy"] = "events"
+    calendar_backend: Literal["google", "ics"] = "google"
+    ics_path: Optional[str] = None
 
@@ -8,6 +8,7 @@ import logging
 import os
 import sys
 import json
+import uuid
 import argcomplete
 from datetime import timedelta
 from zoneinfo import ZoneInfo
@@ -40,6 +41,7 @@ BUSY_SLOT    = timedelta(minutes=15)
 POST_DELAY   = timedelta(minutes=5)
 FOCUS_DELAY  = timedelta(minutes=4)
 FOCUS_LENGTH = timedelta(minutes=10)
+PREARM_LEAD  = timedelta(seconds=60)
 
 APP_NAME = "PrayerPlayer"
 APP_AUTHOR = "Omar"
@@ -47,6 +49,10 @@ APP_AUTHOR = "Omar"
 CONFIG_DIR = user_config_dir(APP_NAME, APP_AUTHOR)
 CONFIG_FILE_PATH = os.path.join(CONFIG_DIR, 'config.json')
 LOG_FILE_PATH = os.path.join(CONFIG_DIR, 'app.log')
+INSTALL_ID_PATH = os.path.join(CONFIG_DIR, 'install_id')
+ICS_CALENDAR_PATH = os.path.join(CONFIG_DIR, 'prayer-times.ics')
+CALENDAR_QUEUE_PATH = os.path.join(CONFIG_DIR, 'calendar-queue.sqlite3')
+CALENDAR_PLANS_PATH = os.path.join(CONFIG_DIR, 'calendar-plans.json')
 
 def load_config() -> Config:
     """
@@ -60,7 +66,7 @@ def load_config() -> Config:
         with open(CONFIG_FILE_PATH, 'r') as f:
             config_data = json.load(f)
         return Config(**config_data)
-    except (json.JSONDecodeError, TypeError) as e:
+    except (json.JSONDecodeError, TypeError, ValueError) as e:
         LOG.warning(f"Could not load or validate config from {CONFIG_FILE_PATH}: {e}. Using default config.")
         return Config()
 
@@ -72,6 +78,28 @@ def save_config(config: Config):
         json.dump(config.dict(), f, indent=4)
     LOG.info(f"Configuration saved to {CONFIG_FILE_PATH}")
 
+def get_install_id() -> str:
+    """
+    Returns a random ID that identifies this installation, creating it on first use.
+    It is used to spread network-heavy work of many installations over time.
+    """
+    try:
+        with open(INSTALL_ID_PATH, 'r') as f:
+            install_id = f.read().strip()
+        if install_id:
+            return install_id
+    except OSError:
+        pass
+
+    install_id = uuid.uuid4().hex
+    try:
+        os.makedirs(CONFIG_DIR, exist_ok=True)
+        with open(INSTALL_ID_PATH, 'w') as f:
+            f.write(install_id)
+    except OSError as e:
+        LOG.warning(f"Could not persist install ID to {INSTALL_ID_PATH}: {e}")
+    return install_id
+
 # --- logging ---------------------------------------------------------------
 LOG = logging.getLogger("adhan")
 # Ensure handlers are added only once to prevent duplicate log messages
@@ -109,6 +137,7 @@ def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
     ap.add_argument("--school", type=int, default=loaded_config.school, help="School for Asr prayer calculation (e.g., 0 for Shafii, 1 for Hanafi).")
     ap.add_argument("--audio", default=str(DEFAULT_ADHAN_PATH), help="Path to the Adhan audio file.")
     ap.add_argument("--dry-run", action="store_true", help="Run the scheduler in dry-run mode for testing.")
+    ap.add_argument("--simulate-days", type=int, metavar="N", help="Fast-forward a simulated clock through N days of scheduling and print a report, then exit.")
     ap.add_argument("--no-net-off", action="store_true", help="Do not turn off network during focus mode.")
     ap.add_argument("--custom-audio-path", default=loaded_config.custom_audio_path, help="Path to a custom Adhan audio file.")
     ap.add_argument("--google-calendar-id", default=loaded_config.google_calendar_id, help="Google Calendar ID to use for events.")
@@ -1,6 +1,7 @@
 # src/domain/notification_messages.py
 from __future__ import annotations
 from dataclasses import dataclass
+from typing import Callable, List, Optional
 
 from src.shared.events import Event
 
@@ -13,3 +14,9 @@ class FocusModeRequestedEvent(Event):
 class AudioPlaybackRequestedEvent(Event):
     """Event published to request playing an audio file."""
     audio_path: str
+    on_finished: Optional[Callable[[], None]] = None
+
+@dataclass
+class PrearmRequestedEvent(Event):
+    """Event published shortly before a prayer to warm up audio playback and the focus window."""
+    audio_paths: List[str]
@@ -278,10 +278,10 @@ class FocusStepsView(QWidget):
 # ==================================================================
 # ❸ Application Entry Point
 # ==================================================================
-def run(is_modal: bool = True):
+def prepare() -> FocusStepsView:
     """
-    Initializes and runs the QApplication.
-    If is_modal is True, it runs the window in a blocking way.
+    Initializes the QApplication if needed and builds the focus window without
+    showing it, so it can be shown instantly later via show().
     """
     app = QApplication.instance()
     if app is None:
@@ -291,17 +291,26 @@ def run(is_modal: bool = True):
         app.setFont(font)
 
     presenter = FocusStepsPresenter()
-    window = FocusStepsView(presenter)
-    
+    return FocusStepsView(presenter)
+
+def show(window: FocusStepsView, is_modal: bool = True):
+    """Shows a prepared window. If is_modal is True, it blocks until the window is closed."""
     if is_modal:
         # For a true modal/blocking experience, we use exec_()
         window.setWindowModality(Qt.ApplicationModal)
         window.show()
-        app.exec() # This will block until the window is closed
+        QApplication.instance().exec() # This will block until the window is closed
     else:
         window.show()
         # In non-modal mode, just show the window; the main app.exec() will handle its event loop.
 
+def run(is_modal: bool = True):
+    """
+    Initializes and runs the QApplication.
+    If is_modal is True, it runs the window in a blocking way.
+    """
+    show(prepare(), is_modal=is_modal)
+
 if __name__ == "__main__":
     # This allows the script to be run directly.
     run(is_modal=False)
@@ -3,8 +3,8 @@ from __future__ import annotations
 import logging
 
 from src.shared.event_bus import EventBus
-from src.domain.notification_messages import AudioPlaybackRequestedEvent, FocusModeRequestedEvent
-from src.shared.audio_player import play
+from src.domain.notification_messages import AudioPlaybackRequestedEvent, FocusModeRequestedEvent, PrearmRequestedEvent
+from src.shared.audio_player import arm, play
 from src.qt_utils import run_in_qt_thread
 
 LOG = logging.getLogger(__name__)
@@ -14,18 +14,51 @@ class NotificationService:
     A service that handles events related to user notifications (UI, audio).
     It acts as the bridge between the event-driven backend and the Qt GUI.
     """
+    # Armed players are kept long enough for the adhan and the duaa that follows it.
+    PREARM_TTL_SECONDS = 900
+
     def __init__(self, event_bus: EventBus):
         self._event_bus = event_bus
+        self._prepared_focus_view = None
         self._event_bus.register(AudioPlaybackRequestedEvent, self.handle_audio_playback_requested)
         self._event_bus.register(FocusModeRequestedEvent, self.handle_focus_mode_requested)
+        self._event_bus.register(PrearmRequestedEvent, self.handle_prearm_requested)
 
     def _run_focus_steps(self, is_modal: bool = False):
-        """Activates focus mode by running the focus steps window."""
+        """Activates focus mode by running the focus steps window, using the pre-armed one if available."""
         LOG.info(f"Activating focus steps window (modal={is_modal}).")
-        from src.focus_steps_view import run as run_focus_steps_window
-        run_focus_steps_window(is_modal=is_modal)
+        window, self._prepared_focus_view = self._prepared_focus_view, None
+        if window is not None:
+            from src.focus_steps_view import show as show_focus_steps_window
+            show_focus_steps_window(window, is_modal=is_modal)
+        else:
+            from src.focus_steps_view import run as run_focus_steps_window
+            run_focus_steps_window(is_modal=is_modal)
         LOG.info("Focus steps window function called.")
 
+    @run_in_qt_thread
+    def _prepare_focus_view(self):
+        """Builds the focus window hidden, so showing it at prayer time is instant."""
+        if self._prepared_focus_view is None:
+            from src.focus_steps_view import prepare as prepare_focus_steps_window
+            self._prepared_focus_view = prepare_focus_steps_window()
+        LOG.info("Focus steps window pre-built.")
+
+    def handle_prearm_requested(self, event: PrearmRequestedEvent):
+        """Warms up audio playback and the focus window ahead of a prayer."""
+        LOG.info("Handling PrearmRequestedEvent.")
+        # Only the first sound opens the output device now, the others follow it.
+        armed = [
+            path for index, path in enumerate(event.audio_paths)
+            if arm(path, ttl=self.PREARM_TTL_SECONDS, open_device=(index == 0))
+        ]
+        self._prepare_focus_view()
+        if len(armed) == len(event.audio_paths):
+            LOG.info(f"Pre-arm complete, {len(armed)} audio file(s) ready.")
+        else:
+            missing = sorted(set(event.audio_paths) - set(armed))
+            LOG.warning(f"Pre-arm incomplete, these will start without warm-up: {missing}")
+
     @run_in_qt_thread
     def handle_focus_mode_requested(self, event: FocusModeRequestedEvent):
         """Handles the request to show the focus mode window on the GUI thread."""
@@ -35,4 +68,4 @@ class NotificationService:
     def handle_audio_playback_requested(self, event: AudioPlaybackRequestedEvent):
         """Handles the request to play audio."""
         LOG.info(f"Handling AudioPlaybackRequestedEvent for {event.audio_path}.")
-        play(event.audio_path)
+        play(event.audio_path, on_finished=event.on_finished)
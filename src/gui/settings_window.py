@@ -29,6 +29,7 @@ class Worker(QObject):
     cities_loaded = Signal(list, str)
     status_updated = Signal(str, str)
     google_auth_finished = Signal(object) # Pass credentials object
+    google_account_loaded = Signal(object, list) # User info and calendar list
     prompt_for_auth = Signal()
 
     def __init__(self, parent=None):
@@ -73,6 +74,8 @@ class Worker(QObject):
             self.google_auth_finished.emit(creds)
             if creds:
                 self.status_updated.emit("Google authentication successful!", "green")
+                # Fetched here rather than in the GUI thread, which only fills in the results.
+                self.google_account_loaded.emit(google_auth.get_user_info(creds), google_auth.get_calendar_list(creds))
         except google_auth.CredentialsNotFoundError as e:
             self.status_updated.emit(f"Google authentication failed: {e}", "red")
             self.prompt_for_auth.emit()
@@ -430,6 +433,7 @@ class SettingsWindow(QWidget):
         self.worker = Worker()
         self.thread = threading.Thread(target=self.worker.authenticate_google_calendar, args=(reauthenticate,), daemon=True)
         self.worker.google_auth_finished.connect(self.on_google_auth_finished)
+        self.worker.google_account_loaded.connect(self.on_google_account_loaded)
         self.worker.status_updated.connect(self.update_status)
         self.worker.error.connect(lambda msg: QMessageBox.critical(self, "Authentication Error", msg))
         self.worker.prompt_for_auth.connect(self.handle_google_auth_prompt)
@@ -461,10 +465,12 @@ class SettingsWindow(QWidget):
         self.calendar_service = GoogleCalendarService(creds)
         self.update_status("Google Calendar service initialized.", "green")
 
-        user_info = google_auth.get_user_info(creds)
-        self.google_user_label.setText(f"Authenticated as: {user_info.get('email', 'Unknown')}")
-        
-        calendars = google_auth.get_calendar_list(creds)
+        self.google_user_label.setText("Loading account...")
+        self.calendar_combo.setEnabled(False)
+
+    def on_google_account_loaded(self, user_info, calendars):
+        self.google_user_label.setText(f"Authenticated as: {(user_info or {}).get('email', 'Unknown')}")
+
         self.calendar_combo.clear()
         for cal in calendars:
             self.calendar_combo.addItem(cal['summary'], userData=cal['id'])
@@ -4,22 +4,24 @@
 from __future__ import annotations
 import functools
 import requests
-from datetime import datetime
-from typing import Dict
+from datetime import date, datetime
+from typing import Dict, Optional
 
 from src.config.security import TZ, LOG, API_URL
+from src.shared.clock import Clock, SystemClock
+
+_SYSTEM_CLOCK = SystemClock(TZ)
 
 # A simple in-memory cache for API responses to avoid hitting the API on every call
 _disk_cache: Dict[str, Dict[str, str]] = {}
 
-@functools.lru_cache(maxsize=None)
-def _fetch_raw(city: str, country: str, method: int | None, school: int | None) -> Dict[str, str]:
+@functools.lru_cache(maxsize=32)
+def _fetch_raw(city: str, country: str, method: int | None, school: int | None, day: date) -> Dict[str, str]:
     """
-    Fetches raw prayer time data from the Aladhan API.
+    Fetches raw prayer time data for the given day from the Aladhan API.
     This function is cached to prevent repeated API calls with the same parameters.
     """
-    today = datetime.now(TZ).date()
-    cache_key = f"{today.isoformat()}_{city}_{country}_{method}_{school}"
+    cache_key = f"{day.isoformat()}_{city}_{country}_{method}_{school}"
 
     if cache_key in _disk_cache:
         LOG.info("Returning prayer times from disk cache.")
@@ -35,7 +37,7 @@ def _fetch_raw(city: str, country: str, method: int | None, school: int | None)
     LOG.info(f"Fetching prayer times for {city}, {country} from API...")
     try:
         session = requests.Session()
-        response = session.get(API_URL, params=params, timeout=10)
+        response = session.get(f"{API_URL}/{day.strftime('%d-%m-%Y')}", params=params, timeout=10)
         response.raise_for_status()
         data = response.json()
         timings = data["data"]["timings"]
@@ -49,17 +51,18 @@ def _fetch_raw(city: str, country: str, method: int | None, school: int | None)
             return _disk_cache[cache_key]
         raise
 
-def today_times(city: str, country: str, method: int | None = None, school: int | None = None) -> Dict[str, datetime]:
+def today_times(city: str, country: str, method: int | None = None, school: int | None = None, clock: Optional[Clock] = None) -> Dict[str, datetime]:
     """
     Provides a dictionary of today's prayer times.
     
     Fetches data from the Aladhan API, with caching to prevent excessive calls.
     Filters out non-prayer events and returns timezone-aware datetime objects.
+    "Today" is taken from `clock`, which defaults to the system clock.
     """
-    timings_raw = _fetch_raw(city, country, method, school)
+    today = (clock or _SYSTEM_CLOCK).now().date()
+    timings_raw = _fetch_raw(city, country, method, school, today)
     
     prayer_times = {}
-    today = datetime.now(TZ).date()
     
     for name, time_str in timings_raw.items():
         if name in {"Imsak", "Sunset", "Midnight", "Firstthird", "Lastthird", "Sunrise"}:
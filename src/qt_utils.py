@@ -1,5 +1,6 @@
 
 from PySide6.QtCore import QTimer
+import functools
 import logging
 
 LOG = logging.getLogger(__name__)
@@ -18,6 +19,7 @@ def run_in_qt_thread(target_func):
         def my_gui_update_function():
             my_label.setText("Updated from another thread!")
     """
+    @functools.wraps(target_func)
     def wrapper(*args, **kwargs):
         LOG.debug(f"Scheduling {target_func.__name__} on Qt thread.")
         QTimer.singleShot(0, lambda: target_func(*args, **kwargs))
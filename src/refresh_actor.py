@@ -0,0 +1,78 @@
+# ------------------------------------------------------------------------
+# refresh_actor.py – runs schedule refreshes one at a time, off the GUI thread
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from src.config.security import LOG
+
+
+class RefreshActor:
+    """
+    Serializes refresh requests onto a single worker thread.
+
+    `submit` never blocks: it records the request and returns. Requests that
+    arrive while a refresh is running are coalesced, only the most recent one
+    is run afterwards, so a burst of config saves causes at most one extra
+    refresh and always with the latest settings.
+    """
+
+    def __init__(self, refresh: Callable[..., None], name: str = "refresh-actor"):
+        self._refresh = refresh
+        self._name = name
+        self._cond = threading.Condition()
+        self._pending: Optional[Dict[str, Any]] = None
+        self._busy = False
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.runs = 0
+        self.coalesced = 0
+
+    def submit(self, **kwargs) -> None:
+        """Queues a refresh with the given arguments, replacing any request not yet started."""
+        with self._cond:
+            if self._stopped:
+                LOG.warning("Refresh requested after the refresh actor was stopped. Ignoring it.")
+                return
+            if self._pending is not None:
+                self.coalesced += 1
+                LOG.debug("Coalescing refresh request with a pending one.")
+            self._pending = kwargs
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every submitted refresh has run. Returns False on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending is None and not self._busy, timeout=timeout)
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stops the worker thread after the refresh in progress, dropping pending requests."""
+        with self._cond:
+            self._stopped = True
+            self._pending = None
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._stopped)
+                if self._stopped:
+                    return
+                kwargs, self._pending = self._pending, None
+                self._busy = True
+            try:
+                self._refresh(**kwargs)
+            except Exception:
+                LOG.exception("Refresh failed in refresh actor.")
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self.runs += 1
+                    self._cond.notify_all()
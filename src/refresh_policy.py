@@ -0,0 +1,90 @@
+# ------------------------------------------------------------------------
+# refresh_policy.py – spreads the daily refresh and retries failed ones
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import hashlib
+import random
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+from typing import Dict, Optional
+
+from src.shared.backoff import exponential_backoff
+
+
+def install_fraction(install_id: str) -> float:
+    """Maps an install ID to a stable number in [0, 1)."""
+    digest = hashlib.sha256(install_id.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+def next_prayer_deadline(times: Dict[str, datetime], now: datetime) -> Optional[datetime]:
+    """
+    Estimates the next prayer after `now` from a (possibly stale) set of prayer times.
+    Times from earlier days are projected onto today or tomorrow.
+    """
+    candidates = []
+    for at in times.values():
+        candidate = datetime.combine(now.date(), at.timetz())
+        if candidate <= now:
+            candidate += timedelta(days=1)
+        candidates.append(candidate)
+    return min(candidates) if candidates else None
+
+
+@dataclass(frozen=True)
+class RefreshWindow:
+    """
+    The nightly window in which an installation refreshes its schedule.
+
+    Every installation picks a fixed offset inside the window derived from its
+    install ID, so a fleet spreads its calls to Aladhan and Google Calendar
+    over the whole window instead of hitting them all at the same minute.
+    The window is cut short so that the refresh always lands before Fajr.
+    """
+    start: time = time(0, 5)
+    end: time = time(3, 0)
+    fajr_margin: timedelta = timedelta(minutes=30)
+
+    def next_run(self, now: datetime, install_id: str, fajr: Optional[datetime] = None) -> datetime:
+        """Returns this installation's refresh time in the next night's window."""
+        day = now.date() + timedelta(days=1)
+        window_start = datetime.combine(day, self.start, tzinfo=now.tzinfo)
+        window_end = datetime.combine(day, self.end, tzinfo=now.tzinfo)
+
+        if fajr is not None:
+            # Tomorrow's Fajr moves by at most a couple of minutes, today's is a good estimate.
+            latest = datetime.combine(day, fajr.timetz()) - self.fajr_margin
+            window_end = min(window_end, latest)
+
+        if window_end <= window_start:
+            return window_start
+
+        span = (window_end - window_start).total_seconds()
+        return window_start + timedelta(seconds=int(span * install_fraction(install_id)))
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Decides when a failed refresh is retried.
+
+    Retries back off exponentially, but never wait longer than a fraction of the
+    time left until the next prayer: the closer the prayer, the more aggressively
+    the refresh is retried.
+    """
+    base_delay: timedelta = timedelta(seconds=30)
+    max_delay: timedelta = timedelta(minutes=30)
+    min_delay: timedelta = timedelta(seconds=10)
+    deadline_fraction: float = 0.25
+    urgent_within: timedelta = timedelta(hours=1)
+    rng: random.Random = field(default_factory=random.Random)
+
+    def next_delay(self, attempt: int, now: datetime, deadline: Optional[datetime] = None) -> timedelta:
+        delay = exponential_backoff(attempt, self.base_delay, self.max_delay, self.rng)
+        if deadline is not None and deadline > now:
+            delay = min(delay, (deadline - now) * self.deadline_fraction)
+        return max(delay, self.min_delay)
+
+    def is_urgent(self, now: datetime, deadline: Optional[datetime]) -> bool:
+        """True when the next prayer is close enough that a failed refresh is an error."""
+        return deadline is not None and deadline - now <= self.urgent_within
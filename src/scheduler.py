@@ -8,19 +8,25 @@ import threading
 
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from src.config.security import TZ, BUSY_SLOT, LOG
+from src.config.security import TZ, BUSY_SLOT, PREARM_LEAD, LOG, get_install_id
 from src.qt_utils import run_in_qt_thread
 from src.actions_executor import ActionExecutor
 from src.shared.event_bus import EventBus
-from src.shared.audio_player import wait_for_playback_to_finish
 from src.domain.config_messages import ConfigurationChangedEvent
 from src.domain.enums import AppState
 from src.domain.scheduler_messages import ApplicationStateChangedEvent, ScheduleRefreshedEvent
 from src.shared.commands import SimulatePrayerCommand
+from src.shared.clock import Clock, SystemClock
+from src.refresh_policy import RefreshWindow, RetryPolicy, next_prayer_deadline
+from src.refresh_actor import RefreshActor
+from src.calendar_api.allocator import BlockRequest
+from src.calendar_api.plan_store import PlanStore, plan_date
+from src.calendar_api.sync import plan_window, planned_writes, write_blocks
 
 
 if TYPE_CHECKING:
     from src.calendar_api.base import CalendarService
+    from src.calendar_api.write_behind import CalendarWriteBehind
 
 class PrayerScheduler:
     """
@@ -28,12 +34,26 @@ class PrayerScheduler:
     It handles fetching prayer times, scheduling jobs, and preventing duplicates.
     """
 
-    def __init__(self, audio_path: str, calendar_service: Optional[CalendarService], prayer_times_func, action_executor: ActionExecutor, event_bus: EventBus):
+    def __init__(self, audio_path: str, calendar_service: Optional[CalendarService], prayer_times_func, action_executor: ActionExecutor, event_bus: EventBus,
+                 install_id: Optional[str] = None, refresh_window: Optional[RefreshWindow] = None, retry_policy: Optional[RetryPolicy] = None,
+                 clock: Optional[Clock] = None, prearm_lead: timedelta = PREARM_LEAD,
+                 calendar_writer: Optional[CalendarWriteBehind] = None, plan_store: Optional[PlanStore] = None):
         self.audio_path = audio_path
         self.calendar_service = calendar_service
+        self.calendar_writer = calendar_writer
+        self.plan_store = plan_store
         self.prayer_times_func = prayer_times_func
         self.action_executor = action_executor
         self.event_bus = event_bus
+        self.clock = clock or SystemClock(TZ)
+        self.prearm_lead = prearm_lead
+        self.install_id = install_id or get_install_id()
+        self.refresh_window = refresh_window or RefreshWindow()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._last_times: Dict[str, datetime] = {}
+        self._refresh_attempt = 0
+        self._refresh_lock = threading.RLock()
+        self.refresh_actor = RefreshActor(self.refresh)
         job_defaults = {
             'misfire_grace_time': None
         }
@@ -48,12 +68,26 @@ class PrayerScheduler:
         LOG.info(f"Scheduler audio path updated to: {audio_path}")
         self.audio_path = audio_path
 
+    def request_refresh(self, *, city: str, country: str, method: int | None = None, school: int | None = None):
+        """
+        Asks for a refresh without waiting for it. The refresh runs on the refresh
+        actor's thread, bursts of requests are coalesced into one run with the
+        latest arguments. Safe to call from the GUI thread.
+        """
+        self.refresh_actor.submit(city=city, country=country, method=method, school=school)
+
     def refresh(self, *, city: str, country: str, method: int | None = None, school: int | None = None, dry_run: bool = False, dry_run_event: Optional[threading.Event] = None):
         """
         Wipes all existing jobs and schedules prayers for the current day.
-        A daily refresh job is also scheduled to run shortly after midnight.
-        This method is idempotent.
+        The next refresh is scheduled inside tonight's refresh window, at an offset
+        derived from the install ID. A failed refresh is retried with backoff.
+        This method is idempotent and blocks until done; concurrent calls are
+        serialized. Use `request_refresh` from threads that must not block.
         """
+        with self._refresh_lock:
+            self._refresh(city=city, country=country, method=method, school=school, dry_run=dry_run, dry_run_event=dry_run_event)
+
+    def _refresh(self, *, city: str, country: str, method: int | None, school: int | None, dry_run: bool, dry_run_event: Optional[threading.Event]):
         self.event_bus.publish(ApplicationStateChangedEvent(new_state=AppState.SYNCING))
         LOG.info(f"Refreshing prayer schedule for {city}, {country}")
         self.scheduler.remove_all_jobs()
@@ -62,33 +96,59 @@ class PrayerScheduler:
         if dry_run and dry_run_event:
             self.action_executor.set_dry_run_event(dry_run_event)
 
+        job_kwargs = {"city": city, "country": country}
+        if method is not None:
+            job_kwargs["method"] = method
+        if school is not None:
+            job_kwargs["school"] = school
+
         try:
             times = self.prayer_times_func(city, country, method, school)
             LOG.info(f"Today's prayer times: {times}")
             self._schedule_day(times, dry_run)
             LOG.info("All prayer jobs for today added to the scheduler.")
 
-            job_kwargs = {"city": city, "country": country}
-            if method is not None:
-                job_kwargs["method"] = method
-            if school is not None:
-                job_kwargs["school"] = school
-
+            # A dry run schedules a synthetic prayer, its times say nothing about tomorrow.
+            if not dry_run:
+                self._last_times = dict(times)
+            next_refresh = self.refresh_window.next_run(self.clock.now(), self.install_id, fajr=self._last_times.get("Fajr"))
             self.scheduler.add_job(
-                self.refresh, "cron", hour=0, minute=5,
+                self.request_refresh, "date", run_date=next_refresh,
                 id="daily-refresh", replace_existing=True, kwargs=job_kwargs
             )
-            LOG.info("Next daily refresh job at 00:05 added to the scheduler.")
+            LOG.info(f"Next daily refresh job at {next_refresh.strftime('%Y-%m-%d %H:%M:%S')} added to the scheduler.")
         except Exception as e:
             LOG.error(f"An error occurred during refresh: {e}")
+            self._schedule_refresh_retry(job_kwargs)
             self.event_bus.publish(ApplicationStateChangedEvent(new_state=AppState.ERROR))
         else:
+            self._refresh_attempt = 0
             self.event_bus.publish(ApplicationStateChangedEvent(new_state=AppState.IDLE))
             if dry_run:
                 self.event_bus.publish(ScheduleRefreshedEvent(next_prayer_info="Dry run: Prayer scheduled for immediate execution"))
             else:
                 self._update_next_prayer_info()
 
+    def _schedule_refresh_retry(self, job_kwargs: dict):
+        """
+        Schedules another refresh attempt after a failure.
+        The delay grows with every attempt but shrinks as the next prayer approaches.
+        """
+        now = self.clock.now()
+        deadline = next_prayer_deadline(self._last_times, now)
+        delay = self.retry_policy.next_delay(self._refresh_attempt, now, deadline)
+        self._refresh_attempt += 1
+
+        self.scheduler.add_job(
+            self.request_refresh, "date", run_date=now + delay,
+            id="refresh-retry", replace_existing=True, kwargs=job_kwargs
+        )
+        message = f"Refresh attempt {self._refresh_attempt} failed, retrying in {int(delay.total_seconds())}s."
+        if self.retry_policy.is_urgent(now, deadline):
+            LOG.error(f"{message} Next prayer is at {deadline.strftime('%H:%M')}.")
+        else:
+            LOG.warning(message)
+
     def run(self):
         """Starts the scheduler's background loop."""
         if not self.scheduler.running:
@@ -97,36 +157,51 @@ class PrayerScheduler:
         else:
             LOG.info("Scheduler is already running.")
 
-    def play_adhan_and_duaa(self):
+    @staticmethod
+    def _prayer_audio_paths() -> tuple[str, str]:
+        """Paths of the adhan and the duaa played after it, in playing order."""
+        from src.config.security import get_asset_path
+        return str(get_asset_path('adhan.wav')), str(get_asset_path('duaa_after_adhan.wav'))
+
+    def play_adhan_and_duaa(self, scheduled_at: Optional[datetime] = None):
         """
         A combined action to play adhan and duaa.
+        The sequence is chained on playback completion, so the scheduler's worker
+        thread is released as soon as the adhan has been started.
         """
         LOG.info("Executing play_adhan_and_duaa for scheduled job.")
         self.event_bus.publish(ApplicationStateChangedEvent(new_state=AppState.PRAYER_TIME))
         
         try:
-            from src.config.security import get_asset_path
-            adhan_path = str(get_asset_path('adhan.wav'))
-            duaa_path = str(get_asset_path('duaa_after_adhan.wav'))
+            adhan_path, duaa_path = self._prayer_audio_paths()
 
             LOG.info(f"Playing Adhan from {adhan_path}")
-            self.action_executor.play_audio(adhan_path)
-            wait_for_playback_to_finish()
-            LOG.info("Adhan finished. Playing Duaa.")
-            self.action_executor.play_audio(duaa_path)
-            wait_for_playback_to_finish()
-            LOG.info("Duaa finished.")
+            adhan = self.action_executor.play_audio(adhan_path)
+            if scheduled_at is not None:
+                latency_ms = (self.clock.now() - scheduled_at).total_seconds() * 1000
+                LOG.info(f"Adhan requested {latency_ms:.0f} ms after its scheduled time.")
+            adhan.add_done_callback(lambda _: self._play_duaa(duaa_path))
+        except Exception as e:
+            LOG.error(f"Error during audio playback or focus mode trigger: {e}")
+            self._finish_playback_sequence()
 
+    def _play_duaa(self, duaa_path: str):
+        """Second step of the prayer sequence, run when the adhan has finished."""
+        try:
+            LOG.info("Adhan finished. Playing Duaa.")
+            duaa = self.action_executor.play_audio(duaa_path)
+            duaa.add_done_callback(lambda _: self._finish_playback_sequence())
         except Exception as e:
             LOG.error(f"Error during audio playback or focus mode trigger: {e}")
-        
-        finally:
-            LOG.info("Playback sequence complete. Setting state to IDLE.")
-            self.event_bus.publish(ApplicationStateChangedEvent(new_state=AppState.IDLE))
-            # Do not update GUI components in a dry run, as there is no GUI.
-            # This also prevents a race condition on scheduler shutdown.
-            if not self.action_executor._dry_run:
-                self._update_next_prayer_info()
+            self._finish_playback_sequence()
+
+    def _finish_playback_sequence(self):
+        LOG.info("Playback sequence complete. Setting state to IDLE.")
+        self.event_bus.publish(ApplicationStateChangedEvent(new_state=AppState.IDLE))
+        # Do not update GUI components in a dry run, as there is no GUI.
+        # This also prevents a race condition on scheduler shutdown.
+        if not self.action_executor.dry_run:
+            self._update_next_prayer_info()
 
     def run_dry_run_simulation(self, city: str, country: str, method: Optional[int], school: Optional[int]):
         """
@@ -172,8 +247,14 @@ class PrayerScheduler:
         )
         self.scheduler.add_job(
             self.play_adhan_and_duaa, "date", run_date=at,
-            id=f"prayer-{job_base_id}"
+            id=f"prayer-{job_base_id}", kwargs={"scheduled_at": at}
         )
+        if self.prearm_lead > timedelta(0):
+            # Warm up audio and the focus window so that at prayer time only the "go" is left.
+            self.scheduler.add_job(
+                self.action_executor.prearm, "date", run_date=at - self.prearm_lead,
+                id=f"prearm-{job_base_id}", args=[list(self._prayer_audio_paths())]
+            )
         if is_dry_run:
             LOG.info(f"Dry run prayer simulation scheduled at {at.strftime('%H:%M:%S')}")
         else:
@@ -183,7 +264,7 @@ class PrayerScheduler:
         """
         Schedules all prayer-related jobs for the given times.
         """
-        now = datetime.now(TZ)
+        now = self.clock.now()
         LOG.debug(f"Scheduling for today. Current time: {now.strftime('%H:%M')}")
 
         if dry_run:
@@ -197,43 +278,68 @@ class PrayerScheduler:
             LOG.info(f"Dry run prayer and focus sequence scheduled at {slot.strftime('%H:%M:%S')}")
             return
 
+        planned = []
+        upcoming = []
         # Sort by time, not by name, to process chronologically
         for name, at in sorted(times.items(), key=lambda item: item[1]):
             if name in {"Sunrise", "Firstthird", "Lastthird"}:
                 continue
 
+            planned.append(BlockRequest(summary=name, start=at, duration=BUSY_SLOT))
             if at < now:
                 LOG.debug(f"Skipping past prayer: {name} at {at.strftime('%H:%M')}")
                 continue
 
-            slot = at
-
-            if self.calendar_service:
-                LOG.debug(f"Attempting to add calendar event for {name} at {at}")
-                try:
-                    self.calendar_service.add_event(
-                        start_time=at,
-                        summary=name,
-                        duration_minutes=BUSY_SLOT.total_seconds() / 60
-                    )
-                except Exception as e:
-                    LOG.error(f"Failed to add event to calendar for {name}: {e}")
-            else:
-                LOG.info("Calendar service not active. Skipping calendar event creation.")
+            upcoming.append((name, at))
+
+        if self.calendar_writer or self.calendar_service:
+            self._sync_calendar(planned, upcoming)
+        else:
+            LOG.info("Calendar service not active. Skipping calendar event creation.")
 
+        for name, at in upcoming:
             self._schedule_single_prayer_job(
                 name=name,
-                at=slot,
+                at=at,
                 is_dry_run=False
             )
 
+    def _sync_calendar(self, planned, upcoming):
+        """
+        Brings the calendar in line with the day's plan, see planned_writes.
+        Writes go through the write-behind queue when there is one.
+        """
+        service = self.calendar_writer.service if self.calendar_writer else self.calendar_service
+        requests = [BlockRequest(summary=name, start=at, duration=BUSY_SLOT) for name, at in upcoming]
+        writes = planned_writes(service, planned, requests, self.plan_store)
+        if not writes.needed:
+            return
+
+        if self.calendar_writer:
+            if writes.cleanup:
+                self.calendar_writer.enqueue_reconcile(writes.cleanup, *plan_window(writes.cleanup))
+            self.calendar_writer.enqueue_blocks(writes.requests)
+            # The queue keeps the writes until they succeed; the writer forgets the plan if it gives up.
+            written = True
+        else:
+            written = write_blocks(service, writes.requests, writes.cleanup)
+        if written and writes.diff is not None:
+            self.plan_store.save(service.calendar_key, plan_date(planned), planned)
+
     @run_in_qt_thread
     def _update_next_prayer_info(self):
         """
-        Finds the next scheduled prayer and updates the state manager.
-        This is run in the Qt thread to prevent race conditions with the scheduler.
+        Publishes the next scheduled prayer from the Qt thread, to prevent
+        race conditions with the scheduler.
+        """
+        self.publish_next_prayer_info()
+
+    def publish_next_prayer_info(self):
+        """
+        Finds the next scheduled prayer and publishes it to the state manager
+        on the calling thread. Headless callers without a Qt thread use this.
         """
-        now = datetime.now(TZ)
+        now = self.clock.now()
         next_prayer_job = None
         
         all_jobs = self.scheduler.get_jobs()
@@ -259,8 +365,9 @@ class PrayerScheduler:
     def _handle_config_change(self, event: ConfigurationChangedEvent):
         LOG.info("ConfigurationChangedEvent received, refreshing schedule.")
         config = event.config
+        self.prearm_lead = timedelta(seconds=config.prearm_seconds)
         if config.city and config.country:
-            self.refresh(
+            self.request_refresh(
                 city=config.city,
                 country=config.country,
                 method=config.method,
@@ -271,7 +378,7 @@ class PrayerScheduler:
 
     def _handle_simulate_prayer_command(self, command: SimulatePrayerCommand):
         LOG.info(f"Received SimulatePrayerCommand for {command.prayer_name}.")
-        now = datetime.now(TZ)
+        now = self.clock.now()
         # Schedule the simulation 5 seconds from now
         simulation_time = now + timedelta(seconds=5)
         self._schedule_single_prayer_job(
@@ -6,13 +6,30 @@ import sys
 import tempfile
 from importlib import resources
 import logging
+import struct
 import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
 
 LOG = logging.getLogger(__name__)
 
 _active_playback_processes: list[subprocess.Popen] = []
 _playback_finished_event = threading.Event()
 
+# Players started ahead of time by arm(), keyed by the audio path they will play.
+_armed_players: Dict[str, "_ArmedPlayer"] = {}
+_armed_lock = threading.Lock()
+
+# A playsound interpreter that has paid its start-up and import cost and waits for a path on stdin.
+_PLAYSOUND_ARMED = "import sys; from playsound import playsound; playsound(sys.stdin.readline().strip())"
+
+@dataclass
+class _ArmedPlayer:
+    process: subprocess.Popen
+    payload: bytes
+
 def _play_with_playsound(audio_path: str) -> subprocess.Popen:
     """Plays audio using the playsound library as a fallback, via subprocess."""
     command = [sys.executable, "-c", f"from playsound import playsound; playsound('{audio_path}')"]
@@ -20,15 +37,150 @@ def _play_with_playsound(audio_path: str) -> subprocess.Popen:
     process = subprocess.Popen(command)
     return process
 
-def play(audio_path: str) -> None:
+def _wav_header_length(data: bytes) -> Optional[int]:
+    """Returns the offset of the PCM samples in a RIFF/WAVE file, or None if it is not one."""
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return None
+    offset = 12
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        (chunk_size,) = struct.unpack('<I', data[offset + 4:offset + 8])
+        if chunk_id == b'data':
+            return offset + 8
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+def _load_audio(audio_path: str) -> Optional[bytes]:
+    """Reads an audio file, falling back to the bundled adhan in frozen builds."""
+    if os.path.exists(audio_path):
+        with open(audio_path, 'rb') as f:
+            return f.read()
+    if getattr(sys, 'frozen', False):
+        return resources.read_binary('assets', 'adhan.wav')
+    return None
+
+def _terminate(process: subprocess.Popen) -> None:
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+def arm(audio_path: str, ttl: float = 300.0, open_device: bool = True) -> bool:
+    """
+    Prepares playback of `audio_path` so that a later play() of the same path
+    only has to send the "go" signal. The file is loaded and validated and the
+    player process is started: on Linux, aplay is fed the WAV header so it has
+    already opened and configured the output device, elsewhere a playsound
+    interpreter is started and waits for its input.
+    With `open_device=False` aplay is started but gets the header only at "go",
+    so a sound that follows another one does not hold the device meanwhile.
+    Unused players are discarded after `ttl` seconds. Returns True when ready.
+    """
+    try:
+        data = _load_audio(audio_path)
+    except OSError as e:
+        LOG.error(f"Could not read audio file {audio_path}: {e}")
+        return False
+    if not data:
+        LOG.error(f"Audio file not found or empty, cannot arm playback: {audio_path}")
+        return False
+
+    try:
+        if sys.platform.startswith('linux'):
+            header_length = _wav_header_length(data)
+            if header_length is None:
+                LOG.warning(f"{audio_path} is not a WAV file, it will be played without pre-arming.")
+                return False
+            process = subprocess.Popen(['aplay', '-q', '-'], stdin=subprocess.PIPE)
+            if open_device:
+                process.stdin.write(data[:header_length])
+                process.stdin.flush()
+                payload = data[header_length:]
+            else:
+                payload = data
+        else:
+            if not os.path.exists(audio_path):
+                return False
+            process = subprocess.Popen([sys.executable, "-c", _PLAYSOUND_ARMED], stdin=subprocess.PIPE)
+            payload = f"{audio_path}\n".encode('utf-8')
+    except OSError as e:
+        LOG.error(f"Could not start pre-armed player for {audio_path}: {e}")
+        return False
+
+    player = _ArmedPlayer(process=process, payload=payload)
+    with _armed_lock:
+        previous = _armed_players.pop(audio_path, None)
+        _armed_players[audio_path] = player
+    if previous is not None:
+        _terminate(previous.process)
+
+    expiry = threading.Timer(ttl, _disarm, args=(audio_path, player))
+    expiry.daemon = True
+    expiry.start()
+    LOG.info(f"Playback armed for {audio_path}.")
+    return True
+
+def _disarm(audio_path: str, player: Optional[_ArmedPlayer] = None) -> None:
+    """Discards the armed player for `audio_path` (only `player`, if given)."""
+    with _armed_lock:
+        current = _armed_players.get(audio_path)
+        if current is None or (player is not None and current is not player):
+            return
+        del _armed_players[audio_path]
+    LOG.info(f"Discarding unused armed player for {audio_path}.")
+    _terminate(current.process)
+
+def _take_armed(audio_path: str) -> Optional[_ArmedPlayer]:
+    with _armed_lock:
+        player = _armed_players.pop(audio_path, None)
+    if player is not None and player.process.poll() is not None:
+        LOG.warning(f"Armed player for {audio_path} exited early, playing without it.")
+        return None
+    return player
+
+def _play_armed(player: _ArmedPlayer, finished: Future) -> None:
+    """Sends the go signal to an armed player on a playback thread."""
+    go = time.perf_counter()
+
+    def _armed_target():
+        process = player.process
+        _active_playback_processes.append(process)
+        try:
+            LOG.info(f"📢 Armed playback started {(time.perf_counter() - go) * 1000:.1f} ms after the go signal.")
+            process.stdin.write(player.payload)
+            process.stdin.close()
+            process.wait(timeout=180)
+            LOG.info("Armed playback finished.")
+        except (OSError, subprocess.TimeoutExpired) as e:
+            LOG.error(f"Armed playback failed: {e}")
+            _terminate(process)
+        finally:
+            if process in _active_playback_processes:
+                _active_playback_processes.remove(process)
+            if not _active_playback_processes:
+                _playback_finished_event.set()
+            finished.set_result(None)
+
+    threading.Thread(target=_armed_target).start()
+
+def play(audio_path: str, on_finished: Optional[Callable[[], None]] = None) -> Future:
     """
     Plays the given audio file using a suitable method for the current platform.
-    This is a non-blocking call.
+    This is a non-blocking call. The returned future resolves, and `on_finished`
+    is called, once this playback has ended, failed or been stopped.
     """
     global _active_playback_processes
 
+    finished: Future = Future()
+    if on_finished is not None:
+        finished.add_done_callback(lambda _: on_finished())
+
     _playback_finished_event.clear()
 
+    armed = _take_armed(audio_path)
+    if armed is not None:
+        _play_armed(armed, finished)
+        return finished
+
     effective_audio_path = audio_path
 
     if getattr(sys, 'frozen', False) and not os.path.exists(audio_path):
@@ -45,7 +197,8 @@ def play(audio_path: str) -> None:
     if not effective_audio_path or not os.path.exists(effective_audio_path):
         LOG.error(f"Audio file not found: {audio_path} (effective: {effective_audio_path})")
         _playback_finished_event.set()
-        return
+        finished.set_result(None)
+        return finished
 
     def _playback_target():
         global _active_playback_processes
@@ -64,10 +217,10 @@ def play(audio_path: str) -> None:
                 LOG.info("Playback finished successfully via playsound.")
         except (subprocess.CalledProcessError, FileNotFoundError, subprocess.TimeoutExpired) as e:
             LOG.error(f"aplay failed with error: {e}. Falling back to playsound.")
-            _play_with_playsound(effective_audio_path)
+            process = _wait_for_fallback(process, effective_audio_path)
         except Exception as e:
             LOG.error(f"An unexpected error occurred during aplay execution: {e}. Falling back to playsound.")
-            _play_with_playsound(effective_audio_path)
+            process = _wait_for_fallback(process, effective_audio_path)
         finally:
             if process and process in _active_playback_processes:
                 _active_playback_processes.remove(process)
@@ -80,8 +233,23 @@ def play(audio_path: str) -> None:
                     LOG.warning(f"Could not remove temporary audio file {effective_audio_path}: {e}")
             if not _active_playback_processes: # Only set event if all playback is done
                 _playback_finished_event.set()
+            finished.set_result(None)
 
     threading.Thread(target=_playback_target).start()
+    return finished
+
+def _wait_for_fallback(failed_process: Optional[subprocess.Popen], audio_path: str) -> Optional[subprocess.Popen]:
+    """Replaces a failed playback process with playsound and waits for it, so completion is reported correctly."""
+    if failed_process and failed_process in _active_playback_processes:
+        _active_playback_processes.remove(failed_process)
+    try:
+        process = _play_with_playsound(audio_path)
+        _active_playback_processes.append(process)
+        process.wait(timeout=180)
+        return process
+    except Exception as e:
+        LOG.error(f"Fallback playback failed: {e}")
+        return None
 
 def wait_for_playback_to_finish():
     """Waits for all active audio playbacks to finish."""
@@ -92,6 +260,11 @@ def wait_for_playback_to_finish():
 def stop_playback():
     """Stops any currently active audio playback."""
     global _active_playback_processes
+    with _armed_lock:
+        armed = list(_armed_players.values())
+        _armed_players.clear()
+    for player in armed:
+        _terminate(player.process)
     for process in list(_active_playback_processes): # Iterate over a copy as list will be modified
         if process.poll() is None: # Process is still running
             LOG.info(f"Attempting to stop audio playback process {process.pid}.")
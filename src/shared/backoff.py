@@ -0,0 +1,21 @@
+# src/shared/backoff.py
+from __future__ import annotations
+import random
+from datetime import timedelta
+from typing import Optional
+
+MAX_DOUBLINGS = 32
+
+
+def exponential_backoff(attempt: int, base: timedelta, cap: timedelta, rng: Optional[random.Random] = None) -> timedelta:
+    """
+    Returns the delay before retry number `attempt` (0-based).
+
+    The delay doubles with every attempt up to `cap` and is then spread with
+    "equal jitter" (between half and the full delay) so that many clients
+    failing at the same moment do not retry in lockstep.
+    """
+    rng = rng or random
+    # Past 2**32 every delay is at the cap anyway; a larger power overflows the float product.
+    ceiling = min(cap.total_seconds(), base.total_seconds() * (2 ** min(max(attempt, 0), MAX_DOUBLINGS)))
+    return timedelta(seconds=ceiling / 2 + rng.uniform(0, ceiling / 2))
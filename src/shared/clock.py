@@ -0,0 +1,52 @@
+# src/shared/clock.py
+from __future__ import annotations
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, tzinfo
+
+
+class Clock(ABC):
+    """A source of the current time. Lets the scheduler run on real or simulated time."""
+
+    @abstractmethod
+    def now(self) -> datetime:
+        """
+        The current time, timezone-aware.
+        """
+
+
+class SystemClock(Clock):
+    """The wall clock, in the given timezone."""
+
+    def __init__(self, tz: tzinfo):
+        self.tz = tz
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+
+class VirtualClock(Clock):
+    """
+    A clock that only moves when told to. Used to fast-forward the scheduler
+    through days or years of schedules in a simulation.
+    """
+
+    def __init__(self, start: datetime):
+        if start.tzinfo is None:
+            raise ValueError("VirtualClock requires a timezone-aware start time.")
+        self._now = start
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        with self._lock:
+            return self._now
+
+    def set(self, moment: datetime) -> None:
+        with self._lock:
+            if moment < self._now:
+                raise ValueError(f"Cannot move virtual clock backwards from {self._now} to {moment}.")
+            self._now = moment
+
+    def advance(self, delta: timedelta) -> None:
+        with self._lock:
+            self._now += delta
@@ -0,0 +1,239 @@
+# ------------------------------------------------------------------------
+# simulation.py – fast-forwards the scheduler through days on a virtual clock
+# ------------------------------------------------------------------------
+from __future__ import annotations
+import math
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from src.config.security import TZ, LOG
+from src.calendar_api.base import CalendarService
+from src.actions_executor import ActionExecutor
+from src.scheduler import PrayerScheduler
+from src.shared.clock import VirtualClock
+from src.shared.event_bus import EventBus
+
+# Rough yearly swing of the prayer times at mid-northern latitudes, in minutes.
+# (base time in minutes after midnight, amplitude, sign of the summer shift)
+_SYNTHETIC_TIMES = {
+    "Fajr": (300, 100, -1),
+    "Dhuhr": (790, 5, 1),
+    "Asr": (970, 60, 1),
+    "Maghrib": (1110, 130, 1),
+    "Isha": (1210, 150, 1),
+}
+
+
+def synthetic_prayer_times(clock: VirtualClock) -> Callable[..., Dict[str, datetime]]:
+    """
+    Returns a drop-in replacement for `today_times` that derives plausible,
+    seasonally shifting prayer times from the clock's date, without network access.
+    """
+    def times(city: str, country: str, method: int | None = None, school: int | None = None) -> Dict[str, datetime]:
+        day = clock.now().date()
+        season = math.sin(2 * math.pi * (day.timetuple().tm_yday - 80) / 365.25)
+        midnight = datetime(day.year, day.month, day.day, tzinfo=TZ)
+        result = {}
+        for name, (base, amplitude, sign) in _SYNTHETIC_TIMES.items():
+            minutes = min(max(int(base + sign * amplitude * season), 0), 1439)
+            result[name] = midnight + timedelta(minutes=minutes)
+        return result
+    return times
+
+
+class InMemoryCalendarService(CalendarService):
+    """A calendar kept in memory that counts the calls made against it."""
+
+    def __init__(self):
+        self.events: Dict[str, Dict[str, Any]] = {}
+        self.calls: Counter = Counter()
+
+    def get_events(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
+        self.calls["get_events"] += 1
+        return sorted(
+            (e for e in self.events.values() if e["_start"] < end_time and e["_end"] > start_time),
+            key=lambda e: e["_start"],
+        )
+
+    def create_event(self, summary: str, start_time: datetime, end_time: datetime, description: str) -> Dict[str, Any]:
+        self.calls["create_event"] += 1
+        event = {
+            "id": uuid.uuid4().hex,
+            "summary": summary,
+            "description": description,
+            "start": {"dateTime": start_time.isoformat()},
+            "end": {"dateTime": end_time.isoformat()},
+            "_start": start_time,
+            "_end": end_time,
+        }
+        self.events[event["id"]] = event
+        return event
+
+    def delete_event(self, event_id: str) -> None:
+        self.calls["delete_event"] += 1
+        self.events.pop(event_id, None)
+
+    def find_first_available_slot(self, start_time: datetime, duration_minutes: int) -> datetime:
+        slot = start_time
+        for event in self.get_events(start_time, start_time + timedelta(days=1)):
+            if slot + timedelta(minutes=duration_minutes) <= event["_start"]:
+                break
+            slot = max(slot, event["_end"])
+        return slot
+
+    def add_event(self, start_time: datetime, summary: str, duration_minutes: int) -> bool:
+        self.calls["add_event"] += 1
+        slot = self.find_first_available_slot(start_time, duration_minutes)
+        self.create_event(summary, slot, slot + timedelta(minutes=duration_minutes), "Scheduled by Prayer App")
+        return True
+
+    def setup_credentials(self) -> None:
+        pass
+
+
+class _HeadlessPrayerScheduler(PrayerScheduler):
+    """A PrayerScheduler that publishes next-prayer updates directly instead of via the Qt thread."""
+
+    def _update_next_prayer_info(self):
+        self.publish_next_prayer_info()
+
+
+@dataclass
+class SimulationReport:
+    days: int
+    virtual_start: datetime
+    virtual_end: Optional[datetime] = None
+    jobs_fired: Counter = field(default_factory=Counter)
+    max_pending_jobs: int = 0
+    max_drift: timedelta = timedelta(0)
+    calendar_calls: Counter = field(default_factory=Counter)
+    memory_current_kib: float = 0.0
+    memory_peak_kib: float = 0.0
+    wall_seconds: float = 0.0
+
+    def summary(self) -> str:
+        fired = ", ".join(f"{kind}={count}" for kind, count in sorted(self.jobs_fired.items())) or "none"
+        calls = ", ".join(f"{name}={count}" for name, count in sorted(self.calendar_calls.items())) or "none"
+        return (
+            f"Simulated {self.days} day(s) from {self.virtual_start:%Y-%m-%d %H:%M} to {self.virtual_end:%Y-%m-%d %H:%M} "
+            f"in {self.wall_seconds:.2f}s\n"
+            f"  jobs fired:      {fired}\n"
+            f"  max pending:     {self.max_pending_jobs}\n"
+            f"  max drift:       {self.max_drift.total_seconds():.0f}s\n"
+            f"  calendar calls:  {calls}\n"
+            f"  memory:          {self.memory_current_kib:.0f} KiB current, {self.memory_peak_kib:.0f} KiB peak"
+        )
+
+
+def _job_kind(job_id: str) -> str:
+    if job_id.startswith("prayer-"):
+        return "prayer"
+    if job_id in {"daily-refresh", "refresh-retry"}:
+        return "refresh"
+    return "other"
+
+
+class TimeWarpSimulator:
+    """
+    Drives a PrayerScheduler on a VirtualClock. Instead of letting APScheduler's
+    thread wait for real time, the simulator repeatedly jumps the clock to the
+    next due job and runs it, so weeks or years of scheduling pass in seconds.
+
+    Drift is the distance between the virtual time a prayer job actually
+    runs at and the prayer time it was scheduled for, which the scheduler
+    records in the job's `scheduled_at` argument. A job that was moved, e.g.
+    rescheduled after a misfire or a retry, shows up as drift.
+    """
+
+    def __init__(self, scheduler: PrayerScheduler, clock: VirtualClock, report_every_days: int = 30):
+        self.scheduler = scheduler
+        self.clock = clock
+        self.report_every_days = report_every_days
+
+    def run(self, days: int, *, city: str, country: str, method: int | None = None, school: int | None = None) -> SimulationReport:
+        report = SimulationReport(days=days, virtual_start=self.clock.now())
+        end = report.virtual_start + timedelta(days=days)
+        next_progress = report.virtual_start + timedelta(days=self.report_every_days)
+        calendar = self.scheduler.calendar_service
+
+        tracemalloc.start()
+        wall_start = time.perf_counter()
+        engine = self.scheduler.scheduler
+        engine.start(paused=True)
+        try:
+            self.scheduler.refresh(city=city, country=country, method=method, school=school)
+            while True:
+                jobs = engine.get_jobs()
+                report.max_pending_jobs = max(report.max_pending_jobs, len(jobs))
+                if not jobs or jobs[0].next_run_time > end:
+                    break
+
+                job = jobs[0]
+                fire_time = job.next_run_time
+                self.clock.set(fire_time)
+                self._fire(job, fire_time, report)
+
+                if self.clock.now() >= next_progress:
+                    self._snapshot(report, calendar, wall_start)
+                    LOG.info(f"Simulation at {self.clock.now():%Y-%m-%d}: {sum(report.jobs_fired.values())} jobs fired, "
+                             f"max drift {report.max_drift.total_seconds():.0f}s, peak memory {report.memory_peak_kib:.0f} KiB")
+                    next_progress += timedelta(days=self.report_every_days)
+        finally:
+            self.scheduler.refresh_actor.stop()
+            engine.shutdown(wait=False)
+            self._snapshot(report, calendar, wall_start)
+            tracemalloc.stop()
+
+        report.virtual_end = end
+        return report
+
+    def _fire(self, job, fire_time: datetime, report: SimulationReport):
+        # Retire the job before running it, as APScheduler does: running it may refresh the whole job store.
+        following = job.trigger.get_next_fire_time(fire_time, fire_time)
+        if following:
+            job.modify(next_run_time=following)
+        else:
+            job.remove()
+
+        kind = _job_kind(job.id)
+        report.jobs_fired[kind] += 1
+        scheduled_at = job.kwargs.get("scheduled_at") if kind == "prayer" else None
+
+        try:
+            if scheduled_at is not None:
+                report.max_drift = max(report.max_drift, abs(self.clock.now() - scheduled_at))
+            job.func(*job.args, **job.kwargs)
+        except Exception as e:
+            LOG.error(f"Simulated job {job.id} failed: {e}")
+        # Refresh jobs only hand their work to the refresh actor, wait for it to stay in step.
+        self.scheduler.refresh_actor.flush()
+
+    def _snapshot(self, report: SimulationReport, calendar, wall_start: float):
+        current, peak = tracemalloc.get_traced_memory()
+        report.memory_current_kib = current / 1024
+        report.memory_peak_kib = peak / 1024
+        report.wall_seconds = time.perf_counter() - wall_start
+        report.calendar_calls = Counter(getattr(calendar, "calls", {}))
+
+
+def run_simulation(days: int, city: str, country: str, method: int | None = None, school: int | None = None,
+                   start: Optional[datetime] = None) -> SimulationReport:
+    """Runs an offline time-warp simulation with synthetic prayer times and an in-memory calendar."""
+    clock = VirtualClock(start or datetime.now(TZ))
+    event_bus = EventBus()
+    scheduler = _HeadlessPrayerScheduler(
+        audio_path="",
+        calendar_service=InMemoryCalendarService(),
+        prayer_times_func=synthetic_prayer_times(clock),
+        action_executor=ActionExecutor(event_bus, dry_run=True),
+        event_bus=event_bus,
+        clock=clock,
+    )
+    report = TimeWarpSimulator(scheduler, clock).run(days, city=city, country=country, method=method, school=school)
+    LOG.info(report.summary())
+    return report
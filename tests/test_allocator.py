@@ -0,0 +1,74 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from src.calendar_api.allocator import BlockRequest, allocate, merge_intervals
+from src.calendar_api.snapshot import first_fit
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+
+
+def at(hour, minute=0, day=0):
+    return DAY + timedelta(days=day, hours=hour, minutes=minute)
+
+
+class TestAllocator(unittest.TestCase):
+
+    def test_merge_intervals(self):
+        merged = merge_intervals([(at(11), at(12)), (at(9), at(10)), (at(10), at(10, 30)), (at(9, 15), at(9, 45))])
+        self.assertEqual(merged, [(at(9), at(10, 30)), (at(11), at(12))])
+
+    def test_blocks_skip_busy_times(self):
+        busy = [(at(12), at(13)), (at(13), at(13, 30))]
+        requests = [BlockRequest("Dhuhr", at(12, 55), timedelta(minutes=10)),
+                    BlockRequest("Fajr", at(4, 30), timedelta(minutes=10))]
+
+        allocations = allocate(busy, requests)
+
+        self.assertEqual([a.request.summary for a in allocations], ["Dhuhr", "Fajr"])
+        self.assertEqual(allocations[0].start, at(13, 30))
+        self.assertEqual(allocations[1].start, at(4, 30))
+
+    def test_blocks_do_not_collide_with_each_other(self):
+        busy = [(at(13), at(14))]
+        requests = [BlockRequest("Asr", at(13, 5), timedelta(minutes=10)),
+                    BlockRequest("Dhuhr", at(13), timedelta(minutes=10))]
+
+        allocations = allocate(busy, requests)
+
+        self.assertEqual(allocations[1].start, at(14))
+        self.assertEqual(allocations[0].start, at(14, 10))
+
+    def test_multi_day_horizon(self):
+        busy = [(at(5, day=d), at(6, day=d)) for d in range(7)]
+        requests = [BlockRequest("Fajr", at(5, 30, day=d), timedelta(minutes=10)) for d in range(7)]
+
+        allocations = allocate(busy, requests)
+
+        self.assertEqual([a.start for a in allocations], [at(6, day=d) for d in range(7)])
+
+    def test_matches_sequential_first_fit(self):
+        rng = random.Random(7)
+        for _ in range(50):
+            busy = []
+            for _ in range(rng.randint(0, 30)):
+                start = at(0, rng.randint(0, 2880))
+                busy.append((start, start + timedelta(minutes=rng.randint(1, 120))))
+            requests = [BlockRequest(f"P{i}", at(0, rng.randint(0, 2880)), timedelta(minutes=10)) for i in range(rng.randint(1, 10))]
+
+            # Placing requests one by one in start order, each after the previous block and
+            # treating the earlier blocks as busy, gives the same slots.
+            placed, expected, previous_end = list(busy), {}, None
+            for request in sorted(requests, key=lambda r: r.start):
+                start = request.start if previous_end is None else max(request.start, previous_end)
+                expected[request.summary] = first_fit(merge_intervals(placed), start, 10)
+                previous_end = expected[request.summary] + request.duration
+                placed.append((expected[request.summary], previous_end))
+
+            for allocation in allocate(busy, requests):
+                self.assertEqual(allocation.start, expected[allocation.request.summary])
+
+if __name__ == '__main__':
+    unittest.main()
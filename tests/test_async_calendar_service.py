@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from zoneinfo import ZoneInfo
+
+from src.calendar_api.async_service import ThreadedCalendarService, gather_bounded
+from src.calendar_api.base import CalendarService
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+
+
+class SlowService:
+    """A CalendarService stand-in whose slot search blocks and records how many ran at once."""
+
+    def __init__(self, thread_safe):
+        self.thread_safe = thread_safe
+        self.active = 0
+        self.peak = 0
+        self._count_lock = threading.Lock()
+
+    def find_first_available_slot(self, start_time, duration_minutes):
+        with self._count_lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self._count_lock:
+            self.active -= 1
+        return start_time
+
+
+class TestThreadedCalendarService(unittest.IsolatedAsyncioTestCase):
+
+    async def test_forwards_calls(self):
+        service = Mock(spec=CalendarService, thread_safe=False)
+        service.add_event.return_value = True
+        service.get_events.return_value = [{'id': '1'}]
+        adapter = ThreadedCalendarService(service)
+        self.addCleanup(adapter.close)
+
+        self.assertTrue(await adapter.add_event(DAY, "Dhuhr", 10))
+        self.assertEqual(await adapter.get_events(DAY, DAY + timedelta(days=1)), [{'id': '1'}])
+        await adapter.delete_event('1')
+
+        service.add_event.assert_called_once_with(DAY, "Dhuhr", 10)
+        service.delete_event.assert_called_once_with('1')
+
+    async def test_call_runs_work_with_the_service_in_the_pool(self):
+        service = Mock(spec=CalendarService, thread_safe=False)
+        adapter = ThreadedCalendarService(service)
+        self.addCleanup(adapter.close)
+
+        service_seen, thread = await adapter.call(lambda s, day: (s, threading.current_thread()), DAY)
+
+        self.assertIs(service_seen, service)
+        self.assertIsNot(thread, threading.current_thread())
+
+    async def test_unsafe_backend_is_called_one_at_a_time(self):
+        service = SlowService(thread_safe=False)
+        adapter = ThreadedCalendarService(service)
+        self.addCleanup(adapter.close)
+
+        await gather_bounded([adapter.find_first_available_slot(DAY + timedelta(hours=h), 10) for h in range(6)])
+
+        self.assertEqual(service.peak, 1)
+
+    async def test_thread_safe_backend_overlaps_calls(self):
+        service = SlowService(thread_safe=True)
+        adapter = ThreadedCalendarService(service, max_workers=4)
+        self.addCleanup(adapter.close)
+
+        slots = await gather_bounded([adapter.find_first_available_slot(DAY + timedelta(hours=h), 10) for h in range(8)], limit=3)
+
+        self.assertEqual(slots, [DAY + timedelta(hours=h) for h in range(8)])
+        self.assertGreater(service.peak, 1)
+        self.assertLessEqual(service.peak, 3)
+
+    async def test_errors(self):
+        service = Mock(spec=CalendarService, thread_safe=True)
+        service.get_events.side_effect = RuntimeError("quota")
+        adapter = ThreadedCalendarService(service)
+        self.addCleanup(adapter.close)
+
+        results = await gather_bounded([adapter.get_events(DAY, DAY)], return_exceptions=True)
+        self.assertIsInstance(results[0], RuntimeError)
+        with self.assertRaises(RuntimeError):
+            await adapter.get_events(DAY, DAY)
+        with self.assertRaises(ValueError):
+            await gather_bounded([], limit=0)
+
+if __name__ == '__main__':
+    unittest.main()
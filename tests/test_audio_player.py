@@ -0,0 +1,95 @@
+import io
+import struct
+import unittest
+import wave
+from unittest.mock import Mock, patch
+
+from src.shared import audio_player
+
+def make_wav(path, frames=b"\x00\x00" * 800):
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(frames)
+    return path
+
+class FakeProcess:
+    def __init__(self, *args, **kwargs):
+        self.stdin = io.BytesIO()
+        self.stdin.close = Mock()
+        self.returncode = None
+        self.pid = 1234
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            self.returncode = 0
+        return self.returncode
+
+    def kill(self):
+        self.returncode = -9
+
+    terminate = kill
+
+class TestAudioPlayerArming(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile, pathlib
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.wav = str(make_wav(pathlib.Path(self.tmp.name) / "adhan.wav"))
+        self.addCleanup(audio_player._armed_players.clear)
+
+    def test_wav_header_length(self):
+        with open(self.wav, "rb") as f:
+            data = f.read()
+        header = audio_player._wav_header_length(data)
+        self.assertEqual(data[header - 8:header - 4], b"data")
+        self.assertEqual(struct.unpack("<I", data[header - 4:header])[0], len(data) - header)
+        self.assertIsNone(audio_player._wav_header_length(b"ID3 not a wav file"))
+
+    def test_arm_rejects_missing_file(self):
+        self.assertFalse(audio_player.arm("/does/not/exist.wav"))
+
+    @patch('src.shared.audio_player.sys.platform', 'linux')
+    @patch('src.shared.audio_player.subprocess.Popen', side_effect=FakeProcess)
+    def test_arm_opens_device_and_play_sends_only_samples(self, mock_popen):
+        with open(self.wav, "rb") as f:
+            data = f.read()
+        header = audio_player._wav_header_length(data)
+
+        self.assertTrue(audio_player.arm(self.wav))
+        process = audio_player._armed_players[self.wav].process
+        self.assertEqual(mock_popen.call_args[0][0], ['aplay', '-q', '-'])
+        self.assertEqual(process.stdin.getvalue(), data[:header])
+
+        on_finished = Mock()
+        finished = audio_player.play(self.wav, on_finished=on_finished)
+        finished.result(timeout=5)
+
+        self.assertEqual(mock_popen.call_count, 1)
+        self.assertEqual(process.stdin.getvalue(), data)
+        on_finished.assert_called_once()
+        self.assertNotIn(self.wav, audio_player._armed_players)
+
+    @patch('src.shared.audio_player.sys.platform', 'linux')
+    @patch('src.shared.audio_player.subprocess.Popen', side_effect=FakeProcess)
+    def test_arm_without_device_defers_header(self, mock_popen):
+        self.assertTrue(audio_player.arm(self.wav, open_device=False))
+        process = audio_player._armed_players[self.wav].process
+        self.assertEqual(process.stdin.getvalue(), b"")
+
+    @patch('src.shared.audio_player.sys.platform', 'linux')
+    @patch('src.shared.audio_player.subprocess.Popen', side_effect=FakeProcess)
+    def test_stop_playback_discards_armed_players(self, mock_popen):
+        audio_player.arm(self.wav)
+        process = audio_player._armed_players[self.wav].process
+        audio_player.stop_playback()
+        self.assertEqual(process.returncode, -9)
+        self.assertEqual(audio_player._armed_players, {})
+
+if __name__ == '__main__':
+    unittest.main()
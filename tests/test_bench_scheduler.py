@@ -0,0 +1,17 @@
+import unittest
+
+from benchmarks.bench_scheduler import bench_size
+from src.config.security import LOG
+
+
+class TestSchedulerBenchmark(unittest.TestCase):
+
+    def test_benchmarked_refresh_writes_blocks_without_errors(self):
+        with self.assertNoLogs(LOG, level="ERROR"):
+            result = bench_size(3)
+
+        self.assertEqual(result["calendar_calls"], 6)  # Three blocks per refresh, cold and warm.
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+from datetime import timedelta
+
+from benchmarks.bench_slot_finding import DAY, FakeCalendarHttp, _BenchCalendarService
+from benchmarks.fake_calendar import sample_event
+from src.calendar_api.tags import stamp
+
+
+class TestBenchSlotFinding(unittest.TestCase):
+
+    def test_fake_filters_own_events_by_tag(self):
+        meeting = sample_event(0, DAY + timedelta(hours=9))
+        block = stamp(sample_event(1, DAY + timedelta(hours=13)), "Dhuhr", DAY.date(), "digest")
+        service = _BenchCalendarService(FakeCalendarHttp([meeting, block]), "freebusy")
+        service.setup_credentials()
+
+        own = service.find_own_events(DAY, DAY + timedelta(days=1))
+
+        self.assertEqual([event["id"] for event in own], [block["id"]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from src.calendar_api.allocator import BlockRequest, allocate
+from src.calendar_api.bitmap import BusyBitmap, find_first_available_slots
+from src.calendar_api.snapshot import first_fit
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+
+
+def random_day(rng, count):
+    intervals = []
+    for _ in range(count):
+        start = DAY + timedelta(minutes=rng.randrange(0, 1440))
+        intervals.append((start, min(start + timedelta(minutes=rng.randrange(5, 120)), DAY + timedelta(days=1))))
+    return sorted(intervals)
+
+
+class TestBusyBitmap(unittest.TestCase):
+
+    def test_matches_first_fit_for_whole_minutes(self):
+        rng = random.Random(7)
+        days = [random_day(rng, rng.randrange(0, 40)) for _ in range(200)]
+        starts = [DAY + timedelta(minutes=rng.randrange(0, 1440)) for _ in days]
+
+        slots = find_first_available_slots(DAY, days, starts, 15)
+
+        self.assertEqual(slots, [first_fit(day, start, 15) for day, start in zip(days, starts)])
+
+    def test_matches_first_fit_across_midnight(self):
+        rng = random.Random(5)
+        days = []
+        for _ in range(500):
+            intervals = []
+            for _ in range(rng.randrange(0, 12)):
+                start = DAY + timedelta(minutes=rng.randrange(-120, 1560))
+                intervals.append((start, start + timedelta(minutes=rng.randrange(5, 180))))
+            days.append(sorted(intervals))
+        starts = [DAY + timedelta(minutes=rng.randrange(1200, 1500)) for _ in days]
+
+        slots = find_first_available_slots(DAY, days, starts, 20)
+
+        self.assertEqual(slots, [first_fit(day, start, 20) for day, start in zip(days, starts)])
+
+    def test_meeting_across_midnight_is_not_double_booked(self):
+        meeting = [(DAY + timedelta(hours=23, minutes=55), DAY + timedelta(days=1, minutes=30))]
+        prayers = [DAY + timedelta(hours=23, minutes=50), DAY + timedelta(days=1, minutes=10)]
+
+        [slot] = find_first_available_slots(DAY, [meeting], prayers[0], 10)
+        [placed] = BusyBitmap.from_intervals(DAY, [meeting]).allocate(prayers, 10)
+
+        self.assertEqual(slot, DAY + timedelta(days=1, minutes=30))
+        requests = [BlockRequest("Prayer", start, timedelta(minutes=10)) for start in prayers]
+        self.assertEqual(placed, [a.start for a in allocate(meeting, requests)])
+
+    def test_minute_resolution_is_conservative(self):
+        busy = [(DAY + timedelta(hours=12), DAY + timedelta(hours=12, minutes=9, seconds=30))]
+
+        [slot] = find_first_available_slots(DAY, [busy], DAY + timedelta(hours=12, seconds=10), 10)
+
+        self.assertEqual(slot, DAY + timedelta(hours=12, minutes=10))
+
+    def test_slot_may_run_past_the_day(self):
+        busy = [(DAY, DAY + timedelta(hours=23, minutes=55))]
+        late = DAY + timedelta(days=1, hours=2)
+
+        slots = find_first_available_slots(DAY, [busy, busy], [DAY + timedelta(hours=9), late], 10)
+
+        self.assertEqual(slots, [DAY + timedelta(hours=23, minutes=55), late])
+
+    def test_allocate_keeps_blocks_apart_like_allocate(self):
+        rng = random.Random(3)
+        days = [random_day(rng, 20) for _ in range(50)]
+        prayers = [DAY + timedelta(hours=h, minutes=m) for h, m in ((4, 10), (13, 20), (13, 25), (17, 45), (21, 30))]
+
+        placed = BusyBitmap.from_intervals(DAY, days).allocate(prayers, 10)
+
+        requests = [BlockRequest("Prayer", start, timedelta(minutes=10)) for start in prayers]
+        self.assertEqual(placed, [[a.start for a in allocate(day, requests)] for day in days])
+
+    def test_marking_keeps_later_searches_right(self):
+        rng = random.Random(11)
+        days = [random_day(rng, 10) for _ in range(30)]
+        bitmap = BusyBitmap.from_intervals(DAY, days)
+        bitmap.first_free(DAY, 10)
+        blocks = [DAY + timedelta(minutes=rng.randrange(0, 1440)) for _ in days]
+
+        bitmap.mark(range(len(days)), blocks, 25)
+
+        marked = [day + [(block, block + timedelta(minutes=25))] for day, block in zip(days, blocks)]
+        for start in (DAY, DAY + timedelta(hours=13)):
+            self.assertEqual(bitmap.first_free(start, 20), BusyBitmap.from_intervals(DAY, marked).first_free(start, 20))
+
+    def test_shape_errors(self):
+        bitmap = BusyBitmap.from_intervals(DAY, [[], []])
+        with self.assertRaises(ValueError):
+            bitmap.first_free([DAY], 10)
+        self.assertEqual(BusyBitmap.from_intervals(DAY, []).first_free([], 10), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import unittest
+from collections import Counter
+from unittest.mock import Mock
+
+from googleapiclient.errors import HttpError
+
+from src.calendar_api.batch import CalendarBatch, is_retriable
+
+
+def http_error(status, content=b'{}'):
+    return HttpError(Mock(status=status, reason="error"), content)
+
+
+class FakeBatchService:
+    """Answers batch requests through the callback, failing items as listed in `failures`."""
+
+    def __init__(self, failures=None, round_trip_errors=None):
+        # request key -> list of errors for consecutive attempts, None meaning success
+        self.failures = failures or {}
+        self.round_trip_errors = list(round_trip_errors or [])
+        self.round_trips = []
+        self.events = Mock()
+
+    def new_batch_http_request(self, callback):
+        service = self
+        added = []
+
+        class Batch:
+            def add(self, request, request_id):
+                added.append(request_id)
+
+            def execute(self):
+                service.round_trips.append(list(added))
+                if service.round_trip_errors:
+                    raise service.round_trip_errors.pop(0)
+                for key in added:
+                    errors = service.failures.get(key, [])
+                    error = errors.pop(0) if errors else None
+                    callback(key, None if error else {"id": key}, error)
+        return Batch()
+
+
+class TestCalendarBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+
+    def make_batch(self, service, **kwargs):
+        return CalendarBatch(lambda: service, sleep=self.sleeps.append, **kwargs)
+
+    def test_splits_into_round_trips_of_fifty(self):
+        service = FakeBatchService()
+        api_calls = Counter()
+        batch = self.make_batch(service, api_calls=api_calls)
+        keys = [batch.insert({"summary": f"P{i}"}) for i in range(120)]
+
+        results = batch.execute()
+
+        self.assertEqual([len(trip) for trip in service.round_trips], [50, 50, 20])
+        self.assertTrue(all(results[key].ok for key in keys))
+        self.assertEqual(results[keys[0]].response, {"id": keys[0]})
+        self.assertEqual(api_calls, {"events.insert": 120, "batch": 3})
+        self.assertEqual(len(batch), 0)
+
+    def test_retries_only_retriable_failures(self):
+        service = FakeBatchService(failures={
+            "flaky": [http_error(503)],
+            "rate-limited": [http_error(403, b'{"error": {"errors": [{"reason": "rateLimitExceeded"}], "message": "x"}}')],
+            "bad": [http_error(400)],
+            "gone": [http_error(410)],
+        })
+        batch = self.make_batch(service)
+        batch.insert({"summary": "Fajr"}, key="flaky")
+        batch.update("event-1", {"summary": "Dhuhr"}, key="rate-limited")
+        batch.insert({"summary": "Asr"}, key="bad")
+        batch.delete("event-2", key="gone")
+        batch.insert({"summary": "Isha"}, key="fine")
+
+        results = batch.execute()
+
+        self.assertEqual(service.round_trips[1], ["flaky", "rate-limited"])
+        self.assertEqual(len(service.round_trips), 2)
+        self.assertEqual(len(self.sleeps), 1)
+        self.assertTrue(results["flaky"].ok)
+        self.assertEqual(results["flaky"].attempts, 2)
+        self.assertTrue(results["rate-limited"].ok)
+        self.assertTrue(results["gone"].ok)
+        self.assertFalse(results["bad"].ok)
+        self.assertEqual(results["bad"].error.status_code, 400)
+        self.assertEqual(results["bad"].attempts, 1)
+
+    def test_resent_insert_whose_response_was_lost_is_not_duplicated(self):
+        service = FakeBatchService(failures={"lost": [http_error(503), http_error(409)]})
+        batch = self.make_batch(service)
+        batch.insert({"summary": "Fajr"}, key="lost")
+
+        results = batch.execute()
+
+        sent_ids = {kwargs["body"]["id"] for _, kwargs in service.events().insert.call_args_list}
+        self.assertEqual(len(service.events().insert.call_args_list), 2)
+        self.assertEqual(sent_ids, {results["lost"].response["id"]})  # Both attempts carry the same id.
+        self.assertTrue(results["lost"].ok)
+        self.assertEqual(results["lost"].response["summary"], "Fajr")
+
+    def test_conflict_on_a_first_insert_is_an_error(self):
+        service = FakeBatchService(failures={"taken": [http_error(409)]})
+        batch = self.make_batch(service)
+        batch.insert({"id": "chosen", "summary": "Fajr"}, key="taken")
+
+        self.assertEqual(batch.execute()["taken"].error.status_code, 409)
+
+    def test_gives_up_after_max_attempts(self):
+        service = FakeBatchService(round_trip_errors=[ConnectionError("reset")] * 3)
+        batch = self.make_batch(service, max_attempts=3)
+        key = batch.insert({"summary": "Fajr"})
+
+        results = batch.execute()
+
+        self.assertEqual(len(service.round_trips), 3)
+        self.assertIsInstance(results[key].error, ConnectionError)
+        self.assertEqual(results[key].attempts, 3)
+
+    def test_duplicate_keys_are_rejected(self):
+        batch = self.make_batch(FakeBatchService())
+        batch.insert({}, key="a")
+        with self.assertRaises(ValueError):
+            batch.delete("event", key="a")
+
+    def test_is_retriable(self):
+        self.assertTrue(is_retriable(http_error(429)))
+        self.assertTrue(is_retriable(http_error(500)))
+        self.assertFalse(is_retriable(http_error(403)))
+        self.assertFalse(is_retriable(http_error(404)))
+        self.assertTrue(is_retriable(TimeoutError()))
+        self.assertFalse(is_retriable(ValueError()))
+
+if __name__ == '__main__':
+    unittest.main()
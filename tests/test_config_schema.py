@@ -0,0 +1,37 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from pydantic import ValidationError
+
+from src.calendar_api.base import SLOT_SOURCES
+from src.config.schema import Config
+from src.config.security import load_config
+
+
+class TestConfigSchema(unittest.TestCase):
+
+    def test_every_slot_source_is_accepted(self):
+        for source in SLOT_SOURCES:
+            self.assertEqual(Config(calendar_slot_source=source).calendar_slot_source, source)
+
+    def test_invalid_calendar_choices_are_rejected(self):
+        with self.assertRaises(ValidationError):
+            Config(calendar_slot_source="guess")
+        with self.assertRaises(ValidationError):
+            Config(calendar_backend="outlook")
+
+    def test_invalid_config_file_falls_back_to_defaults(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "config.json")
+            with open(path, "w") as f:
+                json.dump({"city": "Berlin", "calendar_slot_source": "guess"}, f)
+            with patch("src.config.security.CONFIG_FILE_PATH", path):
+                config = load_config()
+
+        self.assertEqual(config, Config())
+
+if __name__ == '__main__':
+    unittest.main()
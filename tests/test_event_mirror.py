@@ -0,0 +1,128 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError
+
+from src.calendar_api.mirror import WINDOW, EventMirror
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+
+
+def event(event_id, start, end, **extra):
+    return dict(id=event_id, start={'dateTime': start}, end={'dateTime': end}, **extra)
+
+
+class TestEventMirror(unittest.TestCase):
+
+    def setUp(self):
+        self.service = Mock()
+        self.list_execute = self.service.events.return_value.list.return_value.execute
+        self.mirror = EventMirror(lambda: self.service)
+
+    def list_kwargs(self):
+        return [kwargs for _, kwargs in self.service.events.return_value.list.call_args_list]
+
+    def test_full_sync_then_deltas(self):
+        self.list_execute.side_effect = [
+            {'items': [event('a', '2025-07-22T09:00:00Z', '2025-07-22T10:00:00Z'),
+                       event('b', '2025-07-22T11:00:00Z', '2025-07-22T12:00:00Z')],
+             'nextSyncToken': 'token-1'},
+            {'items': [{'id': 'a', 'status': 'cancelled'},
+                       event('b', '2025-07-22T13:00:00Z', '2025-07-22T14:00:00Z'),
+                       event('c', '2025-07-22T08:00:00Z', '2025-07-22T08:30:00Z')],
+             'nextSyncToken': 'token-2'},
+        ]
+
+        self.mirror.sync(DAY)
+        self.mirror.sync(DAY)
+
+        first, second = self.list_kwargs()
+        self.assertEqual(first['timeMin'], DAY.isoformat())
+        self.assertEqual(second['syncToken'], 'token-1')
+        self.assertNotIn('timeMin', second)
+        self.assertEqual(self.mirror.sync_token, 'token-2')
+        self.assertEqual((self.mirror.full_syncs, self.mirror.delta_syncs), (1, 1))
+        events = self.mirror.events_between(DAY, datetime(2025, 7, 23, tzinfo=UTC))
+        self.assertEqual([e['id'] for e in events], ['c', 'b'])
+
+    def test_expired_token_triggers_full_resync(self):
+        gone = HttpError(Mock(status=410, reason="Gone"), b'{}')
+        self.list_execute.side_effect = [
+            {'items': [event('a', '2025-07-22T09:00:00Z', '2025-07-22T10:00:00Z')], 'nextSyncToken': 'token-1'},
+            gone,
+            {'items': [event('b', '2025-07-22T11:00:00Z', '2025-07-22T12:00:00Z')], 'nextSyncToken': 'token-2'},
+        ]
+
+        self.mirror.sync(DAY)
+        self.mirror.sync(DAY)
+
+        self.assertEqual(self.mirror.full_syncs, 2)
+        self.assertEqual(self.mirror.sync_token, 'token-2')
+        self.assertEqual([e['id'] for e in self.mirror.events_between(DAY, datetime(2025, 7, 23, tzinfo=UTC))], ['b'])
+
+    def test_follows_pages(self):
+        self.list_execute.side_effect = [
+            {'items': [event('a', '2025-07-22T09:00:00Z', '2025-07-22T10:00:00Z')], 'nextPageToken': 'page-2'},
+            {'items': [event('b', '2025-07-22T11:00:00Z', '2025-07-22T12:00:00Z')], 'nextSyncToken': 'token-1'},
+        ]
+
+        self.mirror.sync(DAY)
+
+        self.assertEqual(self.list_kwargs()[1]['pageToken'], 'page-2')
+        self.assertEqual(len(self.mirror), 2)
+        self.assertEqual(self.mirror.sync_token, 'token-1')
+
+    def test_window_moves_forward_and_prunes(self):
+        self.list_execute.side_effect = [
+            {'items': [event('old', '2025-07-22T09:00:00Z', '2025-07-22T10:00:00Z'),
+                       event('new', '2025-07-23T09:00:00Z', '2025-07-23T10:00:00Z')],
+             'nextSyncToken': 'token-1'},
+            {'items': [], 'nextSyncToken': 'token-2'},
+            {'items': [], 'nextSyncToken': 'token-3'},
+        ]
+
+        self.mirror.sync(DAY)
+        self.mirror.sync(datetime(2025, 7, 23, tzinfo=UTC))
+        self.assertEqual(len(self.mirror), 1)
+        self.assertEqual(self.mirror.delta_syncs, 1)
+
+        # An earlier window than the mirror covers needs a full sync
+        self.mirror.sync(DAY)
+        self.assertEqual(self.mirror.full_syncs, 2)
+
+    def test_full_sync_is_bounded_and_drops_deltas_past_the_window(self):
+        self.list_execute.side_effect = [
+            {'items': [event('a', '2025-07-22T09:00:00Z', '2025-07-22T10:00:00Z')], 'nextSyncToken': 'token-1'},
+            {'items': [event('far', '2025-12-01T09:00:00Z', '2025-12-01T10:00:00Z'),
+                       event('a', '2026-01-05T09:00:00Z', '2026-01-05T10:00:00Z')],
+             'nextSyncToken': 'token-2'},
+        ]
+
+        self.mirror.sync(DAY)
+        self.mirror.sync(DAY)
+
+        first, second = self.list_kwargs()
+        self.assertEqual(first['timeMax'], (DAY + WINDOW).isoformat())
+        self.assertNotIn('timeMax', second)
+        # A new event past the window is not kept, and one moved past it is dropped
+        self.assertEqual(len(self.mirror), 0)
+
+    def test_day_past_the_window_triggers_full_sync(self):
+        self.list_execute.side_effect = [
+            {'items': [], 'nextSyncToken': 'token-1'},
+            {'items': [], 'nextSyncToken': 'token-2'},
+        ]
+        later = DAY + WINDOW - timedelta(hours=12)
+
+        self.mirror.sync(DAY)
+        self.assertFalse(self.mirror.covers(later, later + timedelta(days=1)))
+        self.mirror.sync(later)
+
+        self.assertEqual((self.mirror.full_syncs, self.mirror.delta_syncs), (2, 0))
+        self.assertEqual(self.list_kwargs()[1]['timeMin'], later.isoformat())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from benchmarks.fake_calendar import FakeCalendarServer, LocalCalendarService
+from src.calendar_api.rate_limit import RateLimiter
+from src.calendar_api.allocator import BlockRequest
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+
+
+class TestGoogleCalendarServiceOverHttp(unittest.TestCase):
+    """GoogleCalendarService against the local fake Calendar API, requests and batches sent over HTTP."""
+
+    def setUp(self):
+        self.server = FakeCalendarServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+        self.server.populate(DAY, events_per_day=48)  # A 25 minute meeting every half hour.
+        self.service = LocalCalendarService(self.server, limiter=RateLimiter(base_delay=timedelta(milliseconds=1)))
+
+    def test_slot_search_and_sync_deltas(self):
+        self.assertEqual(self.service.find_first_available_slot(DAY + timedelta(hours=9), 5), DAY + timedelta(hours=9, minutes=25))
+        # Every gap is too short for 10 minutes until after the last meeting of the day.
+        self.assertEqual(self.service.find_first_available_slot(DAY + timedelta(hours=9), 10), DAY + timedelta(hours=23, minutes=55))
+
+        self.service.begin_refresh()
+        self.service.find_first_available_slot(DAY + timedelta(hours=9), 10)
+        self.service.end_refresh()
+        self.server.calendar().events.pop("event000018")  # The 9:00 meeting.
+        self.server.calendar().put({"id": "event000018", "status": "cancelled"})
+        self.service.begin_refresh()
+        self.assertEqual(self.service.find_first_available_slot(DAY + timedelta(hours=9), 10), DAY + timedelta(hours=9))
+        self.service.end_refresh()
+        self.assertEqual(self.service.mirror.delta_syncs, 1)
+
+    def test_batched_writes_and_reconcile(self):
+        requests = [BlockRequest(name, DAY + timedelta(hours=hour, minutes=25), timedelta(minutes=5))
+                    for name, hour in (("Dhuhr", 12), ("Asr", 16), ("Isha", 21))]
+        self.service.begin_refresh()
+        self.assertEqual(self.service.add_events(requests), [True, True, True])
+        self.service.end_refresh()
+
+        self.assertEqual(self.server.stats["batch"], 1)
+        self.assertEqual(len(self.service.find_own_events(DAY, DAY + timedelta(days=1))), 3)
+        self.assertEqual(self.service.reconcile(requests[:1], DAY, DAY + timedelta(days=1)), 2)
+        self.assertEqual([e['extendedProperties']['private']['prayer'] for e in self.service.find_own_events(DAY, DAY + timedelta(days=1))],
+                         ["Dhuhr"])
+
+    def test_quota_errors_are_retried(self):
+        self.server.quota_error_rate = 0.5
+
+        for name, hour in (("Dhuhr", 12), ("Asr", 16)):
+            self.assertTrue(self.service.add_event(DAY + timedelta(hours=hour, minutes=25), name, 5))
+
+        self.assertGreater(self.server.stats["quota_errors"], 0)
+        self.assertEqual(self.service.limiter.metrics["retried"], self.server.stats["quota_errors"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from zoneinfo import ZoneInfo
+
+from src.calendar_api.allocator import BlockRequest
+from src.calendar_api.base import CalendarService
+from src.calendar_api.fleet import FleetSync, FleetUser, fair_limiter
+from src.calendar_api.plan_store import PlanStore
+from src.calendar_api.rate_limit import PROJECT_RATE, USER_RATE
+from src.shared.clock import VirtualClock
+
+UTC = ZoneInfo("UTC")
+NOW = datetime(2025, 7, 22, 8, 0, tzinfo=UTC)
+PLAN = [BlockRequest("Fajr", NOW.replace(hour=4), timedelta(minutes=10)),
+        BlockRequest("Dhuhr", NOW.replace(hour=13), timedelta(minutes=10)),
+        BlockRequest("Asr", NOW.replace(hour=17), timedelta(minutes=10))]
+
+
+class TestFleetSync(unittest.TestCase):
+
+    def setUp(self):
+        self.services = {}
+
+    def service_for(self, user, limiter):
+        service = self.services.get(user.user)
+        if service is None:
+            service = self.services[user.user] = Mock(spec=CalendarService, last_failed_writes=[], calendar_key=f"fake:{user.user}")
+        return service
+
+    def fleet(self, count, **kwargs):
+        users = [FleetUser(f"user{i}", creds=None) for i in range(count)]
+        return FleetSync(users, lambda user: PLAN, service_factory=self.service_for, clock=VirtualClock(NOW), **kwargs)
+
+    def test_a_failing_user_does_not_stop_the_others(self):
+        fleet = self.fleet(3, workers=2)
+        self.service_for(fleet.users[1], fleet.limiter).add_events.side_effect = OSError("invalid_grant")
+
+        report = fleet.run()
+
+        self.assertEqual([stats.user for stats in report.failed], ["user1"])
+        self.assertEqual([stats.ok for stats in report.stats], [True, False, True])
+        self.assertEqual(report.stats[0].blocks, 2)  # Fajr is over, only the later prayers are added.
+        self.services["user0"].add_events.assert_called_once_with(PLAN[1:])
+        self.services["user2"].reconcile.assert_called_once()
+
+    def test_total_time_scales_with_workers_not_users(self):
+        fleet = self.fleet(8, workers=8)
+        for user in fleet.users:
+            self.service_for(user, fleet.limiter).add_events.side_effect = lambda requests: time.sleep(0.2)
+
+        report = fleet.run()
+
+        self.assertTrue(all(stats.ok for stats in report.stats))
+        self.assertGreaterEqual(min(stats.duration_s for stats in report.stats), 0.2)
+        self.assertLess(report.elapsed_s, 0.8)
+
+    def test_run_stops_waiting_for_a_stuck_user(self):
+        fleet = self.fleet(3, workers=3)
+        release = threading.Event()
+        self.addCleanup(release.set)
+        self.service_for(fleet.users[0], fleet.limiter).add_events.side_effect = lambda requests: release.wait(5)
+
+        report = fleet.run(timeout=0.5)
+
+        self.assertEqual([stats.ok for stats in report.stats], [False, True, True])
+        self.assertIn("not done", report.stats[0].error)
+
+    def test_stored_plan_skips_calendar_writes(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PlanStore(os.path.join(tmp, 'plans.json'))
+            self.fleet(2, plan_store=store).run()
+            for service in self.services.values():
+                service.add_events.reset_mock()
+
+            report = self.fleet(2, plan_store=store).run()
+
+        self.assertTrue(all(stats.ok and stats.skipped for stats in report.stats))
+        for service in self.services.values():
+            service.add_events.assert_not_called()
+
+    def test_fair_limiter_shares_the_project_quota(self):
+        self.assertEqual(fair_limiter(4).user_rate, USER_RATE)
+        self.assertAlmostEqual(fair_limiter(1000).user_rate, PROJECT_RATE / 1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
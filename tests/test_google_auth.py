@@ -1,58 +1,133 @@
+import json
+import os
+import tempfile
+import threading
 import unittest
-from unittest.mock import patch, mock_open, Mock
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch, Mock
+
+from src.auth import google_auth
+from src.auth.google_auth import CredentialManager, REFRESH_MARGIN, SCOPES, get_google_credentials
+from src.shared.clock import VirtualClock
+
+NOW = datetime(2025, 7, 22, 8, 0, tzinfo=timezone.utc)
+
+
+def token_creds(valid=True, expiry=NOW + timedelta(hours=1)):
+    creds = Mock(valid=valid, expired=not valid, refresh_token="refresh-token",
+                 expiry=expiry.replace(tzinfo=None))
+    creds.to_json.side_effect = lambda: json.dumps({"token": "token", "expiry": creds.expiry.isoformat()})
+    return creds
 
-from src.auth.google_auth import get_google_credentials, SCOPES, TOKEN_FILE, USER_CONFIG_DIR
 
 class TestGoogleAuth(unittest.TestCase):
 
-    @patch('os.makedirs')
-    @patch('os.path.exists', return_value=True)
-    @patch('builtins.open', new_callable=mock_open, read_data='{"token": "mock_token"}')
-    @patch('google.oauth2.credentials.Credentials.from_authorized_user_info')
-    def test_get_google_credentials_existing_valid_token(self, mock_from_authorized_user_info, mock_open_file, mock_exists, mock_makedirs):
-        mock_creds = Mock()
-        mock_creds.valid = True
-        mock_from_authorized_user_info.return_value = mock_creds
-
-        creds = get_google_credentials()
-
-        mock_makedirs.assert_called_once_with(USER_CONFIG_DIR, exist_ok=True)
-        mock_exists.assert_called_once_with(TOKEN_FILE)
-        mock_open_file.assert_called_once_with(TOKEN_FILE, 'r')
-        mock_from_authorized_user_info.assert_called_once_with({"token": "mock_token"}, SCOPES)
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.token_file = os.path.join(self.tmp.name, 'token.json')
+        with open(self.token_file, 'w') as f:
+            json.dump({"token": "mock_token"}, f)
+        self.clock = VirtualClock(NOW)
+        self.manager = CredentialManager(self.token_file, clock=self.clock)
+        patcher = patch('google.oauth2.credentials.Credentials.from_authorized_user_info')
+        self.from_authorized_user_info = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_get_google_credentials_existing_valid_token(self):
+        mock_creds = token_creds()
+        self.from_authorized_user_info.return_value = mock_creds
+
+        with patch.object(google_auth, '_manager', self.manager), patch.object(self.manager, 'start') as start:
+            creds = get_google_credentials()
+            self.assertIs(get_google_credentials(), creds)
+
+        self.from_authorized_user_info.assert_called_once_with({"token": "mock_token"}, SCOPES)
         self.assertEqual(creds, mock_creds)
+        start.assert_called()
 
-    @patch('os.makedirs')
-    @patch('os.path.exists', return_value=True) # TOKEN_FILE exists
-    @patch('builtins.open', new_callable=mock_open, read_data='{"token": "expired_token"}')
-    @patch('google.oauth2.credentials.Credentials.from_authorized_user_info')
-    @patch('src.auth.google_auth.Request') # Patch the class directly
-    def test_get_google_credentials_expired_token_refreshes(self, mock_request_class, mock_from_authorized_user_info, mock_open_file, mock_exists, mock_makedirs):
-        mock_creds = Mock()
-        mock_creds.valid = False
-        mock_creds.expired = True
-        mock_creds.refresh_token = True
+    @patch('src.auth.google_auth.Request')
+    def test_get_google_credentials_expired_token_refreshes(self, mock_request_class):
+        mock_creds = token_creds(valid=False, expiry=NOW - timedelta(minutes=1))
 
         def refresh_side_effect(request):
             mock_creds.valid = True
+            mock_creds.expiry = (NOW + timedelta(hours=1)).replace(tzinfo=None)
 
         mock_creds.refresh.side_effect = refresh_side_effect
-        mock_from_authorized_user_info.return_value = mock_creds
-
-        # Set the return value of the mocked Request class
-        mock_request_instance = Mock()
-        mock_request_class.return_value = mock_request_instance
+        self.from_authorized_user_info.return_value = mock_creds
 
-        creds = get_google_credentials()
+        creds = self.manager.get()
 
-        mock_makedirs.assert_called_once_with(USER_CONFIG_DIR, exist_ok=True)
-        mock_exists.assert_called_once_with(TOKEN_FILE)
-        mock_open_file.assert_any_call(TOKEN_FILE, 'r')
-        mock_from_authorized_user_info.assert_called_once_with({'token': 'expired_token'}, SCOPES)
-        mock_creds.refresh.assert_called_once_with(mock_request_instance)
-        mock_open_file.assert_called_with(TOKEN_FILE, 'w')
-        self.assertEqual(creds, mock_creds)
+        mock_creds.refresh.assert_called_once_with(mock_request_class.return_value)
         self.assertTrue(creds.valid)
+        with open(self.token_file) as f:
+            self.assertEqual(json.load(f)["expiry"], "2025-07-22T09:00:00")
+        self.assertEqual(os.listdir(self.tmp.name), ['token.json'])  # No temporary file left behind.
+
+    @patch('src.auth.google_auth._run_auth_flow')
+    def test_cached_never_refreshes_or_signs_in(self, auth_flow):
+        expired = token_creds(valid=False, expiry=NOW - timedelta(minutes=1))
+        self.from_authorized_user_info.return_value = expired
+
+        self.assertIs(self.manager.cached(), expired)
+        self.assertIs(self.manager.cached(), expired)
+
+        self.from_authorized_user_info.assert_called_once()
+        expired.refresh.assert_not_called()
+        auth_flow.assert_not_called()
+        self.assertIsNone(CredentialManager(os.path.join(self.tmp.name, 'missing.json')).cached())
+
+    @patch('src.auth.google_auth.Request')
+    def test_refreshes_ahead_of_expiry(self, _):
+        creds = token_creds(expiry=NOW + timedelta(hours=1))
+        creds.refresh.side_effect = lambda request: setattr(creds, 'expiry', creds.expiry + timedelta(hours=1))
+        self.from_authorized_user_info.return_value = creds
+
+        self.assertEqual(self.manager.refresh_if_due(), (timedelta(hours=1) - REFRESH_MARGIN).total_seconds())
+        creds.refresh.assert_not_called()
+
+        self.clock.advance(timedelta(hours=1) - REFRESH_MARGIN)
+        self.assertEqual(self.manager.refresh_if_due(), timedelta(hours=1).total_seconds())
+        creds.refresh.assert_called_once()
+        with open(self.token_file) as f:
+            self.assertEqual(json.load(f)["expiry"], "2025-07-22T10:00:00")
+
+    @patch('src.auth.google_auth.Request')
+    def test_failed_refresh_backs_off(self, _):
+        creds = token_creds(expiry=NOW + timedelta(minutes=1))
+        creds.refresh.side_effect = OSError("network is unreachable")
+        self.from_authorized_user_info.return_value = creds
+
+        first, second = self.manager.refresh_if_due(), self.manager.refresh_if_due()
+
+        self.assertTrue(15 <= first <= 30)
+        self.assertTrue(30 <= second <= 60)
+        with open(self.token_file) as f:
+            self.assertEqual(json.load(f), {"token": "mock_token"})
+
+    @patch('src.auth.google_auth.Request')
+    def test_refresh_does_not_hold_the_lock_on_the_network(self, _):
+        creds = token_creds(expiry=NOW + timedelta(minutes=1))
+        self.from_authorized_user_info.return_value = creds
+        readers = []
+
+        def refresh(request):
+            # Another thread reads the credentials while the refresh request is in flight.
+            reader = threading.Thread(target=self.manager.seconds_until_refresh)
+            reader.start()
+            reader.join(2)
+            readers.append(reader.is_alive())
+            creds.expiry += timedelta(hours=1)
+
+        creds.refresh.side_effect = refresh
+
+        self.manager.refresh()
+
+        self.assertEqual(readers, [False])
+        with open(self.token_file) as f:
+            self.assertEqual(json.load(f)["expiry"], "2025-07-22T09:01:00")
+
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -1,8 +1,14 @@
 import unittest
 from unittest.mock import Mock, patch
-from datetime import datetime
+
+import httplib2
+from googleapiclient.errors import HttpError
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
+from src.calendar_api.allocator import BlockRequest
 from src.calendar_api.google_calendar import GoogleCalendarService
+from src.calendar_api.rate_limit import RateLimiter
+from src.calendar_api.tags import schedule_hash, stamp
 
 class TestGoogleCalendarService(unittest.TestCase):
 
@@ -17,10 +23,14 @@ class TestGoogleCalendarService(unittest.TestCase):
         self.mock_service.events.return_value.insert.return_value = self.mock_events_insert
         self.mock_service.events.return_value.delete.return_value = self.mock_events_delete
 
-        # Patch the build function to return our mock service
-        patcher = patch('src.calendar_api.google_calendar.build', return_value=self.mock_service)
+        # Patch the service factory to return our mock service
+        patcher = patch('src.calendar_api.google_calendar.get_service', return_value=self.mock_service)
         self.mock_build = patcher.start()
         self.addCleanup(patcher.stop)
+        # A fresh quota per test, so earlier tests do not throttle later ones
+        patcher = patch('src.calendar_api.google_calendar.shared_limiter', side_effect=RateLimiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
         self.service = GoogleCalendarService(self.mock_creds)
 
@@ -108,11 +118,12 @@ class TestGoogleCalendarService(unittest.TestCase):
         self.mock_service.events().insert.assert_called_once()
 
     def test_add_event_duplicate(self):
-        # Mock an existing event with the same summary
+        # Mock an existing, untagged block created by an earlier version with the same summary
         self.mock_events_list.execute.return_value = {
             'items': [
                 {
                     'summary': 'Existing Event',
+                    'visibility': 'private',
                     'start': {'dateTime': '2025-07-22T11:00:00+00:00'},
                     'end': {'dateTime': '2025-07-22T12:00:00+00:00'}
                 }
@@ -127,6 +138,82 @@ class TestGoogleCalendarService(unittest.TestCase):
         self.assertFalse(result)
         self.mock_service.events().insert.assert_not_called() # Should not try to insert
 
+    def test_add_event_duplicate_by_tag(self):
+        # The user renamed the block, its tag still identifies it
+        self.mock_events_list.execute.return_value = {
+            'items': [
+                {
+                    'summary': 'Prayer break',
+                    'start': {'dateTime': '2025-07-22T11:00:00+00:00'},
+                    'end': {'dateTime': '2025-07-22T11:10:00+00:00'},
+                    'extendedProperties': {'private': {'app': 'prayer-player', 'prayer': 'Dhuhr', 'prayerDate': '2025-07-22'}}
+                }
+            ]
+        }
+
+        result = self.service.add_event(datetime(2025, 7, 22, 11, 0, 0, tzinfo=ZoneInfo("UTC")), "Dhuhr", 10)
+
+        self.assertFalse(result)
+        self.mock_service.events().insert.assert_not_called()
+
+    def test_user_event_with_prayer_title_is_not_a_duplicate(self):
+        self.mock_events_list.execute.return_value = {
+            'items': [
+                {
+                    'summary': 'Asr',
+                    'start': {'dateTime': '2025-07-22T08:00:00+00:00'},
+                    'end': {'dateTime': '2025-07-22T09:00:00+00:00'}
+                }
+            ]
+        }
+        self.mock_events_insert.execute.return_value = {'id': 'new_event_id'}
+
+        result = self.service.add_event(datetime(2025, 7, 22, 14, 0, 0, tzinfo=ZoneInfo("UTC")), "Asr", 10)
+
+        self.assertTrue(result)
+        body = self.mock_service.events().insert.call_args[1]['body']
+        private = body['extendedProperties']['private']
+        self.assertEqual((private['app'], private['prayer'], private['prayerDate']), ('prayer-player', 'Asr', '2025-07-22'))
+        self.assertEqual(len(private['scheduleHash']), 16)
+
+    def test_find_and_delete_own_events_use_exact_filter(self):
+        self.mock_events_list.execute.return_value = {'items': [{'id': 'own-1'}, {'id': 'own-2'}]}
+        batch = self.mock_service.new_batch_http_request.return_value
+        batch.execute.side_effect = lambda: [
+            self.mock_service.new_batch_http_request.call_args[1]['callback'](kwargs['request_id'], None, None)
+            for _, kwargs in batch.add.call_args_list
+        ]
+
+        deleted = self.service.delete_own_events(datetime(2025, 7, 22, tzinfo=ZoneInfo("UTC")), datetime(2025, 7, 23, tzinfo=ZoneInfo("UTC")),
+                                                 prayer_date='2025-07-22')
+
+        self.assertEqual(deleted, 2)
+        list_kwargs = self.mock_service.events().list.call_args[1]
+        self.assertEqual(list_kwargs['privateExtendedProperty'], ['app=prayer-player', 'prayerDate=2025-07-22'])
+        self.assertEqual([call[1]['eventId'] for call in self.mock_service.events().delete.call_args_list], ['own-1', 'own-2'])
+
+    def test_reconcile_deletes_superseded_blocks_in_one_batch(self):
+        utc = ZoneInfo("UTC")
+        dhuhr = BlockRequest("Dhuhr", datetime(2025, 7, 22, 11, 5, tzinfo=utc), timedelta(minutes=10))
+        kept = stamp({'id': 'kept'}, "Dhuhr", dhuhr.start.date(), schedule_hash("Dhuhr", dhuhr.start, dhuhr.duration))
+        moved = stamp({'id': 'moved'}, "Dhuhr", dhuhr.start.date(), "old-hash")
+        dropped = stamp({'id': 'dropped'}, "Isha", dhuhr.start.date(), "hash")
+        twin = dict(kept, id='twin')
+        self.mock_events_list.execute.return_value = {'items': [kept, twin, moved, dropped, {'id': 'untagged'}]}
+        batch = self.mock_service.new_batch_http_request.return_value
+        batch.execute.side_effect = lambda: [
+            self.mock_service.new_batch_http_request.call_args[1]['callback'](kwargs['request_id'], None, None)
+            for _, kwargs in batch.add.call_args_list
+        ]
+
+        deleted = self.service.reconcile([dhuhr], datetime(2025, 7, 22, tzinfo=utc), datetime(2025, 7, 23, tzinfo=utc))
+
+        self.assertEqual(deleted, 3)
+        self.mock_service.events().list.assert_called_once()
+        self.assertEqual(self.mock_service.events().list.call_args[1]['privateExtendedProperty'], ['app=prayer-player'])
+        batch.execute.assert_called_once()
+        self.assertEqual([call[1]['eventId'] for call in self.mock_service.events().delete.call_args_list], ['twin', 'moved', 'dropped'])
+
     def test_add_event_finds_new_slot_due_to_conflict(self):
         # Mock an existing event that conflicts with the initial start_time
         self.mock_events_list.execute.return_value = {
@@ -155,5 +242,196 @@ class TestGoogleCalendarService(unittest.TestCase):
         self.assertEqual(datetime.fromisoformat(inserted_event_body['start']['dateTime']), expected_new_start_time)
         self.assertEqual(inserted_event_body['summary'], summary)
 
+    def test_refresh_lists_each_day_once(self):
+        self.mock_events_list.execute.return_value = {
+            'items': [
+                {
+                    'summary': 'Meeting',
+                    'start': {'dateTime': '2025-07-22T12:00:00+00:00'},
+                    'end': {'dateTime': '2025-07-22T13:00:00+00:00'}
+                }
+            ]
+        }
+        batch = self.mock_service.new_batch_http_request.return_value
+
+        def answer_batch():
+            callback = self.mock_service.new_batch_http_request.call_args[1]['callback']
+            for _, kwargs in batch.add.call_args_list:
+                callback(kwargs['request_id'], {'id': kwargs['request_id']}, None)
+        batch.execute.side_effect = answer_batch
+
+        self.service.begin_refresh()
+        self.assertTrue(self.service.add_event(datetime(2025, 7, 22, 11, 55, tzinfo=ZoneInfo("UTC")), "Dhuhr", 10))
+        # Lands after the meeting and after the block just created, without listing the day again
+        self.assertTrue(self.service.add_event(datetime(2025, 7, 22, 12, 30, tzinfo=ZoneInfo("UTC")), "Asr", 10))
+        self.assertFalse(self.service.add_event(datetime(2025, 7, 22, 14, 0, tzinfo=ZoneInfo("UTC")), "dhuhr", 10))
+        # Nothing is written until the refresh ends, then both blocks go out in one batch
+        self.mock_service.events().insert.assert_not_called()
+        self.service.end_refresh()
+
+        self.assertEqual(self.mock_service.events().list.call_count, 1)
+        self.assertEqual(batch.execute.call_count, 1)
+        self.assertEqual(batch.add.call_count, 2)
+        self.assertEqual(self.service.last_refresh_api_calls, {"events.list": 1, "events.insert": 2, "batch": 1})
+        inserted_starts = [kwargs['body']['start']['dateTime'] for _, kwargs in self.mock_service.events().insert.call_args_list]
+        self.assertEqual(inserted_starts, ['2025-07-22T13:00:00+00:00', '2025-07-22T13:10:00+00:00'])
+
+    def test_snapshot_is_dropped_after_refresh(self):
+        self.mock_events_list.execute.return_value = {'items': []}
+        start_time = datetime(2025, 7, 22, 9, 0, 0, tzinfo=ZoneInfo("UTC"))
+
+        self.service.begin_refresh()
+        self.service.find_first_available_slot(start_time, 10)
+        self.service.end_refresh()
+        self.service.find_first_available_slot(start_time, 10)
+
+        self.assertEqual(self.service.api_calls["events.list"], 2)
+
+    def test_second_refresh_fetches_only_deltas(self):
+        self.mock_events_list.execute.side_effect = [
+            {'items': [], 'nextSyncToken': 'token-1'},
+            {'items': [], 'nextSyncToken': 'token-2'},
+        ]
+        start_time = datetime(2025, 7, 22, 9, 0, 0, tzinfo=ZoneInfo("UTC"))
+
+        for _ in range(2):
+            self.service.begin_refresh()
+            self.service.find_first_available_slot(start_time, 10)
+            self.service.end_refresh()
+
+        second_call = self.mock_service.events().list.call_args_list[1]
+        self.assertEqual(second_call[1]['syncToken'], 'token-1')
+        self.assertEqual(self.service.api_calls["events.list"], 2)
+
+    def test_freebusy_slot_source(self):
+        service = GoogleCalendarService(self.mock_creds, slot_source="freebusy")
+        self.mock_service.freebusy.return_value.query.return_value.execute.return_value = {
+            'calendars': {'primary': {'busy': [
+                {'start': '2025-07-22T09:00:00Z', 'end': '2025-07-22T09:30:00Z'},
+                {'start': '2025-07-22T09:30:00Z', 'end': '2025-07-22T10:00:00Z'},
+            ]}}
+        }
+        self.mock_events_list.execute.return_value = {
+            'items': [{'summary': 'Dhuhr', 'start': {'dateTime': '2025-07-22T12:00:00Z'}, 'end': {'dateTime': '2025-07-22T12:10:00Z'},
+                       'extendedProperties': {'private': {'app': 'prayer-player', 'prayer': 'Dhuhr', 'prayerDate': '2025-07-22'}}}]
+        }
+
+        service.begin_refresh()
+        slot = service.find_first_available_slot(datetime(2025, 7, 22, 9, 15, tzinfo=ZoneInfo("UTC")), 10)
+        self.assertFalse(service.add_event(datetime(2025, 7, 22, 12, 0, tzinfo=ZoneInfo("UTC")), "Dhuhr", 10))
+        service.end_refresh()
+
+        self.assertEqual(slot, datetime(2025, 7, 22, 10, 0, tzinfo=ZoneInfo("UTC")))
+        query_body = self.mock_service.freebusy.return_value.query.call_args[1]['body']
+        self.assertEqual(query_body['items'], [{'id': 'primary'}])
+        self.assertEqual(self.mock_service.events().list.call_args[1]['privateExtendedProperty'], ['app=prayer-player'])
+        self.assertEqual(service.last_refresh_api_calls, {"freebusy.query": 1, "events.list": 1})
+
+    def test_configured_calendar_and_busy_calendars(self):
+        service = GoogleCalendarService(self.mock_creds, calendar_id='prayers@group.calendar.google.com',
+                                        busy_calendar_ids=['work@example.com', 'prayers@group.calendar.google.com', 'family@example.com'])
+        self.mock_events_list.execute.return_value = {
+            'items': [{'summary': 'Lunch', 'start': {'dateTime': '2025-07-22T12:00:00Z'}, 'end': {'dateTime': '2025-07-22T12:30:00Z'}}],
+            'nextSyncToken': 'token-1',
+        }
+        self.mock_service.freebusy.return_value.query.return_value.execute.return_value = {
+            'calendars': {
+                'work@example.com': {'busy': [{'start': '2025-07-22T12:30:00Z', 'end': '2025-07-22T13:00:00Z'}]},
+                'family@example.com': {'busy': [{'start': '2025-07-22T12:50:00Z', 'end': '2025-07-22T13:20:00Z'}]},
+            }
+        }
+
+        service.begin_refresh()
+        self.assertTrue(service.add_event(datetime(2025, 7, 22, 12, 0, tzinfo=ZoneInfo("UTC")), "Dhuhr", 10))
+        service.add_event(datetime(2025, 7, 22, 12, 5, tzinfo=ZoneInfo("UTC")), "Asr", 10)
+        service.end_refresh()
+
+        self.assertEqual(self.mock_service.events().list.call_args[1]['calendarId'], 'prayers@group.calendar.google.com')
+        query_body = self.mock_service.freebusy.return_value.query.call_args[1]['body']
+        self.assertEqual(query_body['items'], [{'id': 'work@example.com'}, {'id': 'family@example.com'}])
+        self.assertEqual(self.mock_service.new_batch_http_request.call_count, 1)
+        inserted = [kwargs for _, kwargs in self.mock_service.events().insert.call_args_list]
+        self.assertEqual({kwargs['calendarId'] for kwargs in inserted}, {'prayers@group.calendar.google.com'})
+        self.assertEqual([kwargs['body']['start']['dateTime'] for kwargs in inserted],
+                         ['2025-07-22T13:20:00+00:00', '2025-07-22T13:30:00+00:00'])
+        self.assertEqual(service.last_refresh_api_calls["freebusy.query"], 1)
+
+    def test_add_events_places_blocks_together(self):
+        self.mock_events_list.execute.return_value = {
+            'items': [
+                {'summary': 'Meeting', 'start': {'dateTime': '2025-07-22T13:00:00+00:00'}, 'end': {'dateTime': '2025-07-22T14:00:00+00:00'}},
+                {'summary': 'Isha', 'start': {'dateTime': '2025-07-22T20:00:00+00:00'}, 'end': {'dateTime': '2025-07-22T20:10:00+00:00'},
+                 'extendedProperties': {'private': {'app': 'prayer-player', 'prayer': 'Isha', 'prayerDate': '2025-07-22'}}},
+            ]
+        }
+        batch = self.mock_service.new_batch_http_request.return_value
+        batch.execute.side_effect = lambda: [
+            self.mock_service.new_batch_http_request.call_args[1]['callback'](kwargs['request_id'], {'id': kwargs['request_id']}, None)
+            for _, kwargs in batch.add.call_args_list
+        ]
+        requests = [
+            BlockRequest("Dhuhr", datetime(2025, 7, 22, 13, 30, tzinfo=ZoneInfo("UTC")), timedelta(minutes=10)),
+            BlockRequest("Asr", datetime(2025, 7, 22, 13, 35, tzinfo=ZoneInfo("UTC")), timedelta(minutes=10)),
+            BlockRequest("Isha", datetime(2025, 7, 22, 20, 0, tzinfo=ZoneInfo("UTC")), timedelta(minutes=10)),
+        ]
+
+        results = self.service.add_events(requests)
+
+        self.assertEqual(results, [True, True, False])
+        inserted = [kwargs['body'] for _, kwargs in self.mock_service.events().insert.call_args_list]
+        self.assertEqual([(body['summary'], body['start']['dateTime']) for body in inserted],
+                         [('Dhuhr', '2025-07-22T14:00:00+00:00'), ('Asr', '2025-07-22T14:10:00+00:00')])
+        self.assertEqual(self.service.last_refresh_api_calls, {"events.list": 1, "events.insert": 2, "batch": 1})
+
+    def test_get_events_follows_pages_with_partial_responses(self):
+        self.mock_events_list.execute.side_effect = [
+            {'items': [{'id': 'a'}], 'nextPageToken': 'page-2'},
+            {'items': [{'id': 'b'}]},
+        ]
+
+        events = self.service.get_events(datetime(2025, 7, 22, tzinfo=ZoneInfo("UTC")), datetime(2025, 7, 23, tzinfo=ZoneInfo("UTC")))
+
+        self.assertEqual([e['id'] for e in events], ['a', 'b'])
+        first, second = [kwargs for _, kwargs in self.mock_service.events().list.call_args_list]
+        self.assertEqual(first['fields'], 'nextPageToken,items(id,status,summary,visibility,start,end,extendedProperties)')
+        self.assertNotIn('pageToken', first)
+        self.assertEqual(second['pageToken'], 'page-2')
+
+    def test_slot_search_stops_reading_pages_once_satisfied(self):
+        self.mock_events_list.execute.side_effect = [
+            {'items': [{'start': {'dateTime': '2025-07-22T09:00:00Z'}, 'end': {'dateTime': '2025-07-22T09:30:00Z'}},
+                       {'start': {'dateTime': '2025-07-22T11:00:00Z'}, 'end': {'dateTime': '2025-07-22T12:00:00Z'}}],
+             'nextPageToken': 'page-2'},
+            AssertionError("the second page must not be requested"),
+        ]
+
+        slot = self.service.find_first_available_slot(datetime(2025, 7, 22, 9, 0, tzinfo=ZoneInfo("UTC")), 30)
+
+        self.assertEqual(slot, datetime(2025, 7, 22, 9, 30, tzinfo=ZoneInfo("UTC")))
+        self.assertEqual(self.mock_service.events().list.call_count, 1)
+
+    def test_unknown_slot_source_is_rejected(self):
+        with self.assertRaises(ValueError):
+            GoogleCalendarService(self.mock_creds, slot_source="guess")
+
+    def test_retried_insert_does_not_create_a_second_event(self):
+        service = GoogleCalendarService(self.mock_creds, limiter=RateLimiter(sleep=lambda seconds: None))
+        # The first attempt was applied but its response lost; the retry collides with the client-chosen id.
+        self.mock_events_insert.execute.side_effect = [
+            HttpError(httplib2.Response({'status': 503}), b'{}'),
+            HttpError(httplib2.Response({'status': 409}), b'{}'),
+        ]
+        start = datetime(2025, 7, 22, 13, 0, tzinfo=ZoneInfo("UTC"))
+        existing = {'id': 'x', 'summary': 'Dhuhr', 'start': {'dateTime': start.isoformat()},
+                    'end': {'dateTime': (start + timedelta(minutes=10)).isoformat()}}
+        self.mock_service.events.return_value.get.return_value.execute.return_value = existing
+
+        created = service.create_event('Dhuhr', start, start + timedelta(minutes=10), 'Scheduled by Prayer App')
+
+        body = self.mock_service.events().insert.call_args[1]['body']
+        self.assertTrue(body['id'])
+        self.mock_service.events().get.assert_called_once_with(calendarId='primary', eventId=body['id'])
+        self.assertEqual(created, existing)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from src.calendar_api.allocator import BlockRequest
+from src.calendar_api.ics_calendar import IcsCalendarService, block_uid, parse_calendar, serialize_event
+from src.calendar_api.tags import app_tag
+from src.shared.clock import VirtualClock
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+
+
+class TestIcsCalendarService(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'prayer.ics')
+        self.clock = VirtualClock(DAY)
+        self.service = IcsCalendarService(self.path, clock=self.clock)
+
+    def read(self):
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            return f.read()
+
+    def test_add_event_writes_a_tagged_block(self):
+        self.assertTrue(self.service.add_event(DAY + timedelta(hours=12), "Dhuhr", 10))
+
+        text = self.read()
+        self.assertTrue(text.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(text.endswith('END:VCALENDAR\r\n'))
+        self.assertIn(f"UID:{block_uid('Dhuhr', DAY.date())}\r\n", text)
+        self.assertIn('DTSTART:20250722T120000Z\r\n', text)
+        self.assertIn('DTEND:20250722T121000Z\r\n', text)
+
+        reloaded = IcsCalendarService(self.path, clock=self.clock)
+        [event] = reloaded.get_events(DAY, DAY + timedelta(days=1))
+        self.assertEqual(app_tag(event)['prayer'], "Dhuhr")
+
+    def test_unchanged_block_is_not_rewritten(self):
+        self.service.add_event(DAY + timedelta(hours=12), "Dhuhr", 10)
+        writes = self.service.writes
+
+        self.assertFalse(IcsCalendarService(self.path, clock=self.clock).add_event(DAY + timedelta(hours=12), "Dhuhr", 10))
+        self.assertFalse(self.service.add_event(DAY + timedelta(hours=12), "Dhuhr", 10))
+        self.assertEqual(self.service.writes, writes)
+
+    def test_changed_schedule_moves_block_under_same_uid(self):
+        self.service.add_event(DAY + timedelta(hours=12), "Dhuhr", 10)
+
+        self.assertTrue(self.service.add_event(DAY + timedelta(hours=12, minutes=5), "Dhuhr", 10))
+
+        [event] = self.service.get_events(DAY, DAY + timedelta(days=1))
+        self.assertEqual(event['id'], block_uid('Dhuhr', DAY.date()))
+        self.assertEqual(self.read().count('BEGIN:VEVENT'), 1)
+        self.assertIn('DTSTART:20250722T120500Z\r\n', self.read())
+
+    def test_blocks_do_not_overlap(self):
+        self.service.add_event(DAY + timedelta(hours=12), "Dhuhr", 10)
+        self.service.add_event(DAY + timedelta(hours=12, minutes=5), "Asr", 10)
+
+        starts = [event['start']['dateTime'] for event in self.service.get_events(DAY, DAY + timedelta(days=1))]
+        self.assertEqual(starts, [(DAY + timedelta(hours=12)).isoformat(), (DAY + timedelta(hours=12, minutes=10)).isoformat()])
+
+    def test_refresh_writes_once(self):
+        self.service.begin_refresh()
+        self.service.add_events([BlockRequest(name, DAY + timedelta(hours=hour), timedelta(minutes=10))
+                                 for name, hour in (("Fajr", 4), ("Dhuhr", 12), ("Asr", 16))])
+        self.assertFalse(os.path.exists(self.path))
+        self.service.end_refresh()
+
+        self.assertEqual(self.service.writes, 1)
+        self.assertEqual(self.read().count('BEGIN:VEVENT'), 3)
+
+    def test_untouched_events_keep_their_text(self):
+        self.service.add_event(DAY + timedelta(hours=4), "Fajr", 10)
+        fajr = self.read().split('END:VEVENT')[0]
+
+        self.clock.advance(timedelta(hours=1))
+        IcsCalendarService(self.path, clock=self.clock).add_event(DAY + timedelta(hours=12), "Dhuhr", 10)
+
+        self.assertEqual(self.read().split('END:VEVENT')[0], fajr)
+        self.assertEqual([f for f in os.listdir(self.tmp.name)], ['prayer.ics'])
+
+    def test_old_blocks_are_pruned(self):
+        self.service.add_event(DAY + timedelta(hours=4), "Fajr", 10)
+        self.clock.advance(timedelta(days=40))
+
+        self.service.begin_refresh()
+        self.service.add_event(self.clock.now() + timedelta(hours=4), "Fajr", 10)
+        self.service.end_refresh()
+
+        self.assertEqual(self.read().count('BEGIN:VEVENT'), 1)
+
+    def test_reconcile_removes_superseded_blocks(self):
+        self.service.add_event(DAY + timedelta(hours=12), "Dhuhr", 10)
+        self.service.add_event(DAY + timedelta(hours=16), "Asr", 10)
+        user_event = self.service.create_event("Focus", DAY + timedelta(hours=9), DAY + timedelta(hours=10), "")
+
+        deleted = self.service.reconcile([BlockRequest("Dhuhr", DAY + timedelta(hours=12), timedelta(minutes=10))],
+                                         DAY, DAY + timedelta(days=1))
+
+        self.assertEqual(deleted, 1)
+        ids = {event['id'] for event in IcsCalendarService(self.path, clock=self.clock).get_events(DAY, DAY + timedelta(days=1))}
+        self.assertEqual(ids, {block_uid('Dhuhr', DAY.date()), user_event['id']})
+
+    def test_delete_event(self):
+        event = self.service.create_event("Focus", DAY + timedelta(hours=9), DAY + timedelta(hours=10), "")
+        self.service.delete_event(event['id'])
+
+        self.assertEqual(self.service.get_events(DAY, DAY + timedelta(days=1)), [])
+        self.assertNotIn('BEGIN:VEVENT', self.read())
+
+
+class TestIcsFormat(unittest.TestCase):
+
+    def test_round_trip_escapes_and_folds(self):
+        event = {
+            'id': 'x@prayer-player',
+            'summary': 'Dhuhr; with, commas\\and ' + 'ü' * 60,
+            'description': 'line one\nline two',
+            'visibility': 'private',
+            'start': {'dateTime': DAY.isoformat()},
+            'end': {'dateTime': (DAY + timedelta(minutes=10)).isoformat()},
+        }
+        text = serialize_event(event, DAY)
+
+        self.assertTrue(all(len(line.encode('utf-8')) <= 75 for line in text.split('\r\n')))
+        [(parsed, block)] = parse_calendar('BEGIN:VCALENDAR\r\n' + text + 'END:VCALENDAR\r\n')
+        self.assertEqual(parsed['summary'], event['summary'])
+        self.assertEqual(parsed['description'], event['description'])
+        self.assertEqual(block, text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,7 +2,7 @@ import unittest
 from unittest.mock import Mock, patch
 
 from src.gui.notification_service import NotificationService
-from src.domain.notification_messages import AudioPlaybackRequestedEvent, FocusModeRequestedEvent
+from src.domain.notification_messages import AudioPlaybackRequestedEvent, FocusModeRequestedEvent, PrearmRequestedEvent
 
 class TestNotificationService(unittest.TestCase):
 
@@ -13,11 +13,23 @@ class TestNotificationService(unittest.TestCase):
     @patch('src.gui.notification_service.play')
     def test_handle_audio_playback_request(self, mock_play):
         mock_audio_path = "/path/to/audio.wav"
-        event = AudioPlaybackRequestedEvent(audio_path=mock_audio_path)
+        on_finished = Mock()
+        event = AudioPlaybackRequestedEvent(audio_path=mock_audio_path, on_finished=on_finished)
 
         self.notification_service.handle_audio_playback_requested(event)
 
-        mock_play.assert_called_once_with(mock_audio_path)
+        mock_play.assert_called_once_with(mock_audio_path, on_finished=on_finished)
+
+    @patch('src.gui.notification_service.arm', return_value=True)
+    def test_handle_prearm_request(self, mock_arm):
+        event = PrearmRequestedEvent(audio_paths=["/path/adhan.wav", "/path/duaa.wav"])
+
+        with patch.object(NotificationService, '_prepare_focus_view') as mock_prepare:
+            self.notification_service.handle_prearm_requested(event)
+
+        mock_arm.assert_any_call("/path/adhan.wav", ttl=NotificationService.PREARM_TTL_SECONDS, open_device=True)
+        mock_arm.assert_any_call("/path/duaa.wav", ttl=NotificationService.PREARM_TTL_SECONDS, open_device=False)
+        mock_prepare.assert_called_once()
 
     @patch('src.focus_steps_view.run')
     @patch('PySide6.QtCore.QTimer.singleShot', side_effect=lambda *args, **kwargs: args[1]() if len(args) > 1 else None)
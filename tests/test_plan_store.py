@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from src.calendar_api.allocator import BlockRequest
+from src.calendar_api.plan_store import PlanStore, block_plan, plan_hash
+
+UTC = ZoneInfo("UTC")
+DAY = datetime(2025, 7, 22, tzinfo=UTC)
+
+
+def plan(**hours):
+    return [BlockRequest(name, DAY + timedelta(hours=hour), timedelta(minutes=15)) for name, hour in hours.items()]
+
+
+class TestPlanStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'plans.json')
+        self.store = PlanStore(self.path)
+
+    def test_unknown_day_needs_a_full_check(self):
+        diff = self.store.diff("google:primary", DAY.date(), plan(Dhuhr=12, Asr=16))
+
+        self.assertFalse(diff.known)
+        self.assertFalse(diff.empty)
+        self.assertEqual(diff.creates, ["dhuhr", "asr"])
+
+    def test_saved_plan_survives_restart(self):
+        self.store.save("google:primary", DAY.date(), plan(Dhuhr=12, Asr=16))
+
+        diff = PlanStore(self.path).diff("google:primary", DAY.date(), plan(Asr=16, Dhuhr=12))
+
+        self.assertTrue(diff.empty)
+        self.assertFalse(PlanStore(self.path).diff("google:other", DAY.date(), plan(Dhuhr=12)).known)
+
+    def test_minimal_diff(self):
+        self.store.save("ics", DAY.date(), plan(Fajr=4, Dhuhr=12, Asr=16))
+
+        diff = self.store.diff("ics", DAY.date(), plan(Dhuhr=12, Asr=17, Isha=21))
+
+        self.assertEqual((diff.creates, diff.moves, diff.deletes), (["isha"], ["asr"], ["fajr"]))
+        self.assertEqual(diff.writes, ["isha", "asr"])
+
+    def test_forget_and_retention(self):
+        self.store.save("ics", DAY.date(), plan(Dhuhr=12))
+        self.store.forget("ics", DAY.date())
+        self.assertIsNone(self.store.get("ics", DAY.date()))
+
+        self.store.save("ics", (DAY - timedelta(days=30)).date(), plan(Dhuhr=12))
+        self.store.save("ics", DAY.date(), plan(Dhuhr=12))
+        self.assertIsNone(PlanStore(self.path).get("ics", (DAY - timedelta(days=30)).date()))
+
+    def test_plan_hash_ignores_order(self):
+        self.assertEqual(plan_hash(block_plan(plan(Dhuhr=12, Asr=16))), plan_hash(block_plan(plan(Asr=16, Dhuhr=12))))
+        self.assertNotEqual(plan_hash(block_plan(plan(Dhuhr=12))), plan_hash(block_plan(plan(Dhuhr=13))))
+
+    def test_unreadable_store_is_ignored(self):
+        with open(self.path, 'w') as f:
+            f.write("{not json")
+
+        self.assertIsNone(PlanStore(self.path).get("ics", DAY.date()))
+
+if __name__ == '__main__':
+    unittest.main()
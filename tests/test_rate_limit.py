@@ -0,0 +1,114 @@
+import unittest
+from datetime import timedelta
+from unittest.mock import Mock
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from src.calendar_api.batch import CalendarBatch
+from src.calendar_api.rate_limit import RateLimiter, TokenBucket, retry_after
+from tests.test_calendar_batch import FakeBatchService
+
+
+def http_error(status, content=b'{}', headers=None):
+    return HttpError(httplib2.Response({'status': status, **(headers or {})}), content)
+
+
+class FakeTime:
+    """A monotonic clock that only moves when the code under test sleeps."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        time = FakeTime()
+        bucket = TokenBucket(rate=2, capacity=3, clock=time.clock)
+
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+        self.assertEqual(bucket.reserve(), 0.5)
+        self.assertEqual(bucket.reserve(), 1.0)
+        time.now += 1.0
+        self.assertEqual(bucket.reserve(), 0.5)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.time = FakeTime()
+        self.limiter = RateLimiter(rate=100, burst=100, user_rate=1, user_burst=2,
+                                   base_delay=timedelta(seconds=1), max_delay=timedelta(seconds=8),
+                                   clock=self.time.clock, sleep=self.time.sleep)
+
+    def test_per_user_quota_throttles_only_that_user(self):
+        for _ in range(4):
+            self.limiter.acquire("alice")
+        self.limiter.acquire("bob")
+
+        self.assertEqual(self.limiter.user_metrics["alice"]["calls"], 4)
+        self.assertEqual(self.limiter.user_metrics["alice"]["throttled"], 2)
+        self.assertNotIn("throttled", self.limiter.user_metrics["bob"])
+        self.assertEqual(self.limiter.metrics["calls"], 5)
+
+    def test_retries_rate_limits_and_honours_retry_after(self):
+        request = Mock()
+        request.execute.side_effect = [
+            http_error(429, headers={'retry-after': '30'}),
+            http_error(403, b'{"error": {"errors": [{"reason": "rateLimitExceeded"}]}}'),
+            {'id': 'created'},
+        ]
+
+        self.assertEqual(self.limiter.execute(request, "alice"), {'id': 'created'})
+
+        self.assertEqual(request.execute.call_count, 3)
+        self.assertEqual(self.time.sleeps[0], 30)
+        self.assertEqual(self.limiter.user_metrics["alice"]["retried"], 2)
+
+    def test_other_errors_are_raised_at_once(self):
+        request = Mock()
+        request.execute.side_effect = http_error(404)
+
+        with self.assertRaises(HttpError):
+            self.limiter.execute(request, "alice")
+        self.assertEqual(request.execute.call_count, 1)
+        self.assertNotIn("failed", self.limiter.metrics)
+
+    def test_gives_up_after_max_attempts(self):
+        request = Mock()
+        request.execute.side_effect = http_error(503)
+
+        with self.assertRaises(HttpError):
+            self.limiter.execute(request, "alice")
+        self.assertEqual(request.execute.call_count, self.limiter.max_attempts)
+        self.assertEqual(self.limiter.metrics["failed"], 1)
+
+    def test_retry_after_formats(self):
+        self.assertEqual(retry_after(http_error(429, headers={'retry-after': '7'})), 7)
+        self.assertEqual(retry_after(http_error(429, headers={'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'})), 0)
+        self.assertIsNone(retry_after(http_error(429)))
+
+    def test_batch_items_take_quota_and_wait_for_retry_after(self):
+        service = FakeBatchService(failures={"a": [http_error(429, headers={'retry-after': '20'})]})
+        batch = CalendarBatch(lambda: service, limiter=self.limiter, user="alice", sleep=self.time.sleep)
+        batch.insert({}, key="a")
+        batch.insert({}, key="b")
+
+        results = batch.execute()
+
+        self.assertTrue(all(result.ok for result in results.values()))
+        self.assertIn(20, self.time.sleeps)
+        self.assertEqual(self.limiter.user_metrics["alice"]["calls"], 3)
+        self.assertEqual(self.limiter.user_metrics["alice"]["retried"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
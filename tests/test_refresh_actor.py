@@ -0,0 +1,63 @@
+import unittest
+import threading
+from unittest.mock import Mock
+
+from src.refresh_actor import RefreshActor
+
+class TestRefreshActor(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+        def refresh(**kwargs):
+            self.calls.append(kwargs)
+            self.started.set()
+            self.release.wait(timeout=5)
+
+        self.actor = RefreshActor(refresh)
+        self.addCleanup(self.actor.stop, 5)
+
+    def test_submit_does_not_block(self):
+        self.actor.submit(city="A")
+        self.assertTrue(self.started.wait(timeout=5))
+        self.assertFalse(self.actor.flush(timeout=0.05))
+        self.release.set()
+        self.assertTrue(self.actor.flush(timeout=5))
+        self.assertEqual(self.calls, [{"city": "A"}])
+
+    def test_burst_is_coalesced_into_latest_request(self):
+        self.actor.submit(city="A")
+        self.assertTrue(self.started.wait(timeout=5))
+        for city in ("B", "C", "D"):
+            self.actor.submit(city=city)
+        self.release.set()
+        self.assertTrue(self.actor.flush(timeout=5))
+
+        self.assertEqual(self.calls, [{"city": "A"}, {"city": "D"}])
+        self.assertEqual(self.actor.runs, 2)
+        self.assertEqual(self.actor.coalesced, 2)
+
+    def test_failing_refresh_does_not_stop_the_actor(self):
+        refresh = Mock(side_effect=[RuntimeError("boom"), None])
+        actor = RefreshActor(refresh)
+        self.addCleanup(actor.stop, 5)
+
+        actor.submit(city="A")
+        self.assertTrue(actor.flush(timeout=5))
+        actor.submit(city="B")
+        self.assertTrue(actor.flush(timeout=5))
+        self.assertEqual(refresh.call_count, 2)
+
+    def test_runs_on_a_single_thread(self):
+        threads = set()
+        actor = RefreshActor(lambda **kwargs: threads.add(threading.current_thread().name))
+        self.addCleanup(actor.stop, 5)
+        for i in range(5):
+            actor.submit(city=str(i))
+            actor.flush(timeout=5)
+        self.assertEqual(threads, {"refresh-actor"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import random
+from datetime import datetime, time, timedelta
+
+from src.config.security import TZ
+from src.refresh_policy import RefreshWindow, RetryPolicy, install_fraction, next_prayer_deadline
+from src.shared.backoff import exponential_backoff
+
+class TestRefreshWindow(unittest.TestCase):
+
+    def setUp(self):
+        self.window = RefreshWindow(start=time(0, 5), end=time(3, 0), fajr_margin=timedelta(minutes=30))
+        self.now = datetime(2025, 7, 22, 14, 0, tzinfo=TZ)
+
+    def test_next_run_is_deterministic_per_install(self):
+        first = self.window.next_run(self.now, "install-a")
+        second = self.window.next_run(self.now + timedelta(hours=3), "install-a")
+        self.assertEqual(first, second)
+
+    def test_next_run_spreads_installs_over_window(self):
+        runs = {self.window.next_run(self.now, f"install-{i}") for i in range(200)}
+        self.assertGreater(len(runs), 150)
+        for run in runs:
+            self.assertGreaterEqual(run, datetime(2025, 7, 23, 0, 5, tzinfo=TZ))
+            self.assertLess(run, datetime(2025, 7, 23, 3, 0, tzinfo=TZ))
+
+    def test_next_run_stays_before_fajr(self):
+        fajr = datetime(2025, 7, 22, 2, 10, tzinfo=TZ)
+        for i in range(100):
+            run = self.window.next_run(self.now, f"install-{i}", fajr=fajr)
+            self.assertLess(run, datetime(2025, 7, 23, 1, 40, tzinfo=TZ))
+
+    def test_next_run_falls_back_to_window_start_when_fajr_is_too_early(self):
+        fajr = datetime(2025, 7, 22, 0, 20, tzinfo=TZ)
+        run = self.window.next_run(self.now, "install-a", fajr=fajr)
+        self.assertEqual(run, datetime(2025, 7, 23, 0, 5, tzinfo=TZ))
+
+    def test_install_fraction_range(self):
+        self.assertTrue(0 <= install_fraction("x") < 1)
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = RetryPolicy(rng=random.Random(42))
+        self.now = datetime(2025, 7, 22, 1, 0, tzinfo=TZ)
+
+    def test_delay_grows_with_attempts(self):
+        delays = [RetryPolicy(rng=random.Random(1)).next_delay(attempt, self.now) for attempt in range(5)]
+        self.assertLess(delays[0], delays[4])
+        self.assertLessEqual(delays[4], self.policy.max_delay)
+
+    def test_delay_shrinks_as_deadline_approaches(self):
+        far = self.policy.next_delay(10, self.now, self.now + timedelta(hours=6))
+        near = self.policy.next_delay(10, self.now, self.now + timedelta(minutes=2))
+        self.assertLess(near, far)
+        self.assertEqual(near, timedelta(seconds=30))
+
+    def test_delay_survives_endless_failures(self):
+        self.assertEqual(exponential_backoff(10_000, timedelta(seconds=1), timedelta(hours=1), rng=random.Random(1)),
+                         exponential_backoff(64, timedelta(seconds=1), timedelta(hours=1), rng=random.Random(1)))
+        self.assertLessEqual(self.policy.next_delay(10**6, self.now), self.policy.max_delay)
+
+    def test_delay_has_floor(self):
+        delay = self.policy.next_delay(10, self.now, self.now + timedelta(seconds=5))
+        self.assertEqual(delay, self.policy.min_delay)
+
+    def test_is_urgent(self):
+        self.assertTrue(self.policy.is_urgent(self.now, self.now + timedelta(minutes=20)))
+        self.assertFalse(self.policy.is_urgent(self.now, self.now + timedelta(hours=3)))
+        self.assertFalse(self.policy.is_urgent(self.now, None))
+
+
+class TestNextPrayerDeadline(unittest.TestCase):
+
+    def test_projects_stale_times_onto_today_and_tomorrow(self):
+        times = {
+            "Fajr": datetime(2025, 7, 20, 3, 30, tzinfo=TZ),
+            "Isha": datetime(2025, 7, 20, 22, 45, tzinfo=TZ),
+        }
+        now = datetime(2025, 7, 22, 23, 0, tzinfo=TZ)
+        self.assertEqual(next_prayer_deadline(times, now), datetime(2025, 7, 23, 3, 30, tzinfo=TZ))
+
+    def test_no_times(self):
+        self.assertIsNone(next_prayer_deadline({}, datetime(2025, 7, 22, tzinfo=TZ)))
+
+if __name__ == '__main__':
+    unittest.main()
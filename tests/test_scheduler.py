@@ -2,15 +2,22 @@ from src.domain.config_messages import ConfigurationChangedEvent
 import unittest
 from unittest.mock import Mock, patch, call
 from datetime import datetime, timedelta
+import os
+import tempfile
 import threading
+from concurrent.futures import Future
 
 from src.scheduler import PrayerScheduler
 from src.shared.event_bus import EventBus
-from src.domain.scheduler_messages import ApplicationStateChangedEvent
+from src.domain.scheduler_messages import ApplicationStateChangedEvent, ScheduleRefreshedEvent
 from src.domain.enums import AppState
-from src.config.security import TZ
+from src.config.security import TZ, BUSY_SLOT
+from src.calendar_api.allocator import BlockRequest
 from src.config.schema import Config
 from src.shared.commands import SimulatePrayerCommand
+from src.shared.clock import VirtualClock
+from src.calendar_api.plan_store import PlanStore
+from src.actions_executor import ActionExecutor
 
 class TestPrayerScheduler(unittest.TestCase):
 
@@ -63,14 +70,61 @@ class TestPrayerScheduler(unittest.TestCase):
             mock_config.adjust_methods
         )
         
-        # 2 prayers * 2 jobs (focus + adhan) + 1 daily refresh job = 5
-        self.assertEqual(len(self.scheduler.scheduler.get_jobs()), 5)
+        # 2 prayers * 3 jobs (focus + adhan + pre-arm) + 1 daily refresh job = 7
+        self.assertEqual(len(self.scheduler.scheduler.get_jobs()), 7)
         self.mock_event_bus.publish.assert_has_calls([
             call(ApplicationStateChangedEvent(new_state=AppState.SYNCING)),
             call(ApplicationStateChangedEvent(new_state=AppState.IDLE))
         ])
         mock_update_next_prayer_info.assert_called_once()
+        self.mock_calendar_service.begin_refresh.assert_called_once()
+        self.mock_calendar_service.end_refresh.assert_called_once()
+        self.mock_calendar_service.add_events.assert_called_once_with([
+            BlockRequest("Fajr", prayer_times["Fajr"], BUSY_SLOT),
+            BlockRequest("Dhuhr", prayer_times["Dhuhr"], BUSY_SLOT),
+        ])
+        planned, start, end = self.mock_calendar_service.reconcile.call_args[0]
+        self.assertEqual(planned, self.mock_calendar_service.add_events.call_args[0][0])
+        self.assertTrue(start <= prayer_times["Fajr"] and prayer_times["Dhuhr"] < end)
+
+
+    @patch('src.scheduler.PrayerScheduler._update_next_prayer_info')
+    def test_refresh_queues_busy_blocks_with_calendar_writer(self, mock_update_next_prayer_info):
+        writer = Mock()
+        self.scheduler.calendar_writer = writer
+        at = datetime.now(TZ) + timedelta(hours=1)
+        self.mock_prayer_times_func.return_value = {"Asr": at}
+
+        self.scheduler.refresh(city="Test City", country="Test Country")
+
+        writer.enqueue_blocks.assert_called_once_with([BlockRequest("Asr", at, BUSY_SLOT)])
+        writer.enqueue_reconcile.assert_called_once()
+        self.assertEqual(writer.enqueue_reconcile.call_args[0][0], [BlockRequest("Asr", at, BUSY_SLOT)])
+        self.mock_calendar_service.add_events.assert_not_called()
+
+    @patch('src.scheduler.PrayerScheduler._update_next_prayer_info')
+    def test_unchanged_plan_makes_no_calendar_calls(self, mock_update_next_prayer_info):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.scheduler.plan_store = PlanStore(os.path.join(tmp.name, 'plans.json'))
+        self.mock_calendar_service.calendar_key = "google:primary"
+        self.mock_calendar_service.last_failed_writes = []
+        now = datetime.now(TZ).replace(hour=10, minute=0)
+        self.scheduler.clock = VirtualClock(now)
+        times = {"Dhuhr": now + timedelta(hours=2), "Asr": now + timedelta(hours=6)}
+        self.mock_prayer_times_func.return_value = times
+
+        self.scheduler.refresh(city="Test City", country="Test Country")
+        self.mock_calendar_service.reset_mock()
+        self.scheduler.refresh(city="Test City", country="Test Country")
 
+        self.assertEqual(self.mock_calendar_service.method_calls, [])
+
+        self.mock_prayer_times_func.return_value = dict(times, Asr=times["Asr"] + timedelta(minutes=3))
+        self.scheduler.refresh(city="Test City", country="Test Country")
+
+        self.mock_calendar_service.reconcile.assert_called_once()
+        self.mock_calendar_service.add_events.assert_called_once_with([BlockRequest("Asr", times["Asr"] + timedelta(minutes=3), BUSY_SLOT)])
 
     def test_refresh_dry_run(self):
         mock_config = Mock(spec=Config)
@@ -84,21 +138,40 @@ class TestPrayerScheduler(unittest.TestCase):
         self.scheduler.refresh(city=mock_config.city, country=mock_config.country, method=mock_config.calculation_method, school=mock_config.adjust_methods, dry_run=True, dry_run_event=dry_run_event)
 
         self.mock_action_executor.set_dry_run_event.assert_called_once_with(dry_run_event)
-        # 1 dry run job * 2 (focus + adhan) + 1 daily refresh job = 3
-        self.assertEqual(len(self.scheduler.scheduler.get_jobs()), 3)
+        # 1 dry run job * 3 (focus + adhan + pre-arm) + 1 daily refresh job = 4
+        self.assertEqual(len(self.scheduler.scheduler.get_jobs()), 4)
+
+    def test_refresh_failure_schedules_retry(self):
+        self.mock_prayer_times_func.side_effect = RuntimeError("API down")
+
+        self.scheduler.refresh(city="Test City", country="Test Country")
+
+        job_ids = [job.id for job in self.scheduler.scheduler.get_jobs()]
+        self.assertEqual(job_ids, ["refresh-retry"])
+        self.assertEqual(self.scheduler._refresh_attempt, 1)
+        self.mock_event_bus.publish.assert_called_with(ApplicationStateChangedEvent(new_state=AppState.ERROR))
 
-    @patch('src.shared.audio_player._playback_finished_event')
-    def test_play_adhan_and_duaa(self, mock_event):
+    def test_config_change_is_handed_to_refresh_actor(self):
+        config = Config(city="Test City", country="Test Country", method=2, school=1)
+
+        with patch.object(self.scheduler.refresh_actor, 'submit') as mock_submit, \
+             patch.object(self.scheduler, 'refresh') as mock_refresh:
+            self.scheduler._handle_config_change(ConfigurationChangedEvent(config=config))
+
+        mock_submit.assert_called_once_with(city="Test City", country="Test Country", method=2, school=1)
+        mock_refresh.assert_not_called()
+
+    def test_play_adhan_and_duaa(self):
         from src.config.security import get_asset_path
 
-        # Mock the action executor to set the event
-        self.mock_action_executor.play_audio.side_effect = lambda audio_path: mock_event.set()
+        def finished_playback(audio_path):
+            future = Future()
+            future.set_result(None)
+            return future
+        self.mock_action_executor.play_audio.side_effect = finished_playback
 
         self.scheduler.play_adhan_and_duaa()
 
-        # Check that the event was set
-        mock_event.set.assert_called()
-
         expected_calls = [
             call(str(get_asset_path('adhan.wav'))),
             call(str(get_asset_path('duaa_after_adhan.wav')))
@@ -106,6 +179,23 @@ class TestPrayerScheduler(unittest.TestCase):
         self.mock_action_executor.play_audio.assert_has_calls(expected_calls)
         self.mock_event_bus.publish.assert_called_with(ApplicationStateChangedEvent(new_state=AppState.IDLE))
 
+    def test_play_adhan_and_duaa_does_not_block_on_playback(self):
+        adhan, duaa = Future(), Future()
+        self.mock_action_executor.play_audio.side_effect = [adhan, duaa]
+
+        self.scheduler.play_adhan_and_duaa()
+
+        # Returns while the adhan is still playing, only the adhan has been requested.
+        self.assertEqual(self.mock_action_executor.play_audio.call_count, 1)
+        self.mock_event_bus.publish.assert_called_with(ApplicationStateChangedEvent(new_state=AppState.PRAYER_TIME))
+
+        adhan.set_result(None)
+        self.assertEqual(self.mock_action_executor.play_audio.call_count, 2)
+        self.mock_event_bus.publish.assert_called_with(ApplicationStateChangedEvent(new_state=AppState.PRAYER_TIME))
+
+        duaa.set_result(None)
+        self.mock_event_bus.publish.assert_called_with(ApplicationStateChangedEvent(new_state=AppState.IDLE))
+
     def test_schedule_single_prayer_job(self):
         prayer_name = "TestPrayer"
         prayer_time = datetime.now(TZ) + timedelta(minutes=5)
@@ -113,7 +203,7 @@ class TestPrayerScheduler(unittest.TestCase):
         with patch.object(self.scheduler.scheduler, 'add_job') as mock_add_job:
             self.scheduler._schedule_single_prayer_job(prayer_name, prayer_time, is_dry_run=False)
             
-            self.assertEqual(mock_add_job.call_count, 2)
+            self.assertEqual(mock_add_job.call_count, 3)
             
             # Check focus mode job
             focus_call = mock_add_job.call_args_list[0]
@@ -124,6 +214,36 @@ class TestPrayerScheduler(unittest.TestCase):
             adhan_call = mock_add_job.call_args_list[1]
             self.assertEqual(adhan_call[0][0], self.scheduler.play_adhan_and_duaa)
             self.assertEqual(adhan_call[1]['run_date'], prayer_time)
+            self.assertEqual(adhan_call[1]['kwargs'], {"scheduled_at": prayer_time})
+
+            # Check pre-arm job
+            prearm_call = mock_add_job.call_args_list[2]
+            self.assertEqual(prearm_call[0][0], self.mock_action_executor.prearm)
+            self.assertEqual(prearm_call[1]['run_date'], prayer_time - timedelta(seconds=60))
+            self.assertEqual(prearm_call[1]['args'], [list(self.scheduler._prayer_audio_paths())])
+
+    def test_prearm_can_be_disabled(self):
+        self.scheduler.prearm_lead = timedelta(0)
+        prayer_time = datetime.now(TZ) + timedelta(minutes=5)
+
+        with patch.object(self.scheduler.scheduler, 'add_job') as mock_add_job:
+            self.scheduler._schedule_single_prayer_job("TestPrayer", prayer_time, is_dry_run=False)
+
+        self.assertEqual(mock_add_job.call_count, 2)
+
+    def test_publish_next_prayer_info_runs_on_calling_thread(self):
+        self.scheduler.publish_next_prayer_info()
+
+        self.mock_event_bus.publish.assert_called_once_with(ScheduleRefreshedEvent(next_prayer_info="No upcoming prayers"))
+
+    def test_dry_run_playback_does_not_update_next_prayer(self):
+        self.scheduler.action_executor = ActionExecutor(self.mock_event_bus, dry_run=True)
+        self.assertTrue(self.scheduler.action_executor.dry_run)
+
+        with patch.object(self.scheduler, '_update_next_prayer_info') as mock_update:
+            self.scheduler._finish_playback_sequence()
+
+        mock_update.assert_not_called()
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,117 @@
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from src.auth import google_auth, service_factory
+from src.auth.service_factory import TTLCache, clear_services, discovery_document, get_service
+from src.calendar_api.google_calendar import GoogleCalendarService
+from src.calendar_api.rate_limit import RateLimiter
+
+
+class TestServiceFactory(unittest.TestCase):
+
+    def setUp(self):
+        clear_services()
+        self.addCleanup(clear_services)
+
+    def test_discovery_document_is_parsed_once(self):
+        with patch.dict(service_factory._documents, clear=True), \
+             patch('src.auth.service_factory.get_static_doc', wraps=service_factory.get_static_doc) as get_static_doc:
+            first = discovery_document('calendar', 'v3')
+            second = discovery_document('calendar', 'v3')
+
+        self.assertIs(first, second)
+        get_static_doc.assert_called_once_with('calendar', 'v3')
+
+    def test_unknown_api_raises(self):
+        with self.assertRaises(ValueError):
+            discovery_document('no-such-api', 'v0')
+
+    def test_client_is_reused_per_thread_and_credentials(self):
+        creds = Mock()
+        service = get_service('calendar', 'v3', creds)
+
+        self.assertIs(get_service('calendar', 'v3', creds), service)
+        self.assertIsNot(get_service('calendar', 'v3', Mock()), service)
+        self.assertIsNot(get_service('oauth2', 'v2', creds), service)
+
+        other_thread = []
+        thread = threading.Thread(target=lambda: other_thread.append(get_service('calendar', 'v3', creds)))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other_thread[0], service)
+
+    def test_calendar_service_uses_the_calling_threads_client(self):
+        calendar = GoogleCalendarService(Mock(), limiter=RateLimiter())
+        other_thread = []
+        thread = threading.Thread(target=lambda: other_thread.append(calendar.service))
+        thread.start()
+        thread.join()
+
+        self.assertIs(calendar.service, get_service('calendar', 'v3', calendar.creds))
+        self.assertIsNot(other_thread[0], calendar.service)
+
+    def test_clear_drops_the_clients_of_every_thread(self):
+        creds = Mock()
+        requests, clients = threading.Semaphore(0), []
+
+        def worker():
+            for _ in range(2):
+                requests.acquire()
+                clients.append(get_service('calendar', 'v3', creds))
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        requests.release()
+        while not clients:
+            thread.join(0.01)
+        clear_services()
+        requests.release()
+        thread.join()
+
+        self.assertIsNot(clients[0], clients[1])
+
+    def test_ttl_cache_expires_entries(self):
+        now = [0.0]
+        cache = TTLCache(10, clock=lambda: now[0])
+        cache.put('key', 'value')
+
+        now[0] = 9.9
+        self.assertEqual(cache.get('key'), 'value')
+        now[0] = 10.0
+        self.assertIsNone(cache.get('key'))
+
+
+class TestAccountCache(unittest.TestCase):
+
+    def setUp(self):
+        google_auth.clear_account_cache()
+        self.addCleanup(google_auth.clear_account_cache)
+        patcher = patch('src.auth.google_auth.get_service')
+        self.get_service = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.service = self.get_service.return_value
+
+    def test_user_info_and_calendar_list_are_cached(self):
+        creds = Mock(refresh_token='refresh')
+        self.service.userinfo().get().execute.return_value = {'email': 'user@example.com'}
+        self.service.calendarList().list().execute.return_value = {'items': [{'id': 'primary', 'summary': 'Me'}]}
+
+        for _ in range(3):
+            self.assertEqual(google_auth.get_user_info(creds), {'email': 'user@example.com'})
+            self.assertEqual(google_auth.get_calendar_list(creds), [{'id': 'primary', 'summary': 'Me'}])
+        # A reloaded Credentials object for the same account hits the cache too.
+        google_auth.get_user_info(Mock(refresh_token='refresh'))
+
+        self.assertEqual(self.service.userinfo().get().execute.call_count, 1)
+        self.assertEqual(self.service.calendarList().list().execute.call_count, 1)
+
+    def test_failures_are_not_cached(self):
+        creds = Mock(refresh_token='refresh')
+        self.service.userinfo().get().execute.side_effect = [RuntimeError("offline"), {'email': 'user@example.com'}]
+
+        self.assertIsNone(google_auth.get_user_info(creds))
+        self.assertEqual(google_auth.get_user_info(creds), {'email': 'user@example.com'})
+
+if __name__ == '__main__':
+    unittest.main()
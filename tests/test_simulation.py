@@ -0,0 +1,106 @@
+import unittest
+from datetime import datetime, timedelta
+
+from src.actions_executor import ActionExecutor
+from src.config.security import TZ
+from src.shared.clock import Clock, VirtualClock
+from src.shared.event_bus import EventBus
+from src.simulation import (InMemoryCalendarService, TimeWarpSimulator, _HeadlessPrayerScheduler, run_simulation,
+                            synthetic_prayer_times)
+
+
+class _LateScheduler(_HeadlessPrayerScheduler):
+    """Moves every prayer job 30 seconds past its prayer time, like a misfire being rescheduled."""
+
+    def _schedule_single_prayer_job(self, name, at, is_dry_run):
+        super()._schedule_single_prayer_job(name, at, is_dry_run)
+        for job in self.scheduler.get_jobs():
+            if job.id.startswith(f"prayer-{name}-") and job.kwargs.get("scheduled_at") == at:
+                job.modify(next_run_time=at + timedelta(seconds=30))
+
+class TestVirtualClock(unittest.TestCase):
+
+    def test_advance_and_set(self):
+        start = datetime(2025, 1, 1, 0, 0, tzinfo=TZ)
+        clock = VirtualClock(start)
+        clock.advance(timedelta(hours=2))
+        self.assertEqual(clock.now(), start + timedelta(hours=2))
+        clock.set(start + timedelta(days=1))
+        self.assertEqual(clock.now(), start + timedelta(days=1))
+
+    def test_cannot_go_backwards(self):
+        clock = VirtualClock(datetime(2025, 1, 1, tzinfo=TZ))
+        with self.assertRaises(ValueError):
+            clock.set(datetime(2024, 12, 31, tzinfo=TZ))
+
+    def test_requires_aware_start(self):
+        with self.assertRaises(ValueError):
+            VirtualClock(datetime(2025, 1, 1))
+
+    def test_clock_without_now_cannot_be_created(self):
+        class Broken(Clock):
+            pass
+
+        with self.assertRaises(TypeError):
+            Broken()
+
+
+class TestTimeWarpSimulation(unittest.TestCase):
+
+    def test_synthetic_times_follow_the_clock(self):
+        clock = VirtualClock(datetime(2025, 6, 21, tzinfo=TZ))
+        times = synthetic_prayer_times(clock)
+        summer = times("City", "Country")
+        clock.set(datetime(2025, 12, 21, tzinfo=TZ))
+        winter = times("City", "Country")
+        self.assertEqual(winter["Fajr"].date(), datetime(2025, 12, 21).date())
+        self.assertLess(summer["Fajr"].time(), winter["Fajr"].time())
+        self.assertGreater(summer["Isha"].time(), winter["Isha"].time())
+
+    def test_simulates_days_on_virtual_time(self):
+        start = datetime(2025, 3, 1, 0, 0, tzinfo=TZ)
+        report = run_simulation(days=10, city="City", country="Country", start=start)
+
+        self.assertEqual(report.jobs_fired["prayer"], 50)
+        self.assertEqual(report.jobs_fired["refresh"], 9)
+        self.assertEqual(report.max_drift, timedelta(0))
+        self.assertEqual(report.calendar_calls["add_event"], 50)
+        self.assertLessEqual(report.max_pending_jobs, 16)
+        self.assertGreater(report.memory_peak_kib, 0)
+        self.assertIn("Simulated 10 day(s)", report.summary())
+
+    def test_drift_measures_when_prayer_jobs_run(self):
+        clock = VirtualClock(datetime(2025, 3, 1, 0, 0, tzinfo=TZ))
+        event_bus = EventBus()
+        scheduler = _LateScheduler(audio_path="", calendar_service=InMemoryCalendarService(),
+                                   prayer_times_func=synthetic_prayer_times(clock),
+                                   action_executor=ActionExecutor(event_bus, dry_run=True),
+                                   event_bus=event_bus, clock=clock)
+
+        report = TimeWarpSimulator(scheduler, clock).run(2, city="City", country="Country")
+
+        self.assertEqual(report.jobs_fired["prayer"], 10)
+        self.assertEqual(report.max_drift, timedelta(seconds=30))
+
+    def test_jobs_on_time_have_no_drift_when_times_change_later(self):
+        clock = VirtualClock(datetime(2025, 3, 1, 0, 0, tzinfo=TZ))
+        synthetic, calls = synthetic_prayer_times(clock), []
+
+        def shifting_times(*args):
+            # Every lookup is a minute later than the one before; jobs keep the time they were scheduled for.
+            calls.append(args)
+            return {name: at + timedelta(minutes=len(calls)) for name, at in synthetic(*args).items()}
+
+        event_bus = EventBus()
+        scheduler = _HeadlessPrayerScheduler(audio_path="", calendar_service=InMemoryCalendarService(),
+                                             prayer_times_func=shifting_times,
+                                             action_executor=ActionExecutor(event_bus, dry_run=True),
+                                             event_bus=event_bus, clock=clock)
+
+        report = TimeWarpSimulator(scheduler, clock).run(1, city="City", country="Country")
+
+        self.assertEqual(report.jobs_fired["prayer"], 5)
+        self.assertEqual(report.max_drift, timedelta(0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,172 @@
+import os
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from zoneinfo import ZoneInfo
+
+from src.calendar_api.allocator import BlockRequest
+from src.calendar_api.base import CalendarService
+from src.calendar_api.plan_store import PlanStore
+from src.calendar_api.tags import stamp
+from src.calendar_api.write_behind import MAX_ATTEMPTS, RETRY_CAP, CalendarWriteBehind, WriteQueue
+from src.shared.clock import VirtualClock
+
+UTC = ZoneInfo("UTC")
+NOW = datetime(2025, 7, 22, 8, 0, tzinfo=UTC)
+
+
+def block(name, hour):
+    return BlockRequest(name, NOW.replace(hour=hour), timedelta(minutes=10))
+
+
+class TestCalendarWriteBehind(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'queue.sqlite3')
+        self.clock = VirtualClock(NOW)
+        self.service = Mock(spec=CalendarService, last_failed_writes=[])
+        self.writer = self.make_writer()
+
+    def make_writer(self):
+        queue = WriteQueue(self.path)
+        self.addCleanup(queue.close)
+        return CalendarWriteBehind(self.service, queue, clock=self.clock)
+
+    def test_enqueue_is_idempotent_and_replaces_pending_write(self):
+        self.writer.enqueue_blocks([block("Dhuhr", 12), block("Asr", 16)])
+        self.writer.enqueue_blocks([block("Dhuhr", 13)])
+
+        self.assertEqual(len(self.writer.queue), 2)
+        self.assertEqual(self.writer.drain(), 2)
+        self.service.add_events.assert_called_once_with([block("Dhuhr", 13), block("Asr", 16)])
+        self.service.begin_refresh.assert_called_once()
+        self.service.end_refresh.assert_called_once()
+        self.assertEqual(len(self.writer.queue), 0)
+
+    def test_offline_writes_survive_restart_and_catch_up(self):
+        self.service.add_events.side_effect = OSError("network is unreachable")
+        self.writer.enqueue_blocks([block("Dhuhr", 12)])
+
+        self.assertEqual(self.writer.drain(), 0)
+        self.clock.advance(timedelta(seconds=1))
+        self.assertEqual(self.writer.drain(), 0)  # Not due yet: backing off.
+        self.assertEqual(self.service.add_events.call_count, 1)
+
+        restarted = self.make_writer()
+        self.service.add_events.side_effect = None
+        self.clock.advance(timedelta(minutes=5))
+        self.assertEqual(restarted.drain(), 1)
+        self.assertEqual(len(restarted.queue), 0)
+
+    def test_rejected_writes_are_retried(self):
+        def fail_dhuhr(requests):
+            body = stamp({}, "Dhuhr", NOW.date(), "hash")
+            self.service.last_failed_writes = [body]
+        self.service.add_events.side_effect = fail_dhuhr
+        self.writer.enqueue_blocks([block("Dhuhr", 12), block("Asr", 16)])
+
+        self.assertEqual(self.writer.drain(), 1)
+        self.assertEqual([write.key for write in self.writer.queue.due(float('inf'))], ["add:2025-07-22:dhuhr"])
+
+    def test_blocks_that_are_over_are_dropped(self):
+        self.writer.enqueue_blocks([block("Fajr", 8)])
+        self.clock.advance(timedelta(minutes=15))
+
+        self.writer.drain()
+
+        self.service.add_events.assert_not_called()
+        self.assertEqual(len(self.writer.queue), 0)
+
+    def test_deletes(self):
+        gone = OSError("gone")
+        gone.status_code = 404
+        self.service.delete_event.side_effect = [None, gone, RuntimeError("server error")]
+        for event_id in ("a", "b", "c"):
+            self.writer.enqueue_delete(event_id)
+
+        self.assertEqual(self.writer.drain(), 1)
+        self.assertEqual([write.key for write in self.writer.queue.due(float('inf'))], ["delete:c"])
+
+    def test_gives_up_after_max_attempts(self):
+        self.service.add_events.side_effect = RuntimeError("bad request")
+        self.writer.enqueue_blocks([block("Isha", 21)])
+
+        for _ in range(MAX_ATTEMPTS):
+            self.writer.drain()
+            self.clock.advance(RETRY_CAP)
+
+        self.assertEqual(len(self.writer.queue), 0)
+
+    def test_reconcile_runs_before_adds(self):
+        calls = []
+        self.service.reconcile.side_effect = lambda *args: calls.append("reconcile")
+        self.service.add_events.side_effect = lambda requests: calls.append("add")
+        self.writer.enqueue_reconcile([block("Fajr", 4), block("Dhuhr", 12)], NOW.replace(hour=0), NOW.replace(hour=0) + timedelta(days=1))
+        self.writer.enqueue_blocks([block("Dhuhr", 12)])
+
+        self.assertEqual(self.writer.drain(), 2)
+
+        self.assertEqual(calls, ["reconcile", "add"])
+        self.service.reconcile.assert_called_once_with([block("Fajr", 4), block("Dhuhr", 12)], NOW.replace(hour=0),
+                                                       NOW.replace(hour=0) + timedelta(days=1))
+        self.service.begin_refresh.assert_called_once()
+        self.assertEqual(len(self.writer.queue), 0)
+
+    def test_adds_wait_for_a_failed_reconcile(self):
+        self.service.reconcile.side_effect = OSError("network is unreachable")
+        self.writer.enqueue_reconcile([block("Dhuhr", 12)], NOW.replace(hour=0), NOW.replace(hour=0) + timedelta(days=1))
+        self.writer.enqueue_blocks([block("Dhuhr", 12)])
+        self.assertEqual(self.writer.drain(), 0)
+        self.service.add_events.assert_not_called()
+
+        self.writer.enqueue_blocks([block("Asr", 16)])
+        self.assertEqual(self.writer.drain(), 0)  # The reconcile is backing off, so the adds wait too.
+        self.service.add_events.assert_not_called()
+
+        self.service.reconcile.side_effect = None
+        self.clock.advance(RETRY_CAP)
+        self.assertEqual(self.writer.drain(), 3)
+        [requests], _ = self.service.add_events.call_args
+        self.assertCountEqual(requests, [block("Dhuhr", 12), block("Asr", 16)])
+
+    def test_giving_up_forgets_the_days_plan(self):
+        self.writer.plans = PlanStore(os.path.join(self.tmp.name, 'plans.json'))
+        self.service.calendar_key = "google:primary"
+        self.writer.plans.save("google:primary", NOW.date(), [block("Isha", 21)])
+        self.service.add_events.side_effect = RuntimeError("bad request")
+        self.writer.enqueue_blocks([block("Isha", 21)])
+
+        for _ in range(MAX_ATTEMPTS):
+            self.writer.drain()
+            self.clock.advance(RETRY_CAP)
+
+        self.assertIsNone(self.writer.plans.get("google:primary", NOW.date()))
+
+    def test_background_thread_drains(self):
+        self.writer.start()
+        self.addCleanup(self.writer.stop, 5)
+        self.writer.enqueue_blocks([block("Asr", 16)])
+
+        for _ in range(200):
+            if not len(self.writer.queue):
+                break
+            time.sleep(0.01)
+        self.service.add_events.assert_called_once_with([block("Asr", 16)])
+
+    def test_background_thread_backs_off_when_passes_fail(self):
+        self.writer.enqueue_blocks([block("Asr", 16)])
+        self.writer.drain = Mock(side_effect=RuntimeError("database is locked"))
+
+        self.writer.start()
+        time.sleep(0.3)
+        self.writer.stop(5)
+
+        # The wake-up left by enqueue_blocks allows one early retry; after that the pass backs off.
+        self.assertLessEqual(self.writer.drain.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()